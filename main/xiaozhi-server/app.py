@@ -2,6 +2,7 @@ import sys
 import uuid
 import signal
 import asyncio
+import argparse
 from aioconsole import ainput
 from config.settings import load_config
 from config.logger import setup_logging
@@ -9,6 +10,8 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core import worker_supervisor
+from core.utils.metrics import registry
 
 TAG = __name__
 logger = setup_logging()
@@ -42,7 +45,8 @@ async def monitor_stdin():
         await ainput()  # 异步等待输入，消费回车
 
 
-async def main():
+def prepare_config():
+    """加载配置并补全运行时参数，多进程模式下在fork前执行，保证各工作进程一致"""
     check_ffmpeg_installed()
     config = load_config()
 
@@ -54,16 +58,22 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
-    # 添加 stdin 监控任务
-    stdin_task = asyncio.create_task(monitor_stdin())
+    mcp_endpoint = config.get("mcp_endpoint", None)
+    if mcp_endpoint is not None and "你" not in mcp_endpoint:
+        # 校验MCP接入点格式
+        if validate_mcp_endpoint(mcp_endpoint):
+            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
+            # 将mcp计入点地址转成调用点
+            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
+            config["mcp_endpoint"] = mcp_endpoint
+        else:
+            logger.bind(tag=TAG).error("mcp接入点不符合规范")
+            config["mcp_endpoint"] = "你的接入点 websocket地址"
+    return config
 
-    # 启动 WebSocket 服务器
-    ws_server = WebSocketServer(config)
-    ws_task = asyncio.create_task(ws_server.start())
-    # 启动 Simple http 服务器
-    ota_server = SimpleHttpServer(config)
-    ota_task = asyncio.create_task(ota_server.start())
 
+def log_addresses(config):
+    """输出服务地址"""
     read_config_from_api = config.get("read_config_from_api", False)
     port = int(config["server"].get("http_port", 8003))
     if not read_config_from_api:
@@ -77,17 +87,6 @@ async def main():
         get_local_ip(),
         port,
     )
-    mcp_endpoint = config.get("mcp_endpoint", None)
-    if mcp_endpoint is not None and "你" not in mcp_endpoint:
-        # 校验MCP接入点格式
-        if validate_mcp_endpoint(mcp_endpoint):
-            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
-            # 将mcp计入点地址转成调用点
-            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
-            config["mcp_endpoint"] = mcp_endpoint
-        else:
-            logger.bind(tag=TAG).error("mcp接入点不符合规范")
-            config["mcp_endpoint"] = "你的接入点 websocket地址"
 
     # 获取WebSocket配置，使用安全的默认值
     websocket_port = 8000
@@ -111,28 +110,99 @@ async def main():
         "=============================================================\n"
     )
 
+
+async def main(config, modules=None, worker_index=None):
+    """
+    启动服务
+    - modules: 父进程预加载的共享模块，仅多进程模式下传入
+    - worker_index: 工作进程序号，None 表示单进程模式
+    """
+    # 添加 stdin 监控任务（多进程模式下标准输入由父进程持有）
+    stdin_task = None
+    snapshot_task = None
+    if worker_index is None:
+        stdin_task = asyncio.create_task(monitor_stdin())
+
+    # 启动 WebSocket 服务器
+    ws_server = WebSocketServer(config, modules=modules)
+    ws_task = asyncio.create_task(ws_server.start())
+    # 启动 Simple http 服务器
+    ota_server = SimpleHttpServer(config)
+    ota_task = asyncio.create_task(ota_server.start())
+
+    if worker_index is None:
+        log_addresses(config)
+    else:
+        # 接收其他工作进程经父进程转发的广播消息，定期发布指标和追踪记录快照
+        registry.set_worker(worker_index)
+        worker_supervisor.listen(asyncio.get_running_loop())
+        snapshot_task = asyncio.create_task(worker_supervisor.publish_snapshots())
+
     try:
         await wait_for_exit()  # 阻塞直到收到退出信号
     except asyncio.CancelledError:
         print("任务被取消，清理资源中...")
     finally:
         # 取消所有任务（关键修复点）
-        stdin_task.cancel()
-        ws_task.cancel()
-        if ota_task:
-            ota_task.cancel()
+        tasks = [
+            task for task in (stdin_task, ws_task, ota_task, snapshot_task) if task
+        ]
+        for task in tasks:
+            task.cancel()
 
         # 等待任务终止（必须加超时）
         await asyncio.wait(
-            [stdin_task, ws_task, ota_task] if ota_task else [stdin_task, ws_task],
+            tasks,
             timeout=3.0,
             return_when=asyncio.ALL_COMPLETED,
         )
-        print("服务器已关闭，程序退出。")
+        if worker_index is None:
+            print("服务器已关闭，程序退出。")
+
+
+def run_workers(config, workers):
+    """多进程模式：父进程预加载共享模型后fork工作进程，并负责监管"""
+    # 工作进程通过 SO_REUSEPORT 共同监听同一端口，由内核分发连接
+    config["server"]["reuse_port"] = True
+    modules = worker_supervisor.preload_modules(config)
+    log_addresses(config)
+    logger.bind(tag=TAG).info(f"多进程模式，工作进程数: {workers}")
+
+    def worker_main(index):
+        asyncio.run(main(config, modules=modules, worker_index=index))
+
+    worker_supervisor.WorkerSupervisor(workers, worker_main).run()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="小智ESP32服务端")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="工作进程数，大于1时启用多进程模式（需要Linux/macOS等支持fork和SO_REUSEPORT的平台）",
+    )
+    parser.add_argument(
+        "--sidecar",
+        action="store_true",
+        help="以本地推理进程方式运行，加载 server.inference_sidecar 中配置的VAD/ASR模型，通过Unix域套接字为服务进程提供推理",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        config = prepare_config()
+        if args.sidecar:
+            from core import inference_sidecar
+
+            inference_sidecar.run(config)
+        elif args.workers > 1 and worker_supervisor.is_supported():
+            run_workers(config, args.workers)
+        else:
+            if args.workers > 1:
+                logger.bind(tag=TAG).warning("当前平台不支持多进程模式，使用单进程运行")
+            asyncio.run(main(config))
     except KeyboardInterrupt:
         print("手动中断，程序终止。")
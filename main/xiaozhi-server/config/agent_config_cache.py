@@ -0,0 +1,191 @@
+"""
+设备差异化配置缓存
+按设备缓存从 manager-api 获取的智能体配置，避免每次连接都同步请求接口：
+- 缓存未过期：直接返回，不发起请求
+- 缓存已过期：立即返回旧配置，同时在后台刷新
+- 无缓存：异步请求接口（不阻塞事件循环）
+最近使用过的设备会在后台定期刷新（空闲设备不刷新，重连时再按过期处理）；配置的 version 字段（如接口返回）变化时替换缓存，
+也可以通过 purge 显式失效。
+"""
+
+import time
+import copy
+import asyncio
+import hashlib
+import json
+from typing import Dict, Optional
+from config.logger import setup_logging
+from config.manage_api_client import (
+    get_agent_models_async,
+    DeviceNotFoundException,
+    DeviceBindException,
+)
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _Entry:
+    __slots__ = ("config", "version", "fetched_at", "last_used", "client_id", "selected_module")
+
+    def __init__(self, config, version, client_id, selected_module):
+        now = time.monotonic()
+        self.config = config
+        self.version = version
+        self.fetched_at = now
+        self.last_used = now
+        self.client_id = client_id
+        self.selected_module = selected_module
+
+
+class AgentConfigCache:
+    def __init__(self):
+        self.ttl = 300
+        self.refresh_interval = 60
+        self.idle_expire = 86400
+        self.max_size = 10000
+        self.refresh_concurrency = 8
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_task = None
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "purges": 0}
+
+    def configure(self, config: dict):
+        cache_config = config.get("manager-api", {}).get("agent_config_cache") or {}
+        self.ttl = float(cache_config.get("ttl", 300))
+        self.refresh_interval = float(cache_config.get("refresh_interval", 60))
+        self.idle_expire = float(cache_config.get("idle_expire", 86400))
+        self.max_size = int(cache_config.get("max_size", 10000))
+        self.refresh_concurrency = max(1, int(cache_config.get("refresh_concurrency", 8)))
+
+    @staticmethod
+    def _version_of(private_config: dict) -> str:
+        """优先使用接口返回的版本号，否则使用配置内容摘要"""
+        for key in ("version", "configVersion"):
+            if private_config.get(key):
+                return str(private_config[key])
+        content = json.dumps(private_config, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+    async def _fetch(self, device_id, client_id, selected_module, max_retries=None) -> dict:
+        """请求接口，同一设备并发请求合并为一次"""
+        inflight = self._inflight.get(device_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[device_id] = future
+        try:
+            private_config = await get_agent_models_async(
+                device_id, client_id, selected_module, max_retries=max_retries
+            )
+            if private_config is None:
+                raise Exception("获取差异化配置为空")
+            self._store(device_id, private_config, client_id, selected_module)
+            future.set_result(private_config)
+            return private_config
+        except (DeviceNotFoundException, DeviceBindException) as e:
+            # 设备未绑定时不缓存，绑定后下次连接即可获取
+            self._entries.pop(device_id, None)
+            future.set_exception(e)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(device_id, None)
+            # 避免无人等待时出现 "exception was never retrieved" 告警
+            if future.done() and not future.cancelled():
+                future.exception()
+
+    def _store(self, device_id, private_config, client_id, selected_module):
+        version = self._version_of(private_config)
+        entry = self._entries.get(device_id)
+        if entry is not None and entry.version != version:
+            logger.bind(tag=TAG).info(f"设备 {device_id} 配置已更新，版本 {entry.version} -> {version}")
+        new_entry = _Entry(private_config, version, client_id, selected_module)
+        if entry is not None:
+            new_entry.last_used = entry.last_used
+        self._entries[device_id] = new_entry
+        if len(self._entries) > self.max_size:
+            # 淘汰最久未使用的设备
+            oldest = min(self._entries, key=lambda k: self._entries[k].last_used)
+            self._entries.pop(oldest, None)
+
+    async def get(self, device_id: str, client_id: str, selected_module: dict) -> dict:
+        """获取设备差异化配置，返回副本，调用方可以自由修改"""
+        self._ensure_refresh_task()
+        entry = self._entries.get(device_id)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            if time.monotonic() - entry.fetched_at < self.ttl:
+                self._stats["hits"] += 1
+            else:
+                # 过期：先返回旧配置，后台刷新
+                self._stats["stale_hits"] += 1
+                self._schedule_refresh(device_id, entry)
+            return copy.deepcopy(entry.config)
+
+        self._stats["misses"] += 1
+        private_config = await self._fetch(device_id, client_id, selected_module)
+        return copy.deepcopy(private_config)
+
+    def purge(self, device_id: Optional[str] = None) -> int:
+        """显式失效缓存，device_id 为空时清空全部"""
+        if device_id is None:
+            count = len(self._entries)
+            self._entries.clear()
+        else:
+            count = 1 if self._entries.pop(device_id, None) is not None else 0
+        self._stats["purges"] += count
+        return count
+
+    def _schedule_refresh(self, device_id: str, entry: _Entry):
+        if device_id in self._inflight:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._refresh_one(device_id, entry)
+        )
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _refresh_one(self, device_id: str, entry: _Entry):
+        try:
+            # 后台刷新不重试，失败则保留旧配置，等待下一次刷新
+            await self._fetch(device_id, entry.client_id, entry.selected_module, max_retries=0)
+            self._stats["refreshes"] += 1
+        except (DeviceNotFoundException, DeviceBindException):
+            logger.bind(tag=TAG).info(f"设备 {device_id} 已解绑，移除配置缓存")
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"后台刷新设备 {device_id} 配置失败: {e}")
+
+    def _ensure_refresh_task(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        """定期刷新最近使用过的设备的配置，长时间未连接的设备移出缓存"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            now = time.monotonic()
+            due = []
+            for device_id, entry in list(self._entries.items()):
+                if now - entry.last_used > self.idle_expire:
+                    self._entries.pop(device_id, None)
+                elif now - entry.fetched_at >= self.ttl and now - entry.last_used < self.ttl:
+                    due.append((device_id, entry))
+            if not due:
+                continue
+            # 限制并发，避免刷新集中时压垮 manager-api
+            semaphore = asyncio.Semaphore(self.refresh_concurrency)
+
+            async def refresh(device_id, entry):
+                async with semaphore:
+                    await self._refresh_one(device_id, entry)
+
+            await asyncio.gather(*(refresh(device_id, entry) for device_id, entry in due))
+
+    def get_stats(self) -> dict:
+        return {"entries": len(self._entries), **self._stats}
+
+
+agent_config_cache = AgentConfigCache()
@@ -58,6 +58,7 @@ def get_config_from_api(config):
     config_data["manager-api"] = {
         "url": config["manager-api"].get("url", ""),
         "secret": config["manager-api"].get("secret", ""),
+        "agent_config_cache": config["manager-api"].get("agent_config_cache", {}),
     }
     # server的配置以本地为准
     if config.get("server"):
@@ -67,6 +68,17 @@ def get_config_from_api(config):
             "http_port": config["server"].get("http_port", ""),
             "vision_explain": config["server"].get("vision_explain", ""),
             "auth_key": config["server"].get("auth_key", ""),
+            "runtime_mode": config["server"].get("runtime_mode", "thread"),
+            "worker_pools": config["server"].get("worker_pools", {}),
+            "admission": config["server"].get("admission", {}),
+            "metrics_token": config["server"].get("metrics_token", ""),
+            "turn_trace": config["server"].get("turn_trace", {}),
+            "audio_ingest": config["server"].get("audio_ingest", {}),
+            "inference_sidecar": config["server"].get("inference_sidecar", {}),
+            "speculative_asr": config["server"].get("speculative_asr", {}),
+            "prompt_cache": config["server"].get("prompt_cache", {}),
+            "dialogue_window": config["server"].get("dialogue_window", {}),
+            "response_cache": config["server"].get("response_cache", {}),
         }
     return config_data
 
@@ -76,6 +88,13 @@ def get_private_config_from_api(config, device_id, client_id):
     return get_agent_models(device_id, client_id, config["selected_module"])
 
 
+async def get_private_config_async(config, device_id, client_id):
+    """异步获取私有配置，优先使用按设备缓存的配置，返回可自由修改的副本"""
+    from config.agent_config_cache import agent_config_cache
+
+    return await agent_config_cache.get(device_id, client_id, config["selected_module"])
+
+
 def ensure_directories(config):
     """确保所有配置路径存在"""
     dirs_to_create = set()
@@ -1,6 +1,8 @@
 import os
 import time
 import base64
+import asyncio
+import threading
 from typing import Optional, Dict
 
 import httpx
@@ -18,10 +20,61 @@ class DeviceBindException(Exception):
         super().__init__(f"设备绑定异常，绑定码: {bind_code}")
 
 
+class CircuitOpenException(Exception):
+    """熔断器打开期间直接拒绝请求"""
+
+    pass
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却期内直接失败，冷却结束后放行一次试探请求"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_trial = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenException("manager-api 熔断中，暂停请求")
+            # 冷却结束，只放行一个试探请求
+            if self._half_open_trial:
+                raise CircuitOpenException("manager-api 熔断试探中，暂停请求")
+            self._half_open_trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._half_open_trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._half_open_trial = False
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"manager-api 连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+
 class ManageApiClient:
     _instance = None
     _client = None
+    _async_client = None
+    _async_client_loop = None
     _secret = None
+    _breaker = None
 
     def __new__(cls, config):
         """单例模式确保全局唯一实例，并支持传入配置参数"""
@@ -51,19 +104,52 @@ class ManageApiClient:
         # 后续也可以统一配置apiToken之类的走通用的Auth
         cls._client = httpx.Client(
             base_url=cls.config.get("url"),
-            headers={
-                "User-Agent": f"PythonClient/2.0 (PID:{os.getpid()})",
-                "Accept": "application/json",
-                "Authorization": "Bearer " + cls._secret,
-            },
+            headers=cls._headers(),
             timeout=cls.config.get("timeout", 30),  # 默认超时时间30秒
         )
+        # 异步请求的熔断器（同步请求仅用于启动和后台线程，保持原有重试行为）
+        cls._breaker = CircuitBreaker(
+            failure_threshold=cls.config.get("breaker_failure_threshold", 5),
+            reset_timeout=cls.config.get("breaker_reset_timeout", 30),
+        )
+
+    @classmethod
+    def _headers(cls) -> Dict:
+        return {
+            "User-Agent": f"PythonClient/2.0 (PID:{os.getpid()})",
+            "Accept": "application/json",
+            "Authorization": "Bearer " + cls._secret,
+        }
+
+    @classmethod
+    def _get_async_client(cls) -> httpx.AsyncClient:
+        """获取当前事件循环的异步客户端（多进程模式下每个工作进程各自创建）"""
+        loop = asyncio.get_running_loop()
+        if cls._async_client is None or cls._async_client_loop is not loop:
+            cls._async_client = httpx.AsyncClient(
+                base_url=cls.config.get("url"),
+                headers=cls._headers(),
+                timeout=cls.config.get("timeout", 30),
+            )
+            cls._async_client_loop = loop
+        return cls._async_client
 
     @classmethod
     def _request(cls, method: str, endpoint: str, **kwargs) -> Dict:
         """发送单次HTTP请求并处理响应"""
         endpoint = endpoint.lstrip("/")
         response = cls._client.request(method, endpoint, **kwargs)
+        return cls._parse_response(response)
+
+    @classmethod
+    async def _request_async(cls, method: str, endpoint: str, **kwargs) -> Dict:
+        """发送单次异步HTTP请求并处理响应"""
+        endpoint = endpoint.lstrip("/")
+        response = await cls._get_async_client().request(method, endpoint, **kwargs)
+        return cls._parse_response(response)
+
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> Dict:
         response.raise_for_status()
 
         result = response.json()
@@ -117,6 +203,35 @@ class ManageApiClient:
                     # 不重试，直接抛出异常
                     raise
 
+    @classmethod
+    async def _execute_request_async(
+        cls, method: str, endpoint: str, max_retries: int = None, **kwargs
+    ) -> Dict:
+        """异步请求执行器，重试等待不阻塞事件循环，熔断打开时立即失败"""
+        max_retries = cls.max_retries if max_retries is None else max_retries
+        retry_count = 0
+
+        while True:
+            cls._breaker.before_request()
+            try:
+                result = await cls._request_async(method, endpoint, **kwargs)
+                cls._breaker.record_success()
+                return result
+            except Exception as e:
+                if not cls._should_retry(e):
+                    # 业务错误说明服务本身可用
+                    cls._breaker.record_success()
+                    raise
+                cls._breaker.record_failure()
+                if retry_count < max_retries and not cls._breaker.is_open:
+                    retry_count += 1
+                    print(
+                        f"{method} {endpoint} 请求失败，将在 {cls.retry_delay:.1f} 秒后进行第 {retry_count} 次重试"
+                    )
+                    await asyncio.sleep(cls.retry_delay)
+                    continue
+                raise
+
     @classmethod
     def safe_close(cls):
         """安全关闭连接池"""
@@ -145,6 +260,22 @@ def get_agent_models(
     )
 
 
+async def get_agent_models_async(
+    mac_address: str, client_id: str, selected_module: Dict, max_retries: int = None
+) -> Optional[Dict]:
+    """异步获取代理模型配置"""
+    return await ManageApiClient._instance._execute_request_async(
+        "POST",
+        "/config/agent-models",
+        max_retries=max_retries,
+        json={
+            "macAddress": mac_address,
+            "clientId": client_id,
+            "selectedModule": selected_module,
+        },
+    )
+
+
 def save_mem_local_short(mac_address: str, short_momery: str) -> Optional[Dict]:
     try:
         return ManageApiClient._instance._execute_request(
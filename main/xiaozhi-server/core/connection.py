@@ -1,12 +1,12 @@
 import os
 import sys
-import copy
 import json
 import uuid
 import time
 import queue
 import asyncio
 import threading
+import concurrent.futures
 import traceback
 import subprocess
 import websockets
@@ -26,23 +26,33 @@ from core.utils.modules_initialize import (
 )
 from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
-from core.utils.dialogue import Message, Dialogue
+from core.utils.dialogue import Message, Dialogue, summarize_dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action
 from core.auth import AuthenticationError
-from config.config_loader import get_private_config_from_api
+from config.config_loader import get_private_config_async
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
-from core.utils.prompt_manager import PromptManager
+from core.utils.prompt_manager import get_prompt_manager
 from core.utils.voiceprint_provider import VoiceprintProvider
+from core import worker_supervisor
+from core.utils.loop_queue import LoopQueue
+from core.utils.admission import admission
+from core.utils.metrics import LLM_FIRST_TOKEN, LLM_TOKENS_PER_SECOND
+from core.utils.llm_stream import LLMStream
+from core.utils.generation import Generation
+from core.utils.turn_trace import turn_tracer
+from core.utils.response_cache import response_cache
+from core.utils.scheduler import scheduler, ConnectionExecutor, run_coroutine_in_thread
 from core.utils import textUtils
+from core.utils.config_view import ConfigView
 
 TAG = __name__
+logger = setup_logging()
 
 auto_import_modules("plugins_func.functions")
 
@@ -52,6 +62,35 @@ class TTSException(RuntimeError):
 
 
 class ConnectionHandler:
+    # 上万个空闲连接常驻内存，属性使用 __slots__ 存储，不再为每个连接分配属性字典；
+    # 插件和工具函数按需挂到连接上的属性也在此列出（hasattr 判断仍然有效），
+    # 保留 __dict__ 兜底未列出的动态属性，仅在首次设置时才分配
+    __slots__ = (
+        "_asr", "_vad", "asr", "asr_audio", "asr_audio_for_voiceprint",
+        "asr_audio_queue", "asr_priority_task", "asr_priority_thread", "asr_speculation",
+        "audio_flow_control", "audio_format", "audio_ingest", "audio_timestamp_buffer",
+        "bind_code", "chat_history_conf", "client_abort", "client_have_voice",
+        "client_ip", "client_is_speaking",
+        "client_listen_mode", "client_voice_stop", "client_voice_window",
+        "close_after_chat", "cmd_exit", "common_config", "config",
+        "conn_from_mqtt_gateway", "current_speaker", "device_id", "dialogue",
+        "endpoint_state", "executor", "features", "func_handler", "generation",
+        "has_valid_voice",
+        "headers", "intent", "intent_type", "iot_descriptors", "just_woken_up",
+        "last_activity_time", "last_is_voice", "last_news_link",
+        "last_newsnow_link", "last_processed_timestamp", "llm", "llm_finish_task", "llm_stream",
+        "load_function_plugin", "logger", "loop", "max_output_size",
+        "max_timestamp_buffer_size", "mcp_client", "mcp_endpoint_client", "memory",
+        "need_bind", "pipeline_tasks", "prompt", "prompt_manager",
+        "read_config_from_api", "report_asr_enable", "report_queue",
+        "report_thread", "report_tts_enable", "runtime_mode", "selected_module_str",
+        "sentence_id", "server", "session_id", "stop_event", "timeout_seconds",
+        "timeout_task", "tts", "tts_MessageText", "tts_first_text_time",
+        "turn_trace", "vad", "vad_resume_task", "vad_stream", "voiceprint_provider",
+        "websocket", "welcome_msg",
+        "__dict__",
+    )
+
     def __init__(
         self,
         config: Dict[str, Any],
@@ -63,9 +102,10 @@ class ConnectionHandler:
         server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 写时复制视图：未被差异化配置覆盖的部分与全局配置共享
+        self.config = ConfigView(config)
         self.session_id = str(uuid.uuid4())
-        self.logger = setup_logging()
+        self.logger = logger
         self.server = server  # 保存server实例的引用
 
         self.need_bind = False
@@ -90,10 +130,16 @@ class ConnectionHandler:
         # 线程任务相关
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # 任务提交到进程级共享工作池，握手后以设备ID作为公平调度key
+        self.executor = ConnectionExecutor(scheduler, self.session_id)
+
+        # 运行模式：thread 为每个阶段一个线程；asyncio 为事件循环上的协程任务，通过队列串联
+        self.runtime_mode = self.config.get("server", {}).get("runtime_mode", "thread")
+        # asyncio 模式下的流水线任务，连接关闭时统一取消
+        self.pipeline_tasks = []
 
         # 添加上报线程池
-        self.report_queue = queue.Queue()
+        self.report_queue = self._create_queue()
         self.report_thread = None
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
@@ -113,7 +159,10 @@ class ConnectionHandler:
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 上行音频接入缓冲，首次收到音频时创建（见 core.utils.audio_ingest）
+        self.audio_ingest = None
+        # 自适应断句状态（见 core.utils.endpointing）
+        self.endpoint_state = None
         self.client_have_voice = False
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.client_voice_stop = False
@@ -124,14 +173,25 @@ class ConnectionHandler:
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        # 静默开始时提前发起的识别（见 ASRProviderBase._speculate）
+        self.asr_speculation = None
+        self.asr_audio_queue = self._create_queue()
 
         # llm相关变量
         self.llm_finish_task = True
+        # 原生异步LLM正在进行的流式请求，打断时取消
+        self.llm_stream = None
+        # 本轮首段文本送入TTS的时间，TTS收到首个音频后清空
+        self.tts_first_text_time = None
+        # 当前对话轮次的追踪记录
+        self.turn_trace = None
         self.dialogue = Dialogue()
+        self._configure_dialogue_window()
 
         # tts相关变量
         self.sentence_id = None
+        # 当前对话轮次的取消令牌，打断时取消
+        self.generation = None
         # 处理TTS响应没有文本返回
         self.tts_MessageText = ""
 
@@ -157,8 +217,20 @@ class ConnectionHandler:
         # 标记连接是否来自MQTT
         self.conn_from_mqtt_gateway = False
 
-        # 初始化提示词管理器
-        self.prompt_manager = PromptManager(config, self.logger)
+        # 提示词管理器无连接状态，所有连接共享
+        self.prompt_manager = get_prompt_manager(config, self.logger)
+
+    def _create_queue(self):
+        """根据运行模式创建阶段间队列"""
+        if self.runtime_mode == "asyncio":
+            return LoopQueue(self.loop)
+        return queue.Queue()
+
+    def start_pipeline_task(self, coro):
+        """在事件循环上启动流水线任务，并登记以便连接关闭时取消"""
+        task = asyncio.create_task(coro)
+        self.pipeline_tasks.append(task)
+        return task
 
     async def handle_connection(self, ws):
         try:
@@ -176,6 +248,8 @@ class ConnectionHandler:
             )
 
             self.device_id = self.headers.get("device-id", None)
+            if self.device_id:
+                self.executor.set_key(self.device_id)
 
             # 认证通过,继续处理
             self.websocket = ws
@@ -196,9 +270,9 @@ class ConnectionHandler:
             self.welcome_msg["session_id"] = self.session_id
 
             # 获取差异化配置
-            self._initialize_private_config()
+            await self._initialize_private_config()
             # 异步初始化
-            self.executor.submit(self._initialize_components)
+            self.executor.submit_to("init", self._initialize_components)
 
             try:
                 async for message in self.websocket:
@@ -230,25 +304,16 @@ class ConnectionHandler:
         """保存记忆并关闭连接"""
         try:
             if self.memory:
-                # 使用线程池异步保存记忆
+                # 使用共享线程池异步保存记忆，不等待完成
                 def save_memory_task():
                     try:
-                        # 创建新事件循环（避免与主循环冲突）
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
+                        run_coroutine_in_thread(
                             self.memory.save_memory(self.dialogue.dialogue)
                         )
                     except Exception as e:
                         self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
-                    finally:
-                        try:
-                            loop.close()
-                        except Exception:
-                            pass
-
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+
+                self.executor.submit_to("report", save_memory_task)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -364,6 +429,10 @@ class ConnectionHandler:
                 """实际执行重启的方法"""
                 time.sleep(1)
                 self.logger.bind(tag=TAG).info("执行服务器重启...")
+                if worker_supervisor.in_worker_process():
+                    # 多进程模式下由父进程统一重启所有工作进程
+                    worker_supervisor.request_restart()
+                    return
                 subprocess.Popen(
                     [sys.executable, "app.py"],
                     stdin=sys.stdin,
@@ -454,6 +523,13 @@ class ConnectionHandler:
             return
         if self.chat_history_conf == 0:
             return
+        if self.runtime_mode == "asyncio":
+            # asyncio 模式下上报分发是事件循环上的任务，实际上报仍在线程池中执行
+            if self.report_thread is None:
+                self.report_thread = asyncio.run_coroutine_threadsafe(
+                    self._report_task(), self.loop
+                )
+            return
         if self.report_thread is None or not self.report_thread.is_alive():
             self.report_thread = threading.Thread(
                 target=self._report_worker, daemon=True
@@ -465,7 +541,9 @@ class ConnectionHandler:
         """初始化TTS"""
         tts = None
         if not self.need_bind:
-            tts = initialize_tts(self.config)
+            # 过载降级时新连接使用配置的更便宜的TTS
+            tts_config = admission.degraded_tts_config(self.config) or self.config
+            tts = initialize_tts(tts_config)
 
         if tts is None:
             tts = DefaultTTS(self.config, delete_audio_file=True)
@@ -501,14 +579,15 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
+            # 已知设备直接命中缓存，不阻塞事件循环
+            private_config = await get_private_config_async(
                 self.config,
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
@@ -529,6 +608,13 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).error(f"获取差异化配置失败: {e}")
             private_config = {}
 
+        # 模块实例化可能加载模型，放到初始化线程池中执行
+        await asyncio.wrap_future(
+            self.executor.submit_to("init", self._apply_private_config, private_config)
+        )
+
+    def _apply_private_config(self, private_config):
+        """根据差异化配置更新连接配置并实例化变化的模块"""
         init_llm, init_tts, init_memory, init_intent = (
             False,
             False,
@@ -621,11 +707,38 @@ class ConnectionHandler:
             self.asr = modules["asr"]
         if modules.get("llm", None) is not None:
             self.llm = modules["llm"]
+            self._configure_dialogue_window()
         if modules.get("intent", None) is not None:
             self.intent = modules["intent"]
         if modules.get("memory", None) is not None:
             self.memory = modules["memory"]
 
+    def _configure_dialogue_window(self):
+        """按配置设置对话窗口的稳定前缀、token预算和滚动摘要，LLM更换后需重新设置"""
+        prompt_cache = self.config.get("server", {}).get("prompt_cache") or {}
+        stable_prefix = prompt_cache.get("stable_prefix", True) is not False
+        if getattr(self.llm, "server_side_history", False):
+            # 上游自行保存对话历史，只发送最新的用户消息：
+            # 不截断也不摘要，易变片段留在系统提示词中，不混入发给上游的用户消息
+            self.dialogue.stable_prefix = False
+            self.dialogue.max_tokens = 0
+            self.dialogue.set_summarizer(None, None)
+            return
+        self.dialogue.stable_prefix = stable_prefix
+        dialogue_window = self.config.get("server", {}).get("dialogue_window") or {}
+        self.dialogue.max_tokens = int(dialogue_window.get("max_tokens", 0) or 0)
+        self.dialogue.min_turns = int(dialogue_window.get("min_turns", 4))
+        if dialogue_window.get("summary", False):
+            # 超出预算的早期对话在后台由LLM折叠成滚动摘要
+            self.dialogue.set_summarizer(
+                lambda previous, messages: summarize_dialogue(
+                    self.llm, previous, messages
+                ),
+                self.executor.submit,
+            )
+        else:
+            self.dialogue.set_summarizer(None, None)
+
     def _initialize_memory(self):
         if self.memory is None:
             return
@@ -723,20 +836,40 @@ class ConnectionHandler:
         self.dialogue.update_system_message(self.prompt)
 
     def chat(self, query, depth=0):
+        if depth == 0:
+            # 统计进行中的对话轮数，供准入控制判断负载
+            with admission.track_turn():
+                return self._chat(query, depth)
+        return self._chat(query, depth)
+
+    def _chat(self, query, depth=0):
         self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
         self.llm_finish_task = False
 
-        # 为最顶层时新建会话ID和发送FIRST请求
+        # 为最顶层时新建会话ID（对话轮次）和发送FIRST请求
+        cache_key = None
         if depth == 0:
-            self.sentence_id = str(uuid.uuid4().hex)
+            generation = self.new_generation()
+            cache_key = response_cache.prepare(self, query)
+            if cache_key is not None:
+                cached = response_cache.lookup(*cache_key)
+                if cached is not None:
+                    return self._replay_cached_response(query, cached, generation)
+                # 未命中时记录本轮发送的音频，回复完成后写入缓存
+                self.tts.start_capture(generation)
             self.dialogue.put(Message(role="user", content=query))
             self.tts.tts_text_queue.put(
                 TTSMessageDTO(
                     sentence_id=self.sentence_id,
                     sentence_type=SentenceType.FIRST,
                     content_type=ContentType.ACTION,
+                    generation=generation,
                 )
             )
+        else:
+            generation = self.generation
+            if generation.cancelled:
+                return None
 
         # Define intent functions
         functions = None
@@ -753,24 +886,52 @@ class ConnectionHandler:
                 )
                 memory_str = future.result()
 
+            # 过载降级时切换到更便宜的LLM并限制输出长度
+            degraded_llm = admission.get_degraded_llm(self.config)
+            llm = degraded_llm or self.llm
+            llm_name = (
+                admission.degraded_config.get("llm")
+                if degraded_llm
+                else self.config["selected_module"].get("LLM", "")
+            )
+            llm_kwargs = admission.llm_kwargs()
+            # 原生异步的LLM在事件循环上发起请求，打断时可以立即取消上游请求
+            use_async = llm.native_async
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
+                llm_call = (
+                    llm.response_with_functions_async
+                    if use_async
+                    else llm.response_with_functions
+                )
+                llm_responses = llm_call(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
                     ),
                     functions=functions,
+                    **llm_kwargs,
                 )
             else:
-                llm_responses = self.llm.response(
+                llm_call = llm.response_async if use_async else llm.response
+                llm_responses = llm_call(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
                     ),
+                    **llm_kwargs,
+                )
+            remove_cancel = None
+            if use_async:
+                self.cancel_llm_stream()
+                llm_responses = self.llm_stream = LLMStream(
+                    llm_responses, self.loop, llm_name
                 )
+                remove_cancel = generation.on_cancel(llm_responses.cancel)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
+            if cache_key is not None:
+                self.tts.discard_capture(generation)
             return None
 
         # 处理流式响应
@@ -781,9 +942,20 @@ class ConnectionHandler:
         content_arguments = ""
         self.client_abort = False
         emotion_flag = True
+        # 流式生成器在首次迭代时才发起请求，从这里开始计时
+        llm_start_time = time.monotonic()
+        first_chunk_time = None
+        chunk_count = 0
+        turn_tracer.mark(self, "llm_request", llm=llm_name)
         for response in llm_responses:
-            if self.client_abort:
+            if self.client_abort or generation.cancelled:
+                self.cancel_llm_stream()
                 break
+            if first_chunk_time is None:
+                first_chunk_time = time.monotonic()
+                LLM_FIRST_TOKEN.observe(first_chunk_time - llm_start_time, provider=llm_name)
+                turn_tracer.mark(self, "llm_first_token")
+            chunk_count += 1
             if self.intent_type == "function_call" and functions is not None:
                 content, tools_call = response
                 if "content" in response:
@@ -817,6 +989,9 @@ class ConnectionHandler:
 
             if content is not None and len(content) > 0:
                 if not tool_call_flag:
+                    if not response_message and depth == 0:
+                        # 记录本轮首段文本送入TTS的时间，用于统计TTS首包耗时
+                        self.tts_first_text_time = time.monotonic()
                     response_message.append(content)
                     self.tts.tts_text_queue.put(
                         TTSMessageDTO(
@@ -824,10 +999,21 @@ class ConnectionHandler:
                             sentence_type=SentenceType.MIDDLE,
                             content_type=ContentType.TEXT,
                             content_detail=content,
+                            generation=generation,
                         )
                     )
-        # 处理function call
-        if tool_call_flag:
+        self.llm_stream = None
+        if remove_cancel:
+            remove_cancel()
+        if chunk_count > 1:
+            stream_time = time.monotonic() - first_chunk_time
+            if stream_time > 0:
+                LLM_TOKENS_PER_SECOND.observe(
+                    (chunk_count - 1) / stream_time, provider=llm_name
+                )
+
+        # 处理function call（本轮已被打断时不再调用工具）
+        if tool_call_flag and not generation.cancelled:
             bHasError = False
             if function_id is None:
                 a = extract_json_from_string(content_arguments)
@@ -865,26 +1051,56 @@ class ConnectionHandler:
                     "arguments": function_arguments,
                 }
 
-                # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
+                # 使用统一工具处理器处理所有工具调用，本轮被打断时取消
+                future = asyncio.run_coroutine_threadsafe(
                     self.func_handler.handle_llm_function_call(
                         self, function_call_data
                     ),
                     self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+                )
+                remove_cancel = generation.on_cancel(future.cancel)
+                try:
+                    result = future.result()
+                except concurrent.futures.CancelledError:
+                    self.logger.bind(tag=TAG).info(
+                        f"对话已打断，取消工具调用: {function_name}"
+                    )
+                    result = None
+                finally:
+                    remove_cancel()
+                if result is not None:
+                    self._handle_function_result(
+                        result, function_call_data, depth=depth
+                    )
 
         # 存储对话内容
+        text_buff = ""
         if len(response_message) > 0:
             text_buff = "".join(response_message)
             self.tts_MessageText = text_buff
             self.dialogue.put(Message(role="assistant", content=text_buff))
+        if cache_key is not None:
+            # 调用了工具、被打断或LLM出错的回复不缓存
+            if (
+                tool_call_flag
+                or generation.cancelled
+                or self.client_abort
+                or not text_buff
+                or (text_buff.startswith("【") and text_buff.endswith("】"))
+            ):
+                self.tts.discard_capture(generation)
+            else:
+                self.tts.finish_capture(
+                    generation,
+                    lambda audio: response_cache.store(*cache_key, text_buff, audio),
+                )
         if depth == 0:
             self.tts.tts_text_queue.put(
                 TTSMessageDTO(
                     sentence_id=self.sentence_id,
                     sentence_type=SentenceType.LAST,
                     content_type=ContentType.ACTION,
+                    generation=generation,
                 )
             )
         self.llm_finish_task = True
@@ -897,6 +1113,46 @@ class ConnectionHandler:
 
         return True
 
+    def _replay_cached_response(self, query, cached, generation):
+        """回复缓存命中：直接回放上次的回复文本和音频，不再请求LLM和TTS"""
+        self.dialogue.put(Message(role="user", content=query))
+        self.dialogue.put(Message(role="assistant", content=cached.text))
+        self.tts_MessageText = cached.text
+        self.client_abort = False
+        turn_tracer.mark(self, "response_cache_hit")
+        asyncio.run_coroutine_threadsafe(
+            textUtils.get_emotion(self, cached.text), self.loop
+        )
+        # 回放的最后一个音频发送后即结束本轮
+        self.llm_finish_task = True
+        self.tts.replay_audio(generation, cached.audio)
+        return True
+
+    def new_generation(self):
+        """开始新的一轮对话，创建本轮的取消令牌，令牌id即本轮的sentence_id"""
+        generation = Generation()
+        self.generation = generation
+        self.sentence_id = generation.id
+        return generation
+
+    def abort_generation(self):
+        """打断当前轮次：取消本轮所有进行中的上游请求（LLM、TTS合成、工具调用），
+        队列中残留的本轮数据不再逐个清空，出队时直接丢弃"""
+        generation = self.generation
+        if generation is not None:
+            generation.cancel()
+        self.cancel_llm_stream()
+        # 重置音频流控，下一轮的首个音频无需按被打断音频的发送计划等待
+        if hasattr(self, "audio_flow_control"):
+            del self.audio_flow_control
+
+    def cancel_llm_stream(self):
+        """取消正在进行的LLM上游请求（仅原生异步的LLM）"""
+        stream = self.llm_stream
+        if stream is not None:
+            self.llm_stream = None
+            stream.cancel()
+
     def _handle_function_result(self, result, function_call_data, depth):
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
@@ -959,7 +1215,7 @@ class ConnectionHandler:
                     if self.executor is None:
                         continue
                     # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
+                    self.executor.submit_to("report", self._process_report, *item)
                 except Exception as e:
                     self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
             except queue.Empty:
@@ -969,6 +1225,22 @@ class ConnectionHandler:
 
         self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
 
+    async def _report_task(self):
+        """聊天记录上报分发任务（asyncio模式）"""
+        self.pipeline_tasks.append(asyncio.current_task())
+        while not self.stop_event.is_set():
+            item = await self.report_queue.get()
+            if item is None:  # 检测毒丸对象
+                break
+            try:
+                if self.executor is None:
+                    continue
+                self.executor.submit_to("report", self._process_report, *item)
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"聊天记录上报任务异常: {e}")
+
+        self.logger.bind(tag=TAG).info("聊天记录上报任务已退出")
+
     def _process_report(self, type, text, audio_data, report_time):
         """处理上报任务"""
         try:
@@ -987,6 +1259,8 @@ class ConnectionHandler:
     async def close(self, ws=None):
         """资源清理方法"""
         try:
+            turn_tracer.finish_turn(self, "closed")
+
             # 清理音频缓冲区
             if hasattr(self, "audio_buffer"):
                 self.audio_buffer.clear()
@@ -1009,10 +1283,20 @@ class ConnectionHandler:
                         f"清理工具处理器时出错: {cleanup_error}"
                     )
 
+            # 连接断开后不再需要LLM的输出
+            self.cancel_llm_stream()
+
             # 触发停止事件
             if self.stop_event:
                 self.stop_event.set()
 
+            # 取消asyncio模式下的流水线任务（close可能由流水线任务自身触发，跳过当前任务）
+            current_task = asyncio.current_task()
+            for task in self.pipeline_tasks:
+                if task is not current_task and not task.done():
+                    task.cancel()
+            self.pipeline_tasks.clear()
+
             # 清空任务队列
             self.clear_queues()
 
@@ -1055,7 +1339,7 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
+            # 最后关闭执行器，不再接受新任务（共享线程池本身不关闭）
             if self.executor:
                 try:
                     self.executor.shutdown(wait=False)
@@ -1099,7 +1383,10 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        if self.audio_ingest is not None:
+            self.audio_ingest.reset_vad()
+        if self.endpoint_state is not None:
+            self.endpoint_state.reset()
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
@@ -1,4 +1,5 @@
 import json
+from core.utils.turn_trace import turn_tracer
 
 TAG = __name__
 
@@ -7,7 +8,12 @@ async def handleAbortMessage(conn):
     conn.logger.bind(tag=TAG).info("Abort message received")
     # 设置成打断状态，会自动打断llm、tts任务
     conn.client_abort = True
-    conn.clear_queues()
+    # 取消本轮的LLM、TTS合成和工具调用，队列中本轮的残留数据出队时直接丢弃，无需逐个清空
+    conn.abort_generation()
+    # 正在播放的轮次被打断（新一轮在语音结束时才创建，此时尚未开始播放）
+    trace = conn.turn_trace
+    if trace is not None and "first_packet_sent" in trace.spans:
+        turn_tracer.finish_turn(conn, "aborted")
     # 打断客户端说话状态
     await conn.websocket.send(
         json.dumps({"type": "tts", "state": "stop", "session_id": conn.session_id})
@@ -1,11 +1,13 @@
 import json
 import uuid
+import concurrent.futures
 import asyncio
 from core.utils.dialogue import Message
 from core.providers.tts.dto.dto import ContentType
 from core.handle.helloHandle import checkWakeupWords
 from plugins_func.register import Action, ActionResponse
 from core.handle.sendAudioHandle import send_stt_message
+from core.utils.admission import admission
 from core.utils.util import remove_punctuation_and_length
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 
@@ -35,12 +37,15 @@ async def handle_user_intent(conn, text):
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
+    if admission.skip_intent():
+        # 过载降级时跳过LLM意图分析，直接进入对话
+        return False
     # 使用LLM进行意图分析
     intent_result = await analyze_intent_with_llm(conn, text)
     if not intent_result:
         return False
-    # 会话开始时生成sentence_id
-    conn.sentence_id = str(uuid.uuid4().hex)
+    # 会话开始时生成新的对话轮次（sentence_id）
+    conn.new_generation()
     # 处理各种意图
     return await process_intent_result(conn, intent_result, text)
 
@@ -136,15 +141,26 @@ async def process_intent_result(conn, intent_result, original_text):
             # 使用executor执行函数调用和结果处理
             def process_function_call():
                 conn.dialogue.put(Message(role="user", content=original_text))
+                generation = conn.generation
 
-                # 使用统一工具处理器处理所有工具调用
+                # 使用统一工具处理器处理所有工具调用，本轮被打断时取消
                 try:
-                    result = asyncio.run_coroutine_threadsafe(
+                    future = asyncio.run_coroutine_threadsafe(
                         conn.func_handler.handle_llm_function_call(
                             conn, function_call_data
                         ),
                         conn.loop,
-                    ).result()
+                    )
+                    remove_cancel = generation.on_cancel(future.cancel)
+                    try:
+                        result = future.result()
+                    finally:
+                        remove_cancel()
+                except concurrent.futures.CancelledError:
+                    conn.logger.bind(tag=TAG).info(
+                        f"对话已打断，取消工具调用: {function_name}"
+                    )
+                    return
                 except Exception as e:
                     conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
                     result = ActionResponse(
@@ -180,7 +196,7 @@ async def process_intent_result(conn, intent_result, original_text):
                             speak_txt(conn, text)
 
             # 将函数执行放在线程池中
-            conn.executor.submit(process_function_call)
+            conn.executor.submit_to("tool", process_function_call)
             return True
         return False
     except json.JSONDecodeError as e:
@@ -194,6 +210,7 @@ def speak_txt(conn, text):
             sentence_id=conn.sentence_id,
             sentence_type=SentenceType.FIRST,
             content_type=ContentType.ACTION,
+            generation=conn.generation,
         )
     )
     conn.tts.tts_one_sentence(conn, ContentType.TEXT, content_detail=text)
@@ -202,6 +219,7 @@ def speak_txt(conn, text):
             sentence_id=conn.sentence_id,
             sentence_type=SentenceType.LAST,
             content_type=ContentType.ACTION,
+            generation=conn.generation,
         )
     )
     conn.dialogue.put(Message(role="assistant", content=text))
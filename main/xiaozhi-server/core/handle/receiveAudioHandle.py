@@ -2,6 +2,9 @@ import time
 import json
 import asyncio
 from core.utils.util import audio_to_data
+from core.utils.metrics import VAD_INFERENCE
+from core.utils.turn_trace import turn_tracer
+from core.utils.audio_ingest import get_ingest
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
@@ -11,8 +14,15 @@ TAG = __name__
 
 
 async def handleAudioMessage(conn, audio):
+    # 音频包只在这里解码一次，VAD、ASR、声纹识别共用解码结果
+    vad_start = time.perf_counter()
+    get_ingest(conn).push(audio)
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, audio)
+    have_voice = await conn.vad.is_vad_async(conn, audio)
+    VAD_INFERENCE.observe(
+        time.perf_counter() - vad_start,
+        provider=conn.config["selected_module"].get("VAD", ""),
+    )
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
@@ -67,6 +77,9 @@ async def startToChat(conn, text):
         await check_bind_device(conn)
         return
 
+    turn_tracer.ensure_turn(conn)
+    turn_tracer.mark(conn, "start_to_chat")
+
     # 如果当日的输出字数大于限定的字数
     if conn.max_output_size > 0:
         if check_device_output_limit(
@@ -79,7 +92,9 @@ async def startToChat(conn, text):
         await handleAbortMessage(conn)
 
     # 首先进行意图分析，使用实际文本内容
+    turn_tracer.mark(conn, "intent_start")
     intent_handled = await handle_user_intent(conn, actual_text)
+    turn_tracer.mark(conn, "intent_done", intent_handled=intent_handled)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
@@ -117,9 +132,15 @@ async def no_voice_close_connect(conn, have_voice):
             await startToChat(conn, prompt)
 
 
+def start_prompt_generation(conn):
+    """直接向音频队列投递提示音前开始新的对话轮次，避免随上一轮的打断状态一起被丢弃"""
+    conn.tts.generation = conn.new_generation()
+
+
 async def max_out_size(conn):
     # 播放超出最大输出字数的提示
     conn.client_abort = False
+    start_prompt_generation(conn)
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
     file_path = "config/assets/max_output_size.wav"
@@ -139,6 +160,7 @@ async def check_bind_device(conn):
 
         text = f"请登录控制面板，输入{conn.bind_code}，绑定设备。"
         await send_stt_message(conn, text)
+        start_prompt_generation(conn)
 
         # 播放提示音
         music_path = "config/assets/bind_code.wav"
@@ -159,6 +181,7 @@ async def check_bind_device(conn):
     else:
         # 播放未绑定提示
         conn.client_abort = False
+        start_prompt_generation(conn)
         text = f"没有找到该设备的版本信息，请正确配置 OTA地址，然后重新编译固件。"
         await send_stt_message(conn, text)
         music_path = "config/assets/bind_not_found.wav"
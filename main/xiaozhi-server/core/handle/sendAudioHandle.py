@@ -3,12 +3,15 @@ import time
 import asyncio
 from core.utils import textUtils
 from core.utils.util import audio_to_data
+from core.utils.metrics import AUDIO_SEND_JITTER
+from core.utils.turn_trace import turn_tracer
+from core.utils.generation import is_stale
 from core.providers.tts.dto.dto import SentenceType
 
 TAG = __name__
 
 
-async def sendAudioMessage(conn, sentenceType, audios, text):
+async def sendAudioMessage(conn, sentenceType, audios, text, generation=None):
     if conn.tts.tts_audio_first_sentence:
         conn.logger.bind(tag=TAG).info(f"发送第一段语音: {text}")
         conn.tts.tts_audio_first_sentence = False
@@ -17,13 +20,16 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
     if sentenceType == SentenceType.FIRST:
         await send_tts_message(conn, "sentence_start", text)
 
-    await sendAudio(conn, audios)
+    await sendAudio(conn, audios, generation=generation)
+    if audios:
+        turn_tracer.mark(conn, "first_packet_sent")
     # 发送句子开始消息
     if sentenceType is not SentenceType.MIDDLE:
         conn.logger.bind(tag=TAG).info(f"发送音频消息: {sentenceType}, {text}")
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
+        turn_tracer.finish_turn(conn)
         await send_tts_message(conn, "stop", None)
         conn.client_is_speaking = False
         if conn.close_after_chat:
@@ -78,7 +84,7 @@ async def _send_to_mqtt_gateway(conn, opus_packet, timestamp, sequence):
 
 
 # 播放音频
-async def sendAudio(conn, audios, frame_duration=60):
+async def sendAudio(conn, audios, frame_duration=60, generation=None):
     """
     发送单个opus包，支持流控
     Args:
@@ -86,12 +92,13 @@ async def sendAudio(conn, audios, frame_duration=60):
         opus_packet: 单个opus数据包
         pre_buffer: 快速发送音频
         frame_duration: 帧时长（毫秒），匹配 Opus 编码
+        generation: 音频所属的对话轮次，被打断后停止发送
     """
     if audios is None or len(audios) == 0:
         return
 
     if isinstance(audios, bytes):
-        if conn.client_abort:
+        if conn.client_abort or is_stale(generation):
             return
 
         conn.last_activity_time = time.time() * 1000
@@ -117,6 +124,8 @@ async def sendAudio(conn, audios, frame_duration=60):
         else:
             # 纠正误差
             flow_control["start_time"] += abs(delay)
+        # 记录实际发送时间相对计划时间的偏差
+        AUDIO_SEND_JITTER.observe(max(time.perf_counter() - expected_time, 0.0))
 
         if conn.conn_from_mqtt_gateway:
             # 计算时间戳和序列号
@@ -158,7 +167,7 @@ async def sendAudio(conn, audios, frame_duration=60):
 
         # 播放剩余音频帧
         for i, opus_packet in enumerate(remaining_audios):
-            if conn.client_abort:
+            if conn.client_abort or is_stale(generation):
                 break
 
             # 重置没有声音的状态
@@ -239,3 +248,15 @@ async def send_stt_message(conn, text):
     )
     conn.client_is_speaking = True
     await send_tts_message(conn, "start")
+
+
+async def send_stt_partial_message(conn, text):
+    """发送流式识别的中间结果，设备可据此实时显示正在识别的文字"""
+    stt_text = textUtils.get_string_no_punctuation_or_emoji(text)
+    if not stt_text:
+        return
+    await conn.websocket.send(
+        json.dumps(
+            {"type": "stt", "state": "partial", "text": stt_text, "session_id": conn.session_id}
+        )
+    )
@@ -26,6 +26,8 @@ class ListenTextMessageHandler(TextMessageHandler):
         if msg_json["state"] == "start":
             conn.client_have_voice = True
             conn.client_voice_stop = False
+            if conn.asr is not None:
+                conn.asr.prewarm(conn)
         elif msg_json["state"] == "stop":
             conn.client_have_voice = True
             conn.client_voice_stop = True
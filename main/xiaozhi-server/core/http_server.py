@@ -3,6 +3,10 @@ from aiohttp import web
 from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
 from core.api.vision_handler import VisionHandler
+from core.utils.metrics import registry
+from core.utils.turn_trace import turn_tracer
+from config.agent_config_cache import agent_config_cache
+from core import worker_supervisor
 
 TAG = __name__
 
@@ -13,6 +17,17 @@ class SimpleHttpServer:
         self.logger = setup_logging()
         self.ota_handler = OTAHandler(config)
         self.vision_handler = VisionHandler(config)
+        # 多进程模式下其他工作进程收到的失效请求经父进程转发到本进程
+        worker_supervisor.on_message(
+            "config_purge",
+            lambda message: agent_config_cache.purge(message.get("device_id")),
+        )
+        # 多进程模式下 /metrics 和 /xiaozhi/traces 合并各工作进程发布的快照
+        worker_supervisor.add_snapshot("metrics", registry.families)
+        worker_supervisor.add_snapshot(
+            "traces",
+            lambda: list(turn_tracer.ring.records) if turn_tracer.ring else [],
+        )
 
     def _get_websocket_url(self, local_ip: str, port: int) -> str:
         """获取websocket地址
@@ -32,6 +47,72 @@ class SimpleHttpServer:
         else:
             return f"ws://{local_ip}:{port}/xiaozhi/v1/"
 
+    def _observability_authorized(self, request) -> bool:
+        """/metrics 和 /xiaozhi/traces 的访问校验
+
+        需携带 Authorization: Bearer <server.metrics_token>，未配置时使用 manager-api.secret；
+        两者都未配置时只允许本机访问
+        """
+        token = self.config["server"].get("metrics_token") or self.config.get(
+            "manager-api", {}
+        ).get("secret", "")
+        if token:
+            return request.headers.get("Authorization") == f"Bearer {token}"
+        return request.remote in ("127.0.0.1", "::1")
+
+    async def metrics_handler(self, request):
+        """Prometheus 指标导出接口，多进程模式下包含全部工作进程的指标（以 worker 标签区分）"""
+        if not self._observability_authorized(request):
+            return web.json_response({"error": "认证失败"}, status=401)
+        return web.Response(
+            text=registry.render(worker_supervisor.read_snapshots("metrics")),
+            content_type="text/plain",
+        )
+
+    async def traces_handler(self, request):
+        """查询最近的对话轮次追踪记录，支持 device_id、limit 参数，多进程模式下包含全部工作进程的记录
+
+        记录包含设备ID（MAC地址），与 /metrics 使用相同的访问校验
+        """
+        if not self._observability_authorized(request):
+            return web.json_response({"error": "认证失败"}, status=401)
+        if turn_tracer.ring is None:
+            return web.json_response(
+                {"error": "未启用轮次追踪的内存输出(ring)"}, status=404
+            )
+        try:
+            limit = int(request.query.get("limit", 50))
+        except ValueError:
+            limit = 50
+        records = turn_tracer.ring.query(
+            request.query.get("device_id"),
+            limit,
+            worker_supervisor.read_snapshots("traces"),
+        )
+        return web.json_response({"traces": records})
+
+    async def config_purge_handler(self, request):
+        """使设备差异化配置缓存失效，供智控台修改配置后调用
+
+        需携带 Authorization: Bearer <manager-api.secret>，device_id 为空时清空全部缓存。
+        多进程模式下请求只会到达其中一个工作进程，由它广播给其他工作进程；
+        返回的 purged 和统计数据只是本进程的，broadcast 表示是否已通知其他工作进程
+        """
+        secret = self.config.get("manager-api", {}).get("secret", "")
+        if not secret or request.headers.get("Authorization") != f"Bearer {secret}":
+            return web.json_response({"error": "认证失败"}, status=401)
+        device_id = request.query.get("device_id")
+        if device_id is None and request.can_read_body:
+            try:
+                device_id = (await request.json()).get("device_id")
+            except Exception:
+                device_id = None
+        purged = agent_config_cache.purge(device_id or None)
+        broadcast = worker_supervisor.broadcast("config_purge", device_id=device_id or None)
+        return web.json_response(
+            {"purged": purged, "broadcast": broadcast, **agent_config_cache.get_stats()}
+        )
+
     async def start(self):
         server_config = self.config["server"]
         read_config_from_api = self.config.get("read_config_from_api", False)
@@ -50,9 +131,15 @@ class SimpleHttpServer:
                         web.options("/xiaozhi/ota/", self.ota_handler.handle_post),
                     ]
                 )
+            if read_config_from_api:
+                app.add_routes(
+                    [web.post("/xiaozhi/config/purge", self.config_purge_handler)]
+                )
             # 添加路由
             app.add_routes(
                 [
+                    web.get("/metrics", self.metrics_handler),
+                    web.get("/xiaozhi/traces", self.traces_handler),
                     web.get("/mcp/vision/explain", self.vision_handler.handle_get),
                     web.post("/mcp/vision/explain", self.vision_handler.handle_post),
                     web.options("/mcp/vision/explain", self.vision_handler.handle_post),
@@ -62,7 +149,10 @@ class SimpleHttpServer:
             # 运行服务
             runner = web.AppRunner(app)
             await runner.setup()
-            site = web.TCPSite(runner, host, port)
+            # 多进程模式下各工作进程通过 SO_REUSEPORT 监听同一端口
+            site = web.TCPSite(
+                runner, host, port, reuse_port=server_config.get("reuse_port", False)
+            )
             await site.start()
 
             # 保持服务运行
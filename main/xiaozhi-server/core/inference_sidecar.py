@@ -0,0 +1,145 @@
+"""
+本地推理旁路进程（sidecar）
+独立进程中加载VAD和本地ASR模型，通过Unix域套接字为同一台机器上的所有服务进程提供推理：
+- 多个服务进程（或多个 --workers 工作进程）共用一份模型权重
+- 推理占用的CPU与服务进程的事件循环隔离，不影响音频下发节奏
+- VAD请求进入批量推理引擎，ASR请求进入本地ASR的批量解码调度，不同服务进程的请求可以合并成一批
+协议和客户端见 core/utils/sidecar_client.py。启动方式：python app.py --sidecar
+"""
+
+import os
+import asyncio
+import numpy as np
+from config.logger import setup_logging
+from core.utils import vad, asr
+from core.providers.asr.dto.dto import InterfaceType
+from core.utils.scheduler import run_coroutine_in_thread
+from core.utils.vad_engine import VADStream, CHUNK_SAMPLES, CONTEXT_SAMPLES, STATE_SIZE
+from core.utils.sidecar_client import (
+    DEFAULT_SOCKET_PATH,
+    encode_frame,
+    read_frame,
+    attach_shared_memory,
+)
+
+TAG = __name__
+logger = setup_logging()
+
+_STATE_LEN = 2 * STATE_SIZE
+_HEAD_LEN = _STATE_LEN + CONTEXT_SAMPLES
+
+
+def _create_module(config: dict, module_type: str, name: str, factory, *args):
+    module_config = config.get(module_type, {}).get(name)
+    if module_config is None:
+        raise ValueError(f"推理进程配置的{module_type}不存在: {name}")
+    return factory.create_instance(module_config.get("type", name), module_config, *args)
+
+
+class InferenceSidecar:
+    def __init__(self, config: dict):
+        sidecar_config = config.get("server", {}).get("inference_sidecar") or {}
+        self.socket_path = sidecar_config.get("socket_path") or DEFAULT_SOCKET_PATH
+        self.vad = None
+        self.asr = None
+        if sidecar_config.get("vad"):
+            self.vad = _create_module(config, "VAD", sidecar_config["vad"], vad)
+            if not hasattr(self.vad, "engine") or self.vad.engine_name == "sidecar":
+                raise ValueError("推理进程只能加载 silero / silero_onnx 类型的VAD")
+            logger.bind(tag=TAG).info(f"推理进程已加载VAD: {sidecar_config['vad']}")
+        if sidecar_config.get("asr"):
+            self.asr = _create_module(
+                config,
+                "ASR",
+                sidecar_config["asr"],
+                asr,
+                str(config.get("delete_audio", True)).lower() in ("true", "1", "yes"),
+            )
+            if self.asr.interface_type != InterfaceType.LOCAL or type(self.asr).__module__.endswith(".sidecar"):
+                raise ValueError("推理进程只能加载本地ASR（fun_local、sherpa_onnx_local、vosk）")
+            logger.bind(tag=TAG).info(f"推理进程已加载ASR: {sidecar_config['asr']}")
+
+    async def serve(self):
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        logger.bind(tag=TAG).info(f"推理进程已启动: {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_client(self, reader, writer):
+        # 每个客户端进程一块共享内存，按名称附加一次
+        segments = {}
+        tasks = set()
+        try:
+            while True:
+                try:
+                    message = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                task = asyncio.create_task(self._dispatch(message, segments, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            for shm in segments.values():
+                shm.close()
+
+    async def _dispatch(self, message, segments, writer):
+        response = {"id": message.get("id"), "ok": True}
+        try:
+            name = message["shm"]
+            shm = segments.get(name)
+            if shm is None:
+                shm = segments[name] = attach_shared_memory(name)
+            op = message.get("op")
+            if op == "vad":
+                await self._vad(shm, message)
+            elif op == "asr":
+                response["text"] = await self._asr(shm, message)
+            else:
+                raise ValueError(f"不支持的请求类型: {op}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"推理请求失败: {e}")
+            response = {"id": message.get("id"), "ok": False, "error": str(e)}
+        writer.write(encode_frame(response))
+        await writer.drain()
+
+    async def _vad(self, shm, message):
+        if self.vad is None:
+            raise RuntimeError("推理进程未加载VAD")
+        count = int(message["count"])
+        size = _HEAD_LEN + count * (CHUNK_SAMPLES + 1)
+        view = np.ndarray((size,), dtype=np.float32, buffer=shm.buf, offset=int(message["offset"]))
+        stream = VADStream()
+        stream.state = view[:_STATE_LEN].reshape(2, STATE_SIZE).copy()
+        stream.context = view[_STATE_LEN:_HEAD_LEN].copy()
+        chunks = list(view[_HEAD_LEN : _HEAD_LEN + count * CHUNK_SAMPLES].reshape(count, CHUNK_SAMPLES))
+        probs = await self.vad.engine.infer_async(stream, chunks)
+        # 推理结果和新的循环状态写回客户端的共享内存
+        view[:_STATE_LEN] = stream.state.reshape(-1)
+        view[_STATE_LEN:_HEAD_LEN] = stream.context
+        view[_HEAD_LEN + count * CHUNK_SAMPLES :] = probs
+
+    async def _asr(self, shm, message) -> str:
+        if self.asr is None:
+            raise RuntimeError("推理进程未加载ASR")
+        offset = int(message["offset"])
+        pcm = bytes(shm.buf[offset : offset + int(message["size"])])
+        session_id = message.get("session_id", "")
+        # 本地ASR的识别是阻塞调用，放到线程中执行，多个请求由其批量解码调度合并
+        text, _ = await asyncio.to_thread(
+            lambda: run_coroutine_in_thread(self.asr.speech_to_text([pcm], session_id, "pcm"))
+        )
+        return text or ""
+
+
+def run(config: dict):
+    sidecar = InferenceSidecar(config)
+    try:
+        asyncio.run(sidecar.serve())
+    except KeyboardInterrupt:
+        logger.bind(tag=TAG).info("推理进程已退出")
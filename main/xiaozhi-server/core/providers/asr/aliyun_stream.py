@@ -7,7 +7,6 @@ import hashlib
 import asyncio
 import requests
 import websockets
-import opuslib_next
 import random
 from typing import Optional, Tuple, List
 from urllib import parse
@@ -15,6 +14,8 @@ from datetime import datetime
 from config.logger import setup_logging
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.warm_connection import WarmConnectionManager
+from core.utils.uplink_codec import OGG_OPUS, create_uplink
 
 TAG = __name__
 logger = setup_logging()
@@ -67,12 +68,16 @@ class AccessToken:
 
 
 class ASRProvider(ASRProviderBase):
+    # 实时语音识别支持 format=opus（Ogg封装）
+    uplink_codecs = (OGG_OPUS,)
+
     def __init__(self, config, delete_audio_file):
         super().__init__()
         self.interface_type = InterfaceType.STREAM
         self.config = config
         self.text = ""
-        self.decoder = opuslib_next.Decoder(16000, 1)
+        self.conn = None
+        self.uplink = None
         self.asr_ws = None
         self.forward_task = None
         self.is_processing = False
@@ -95,6 +100,8 @@ class ASRProvider(ASRProviderBase):
         self.output_dir = config.get("output_dir", "./audio_output")
         self.delete_audio_file = delete_audio_file
         self.expire_time = None
+        # 预热会话时提前多少秒刷新Token，避免说话时才发现Token过期
+        self.token_refresh_ahead = float(config.get("token_refresh_ahead", 300))
 
         # Token管理
         if self.access_key_id and self.access_key_secret:
@@ -102,6 +109,16 @@ class ASRProvider(ASRProviderBase):
         elif not self.token:
             raise ValueError("必须提供access_key_id+access_key_secret或者直接提供token")
 
+        # 上行音频编码：auto 表示设备上行Opus时直接封装成Ogg转发，pcm 表示解码后发送
+        self.uplink_preference = config.get("uplink_codec", "auto")
+        # 上游会话预热
+        self.warm = WarmConnectionManager(
+            self._open_session,
+            self._close_session,
+            config,
+            session_key=self._uplink_codec,
+        )
+
     def _refresh_token(self):
         """刷新Token"""
         self.token, expire_time_str = AccessToken.create_token(self.access_key_id, self.access_key_secret)
@@ -118,12 +135,20 @@ class ASRProvider(ASRProviderBase):
         except:
             self.expire_time = None
 
-    def _is_token_expired(self):
-        """检查Token是否过期"""
-        return self.expire_time and time.time() > self.expire_time
+    def _is_token_expired(self, ahead=0):
+        """检查Token是否过期（ahead秒内即将过期也算）"""
+        return self.expire_time and time.time() > self.expire_time - ahead
 
     async def open_audio_channels(self, conn):
         await super().open_audio_channels(conn)
+        self.conn = conn
+        self.warm.start(conn)
+
+    def _uplink_codec(self) -> str:
+        return self.negotiate_uplink(self.conn, self.uplink_preference)
+
+    def prewarm(self, conn):
+        self.warm.touch()
 
     async def receive_audio(self, conn, audio, audio_have_voice):
         # 初始化音频缓存
@@ -144,24 +169,26 @@ class ASRProvider(ASRProviderBase):
             except Exception as e:
                 logger.bind(tag=TAG).error(f"开始识别失败: {str(e)}")
                 await self._cleanup(conn)
-                return
+            # 当前音频已随缓存音频一起发送
+            return
 
         if self.asr_ws and self.is_processing and self.server_ready:
             try:
-                pcm_frame = self.decoder.decode(audio, 960)
-                await self.asr_ws.send(pcm_frame)
+                data = self.uplink.encode(audio)
+                if data:
+                    await self.asr_ws.send(data)
             except Exception as e:
                 logger.bind(tag=TAG).warning(f"发送音频失败: {str(e)}")
                 await self._cleanup(conn)
 
-    async def _start_recognition(self, conn):
-        """开始识别会话"""
-        if self._is_token_expired():
-            self._refresh_token()
-        
-        # 建立连接
+    async def _open_session(self):
+        """建立连接并完成StartTranscription握手，返回可直接发送音频的连接"""
+        if self.access_key_id and self._is_token_expired(self.token_refresh_ahead):
+            # 获取Token是同步HTTP请求，放到线程中执行
+            await asyncio.to_thread(self._refresh_token)
+
         headers = {"X-NLS-Token": self.token}
-        self.asr_ws = await websockets.connect(
+        asr_ws = await websockets.connect(
             self.ws_url,
             additional_headers=headers,
             max_size=1000000000,
@@ -169,34 +196,72 @@ class ASRProvider(ASRProviderBase):
             ping_timeout=None,
             close_timeout=5,
         )
-        
+
+        try:
+            # 发送开始请求
+            start_request = {
+                "header": {
+                    "namespace": "SpeechTranscriber",
+                    "name": "StartTranscription",
+                    "status": 20000000,
+                    "message_id": ''.join(random.choices('0123456789abcdef', k=32)),
+                    "task_id": ''.join(random.choices('0123456789abcdef', k=32)),
+                    "status_text": "Gateway:SUCCESS:Success.",
+                    "appkey": self.appkey
+                },
+                "payload": {
+                    "format": "opus" if self._uplink_codec() == OGG_OPUS else "pcm",
+                    "sample_rate": 16000,
+                    "enable_intermediate_result": True,
+                    "enable_punctuation_prediction": True,
+                    "enable_inverse_text_normalization": True,
+                    "max_sentence_silence": self.max_sentence_silence,
+                    "enable_voice_detection": False,
+                }
+            }
+            await asr_ws.send(json.dumps(start_request, ensure_ascii=False))
+            logger.bind(tag=TAG).info("已发送开始请求，等待服务器准备...")
+
+            # 收到TranscriptionStarted表示服务器准备好接收音频数据
+            while True:
+                result = json.loads(await asyncio.wait_for(asr_ws.recv(), timeout=5.0))
+                header = result.get("header", {})
+                if header.get("status", 0) != 20000000:
+                    raise Exception(
+                        f"开始识别失败，状态码: {header.get('status')}, 消息: {header.get('status_text', '')}"
+                    )
+                if header.get("name") == "TranscriptionStarted":
+                    logger.bind(tag=TAG).info("服务器已准备")
+                    return asr_ws
+        except BaseException:
+            await asr_ws.close()
+            raise
+
+    async def _close_session(self, asr_ws):
+        """关闭未使用的预热连接"""
+        await asr_ws.close()
+
+    async def _start_recognition(self, conn):
+        """开始识别会话"""
+        # 优先使用预热好的会话，已完成Token刷新、连接和开始请求
+        self.asr_ws = await self.warm.acquire()
+        # 会话的上行编码在开始请求中已确定，每个会话使用新的编码器
+        self.uplink = create_uplink(self._uplink_codec(), conn.audio_format)
+
         self.is_processing = True
-        self.server_ready = False  # 重置服务器准备状态
+        self.server_ready = True
         self.forward_task = asyncio.create_task(self._forward_results(conn))
-        
-        # 发送开始请求
-        start_request = {
-            "header": {
-                "namespace": "SpeechTranscriber",
-                "name": "StartTranscription",
-                "status": 20000000,
-                "message_id": ''.join(random.choices('0123456789abcdef', k=32)),
-                "task_id": ''.join(random.choices('0123456789abcdef', k=32)),
-                "status_text": "Gateway:SUCCESS:Success.",
-                "appkey": self.appkey
-            },
-            "payload": {
-                "format": "pcm",
-                "sample_rate": 16000,
-                "enable_intermediate_result": True,
-                "enable_punctuation_prediction": True,
-                "enable_inverse_text_normalization": True,
-                "max_sentence_silence": self.max_sentence_silence,
-                "enable_voice_detection": False,
-            }
-        }
-        await self.asr_ws.send(json.dumps(start_request, ensure_ascii=False))
-        logger.bind(tag=TAG).info("已发送开始请求，等待服务器准备...")
+
+        # 发送缓存音频
+        logger.bind(tag=TAG).info("开始发送缓存音频...")
+        for cached_audio in conn.asr_audio[-10:]:
+            try:
+                data = self.uplink.encode(cached_audio)
+                if data:
+                    await self.asr_ws.send(data)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"发送缓存音频失败: {e}")
+                break
 
     async def _forward_results(self, conn):
         """转发识别结果"""
@@ -222,27 +287,12 @@ class ASRProvider(ASRProviderBase):
                             logger.bind(tag=TAG).error(f"识别错误，状态码: {status}, 消息: {header.get('status_text', '')}")
                             continue
                     
-                    # 收到TranscriptionStarted表示服务器准备好接收音频数据
-                    if message_name == "TranscriptionStarted":
-                        self.server_ready = True
-                        logger.bind(tag=TAG).info("服务器已准备，开始发送缓存音频...")
-                        
-                        # 发送缓存音频
-                        if conn.asr_audio:
-                            for cached_audio in conn.asr_audio[-10:]:
-                                try:
-                                    pcm_frame = self.decoder.decode(cached_audio, 960)
-                                    await self.asr_ws.send(pcm_frame)
-                                except Exception as e:
-                                    logger.bind(tag=TAG).warning(f"发送缓存音频失败: {e}")
-                                    break
-                        continue
-                    
                     if message_name == "TranscriptionResultChanged":
                         # 中间结果
                         text = payload.get("result", "")
                         if text:
                             self.text = text
+                            self.on_partial_result(conn, text)
                     elif message_name == "SentenceEnd":
                         # 最终结果
                         text = payload.get("result", "")
@@ -329,7 +379,9 @@ class ASRProvider(ASRProviderBase):
                 logger.bind(tag=TAG).error(f"关闭WebSocket连接失败: {e}")
             finally:
                 self.asr_ws = None
-        
+
+        # 为下一句话预热会话
+        self.warm.release()
         logger.bind(tag=TAG).info("ASR会话清理完成")
 
     async def speech_to_text(self, opus_data, session_id, audio_format):
@@ -340,4 +392,5 @@ class ASRProvider(ASRProviderBase):
 
     async def close(self):
         """关闭资源"""
-        await self._cleanup()
+        await self.warm.close()
+        await self._cleanup(None)
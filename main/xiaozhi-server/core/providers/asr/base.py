@@ -7,32 +7,81 @@ import time
 import queue
 import asyncio
 import traceback
+import shutil
 import threading
+import numpy as np
 import opuslib_next
-import concurrent.futures
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.metrics import ASR_LATENCY, ASR_SPECULATION, ASR_SPECULATION_WASTED
+from core.providers.asr.dto.dto import InterfaceType
+from core.utils.turn_trace import turn_tracer
+from core.utils.scheduler import scheduler, run_coroutine_in_thread
 from core.handle.receiveAudioHandle import handleAudioMessage
+from core.utils.audio_ingest import get_ingest
+from core.utils.endpointing import get_endpointer, get_state
+from core.utils import uplink_codec
 
 TAG = __name__
 logger = setup_logging()
 
 
+class _Speculation:
+    """语音刚进入静默时提前发起的识别"""
+
+    __slots__ = ("future", "elapsed")
+
+    def __init__(self):
+        self.future = None
+        # 识别实际耗费的时间，用于统计被丢弃时浪费的计算量
+        self.elapsed = 0.0
+
+
 class ASRProviderBase(ABC):
+    # 流式ASR上游可直接接收的Opus封装（见 core/utils/uplink_codec.py），按优先级排列，为空表示只接收PCM
+    uplink_codecs = ()
+
     def __init__(self):
         pass
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
+        if getattr(conn, "runtime_mode", "thread") == "asyncio":
+            conn.asr_priority_task = conn.start_pipeline_task(
+                self.asr_audio_priority_task(conn)
+            )
+            return
         conn.asr_priority_thread = threading.Thread(
             target=self.asr_text_priority_thread, args=(conn,), daemon=True
         )
         conn.asr_priority_thread.start()
 
+    # 设备开始拾音，流式ASR可以提前准备上游会话
+    def prewarm(self, conn):
+        pass
+
+    # 协商发给上游的音频编码，preference 为配置的 uplink_codec（auto/pcm/具体封装）
+    def negotiate_uplink(self, conn, preference="auto") -> str:
+        audio_format = getattr(conn, "audio_format", "opus") if conn else "opus"
+        return uplink_codec.negotiate(audio_format, preference, self.uplink_codecs)
+
+    # 有序处理ASR音频（asyncio模式，直接在事件循环上消费）
+    async def asr_audio_priority_task(self, conn):
+        while not conn.stop_event.is_set():
+            message = await conn.asr_audio_queue.get()
+            try:
+                await handleAudioMessage(conn, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"处理ASR音频失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                )
+
     # 有序处理ASR音频
     def asr_text_priority_thread(self, conn):
         while not conn.stop_event.is_set():
@@ -66,89 +115,166 @@ class ASRProviderBase(ABC):
         if conn.client_voice_stop:
             asr_audio_task = conn.asr_audio.copy()
             conn.asr_audio.clear()
+            self.finish_endpoint(conn)
             conn.reset_vad_states()
 
+            speculation = conn.asr_speculation
+            conn.asr_speculation = None
             if len(asr_audio_task) > 15:
-                await self.handle_voice_stop(conn, asr_audio_task)
+                turn_tracer.start_turn(conn)
+                # 本句话的PCM已在接入阶段解码，按音频包数从接入缓冲中取出，
+                # 缓冲区会被后续音频覆盖，交给识别线程前复制一次
+                pcm_data = bytes(get_ingest(conn).segment(len(asr_audio_task)))
+                await self.handle_voice_stop(conn, asr_audio_task, pcm_data, speculation)
+            elif speculation is not None:
+                self._discard_speculation(conn, speculation)
+            return
+
+        self._speculate(conn, audio_have_voice)
+
+    def _speculation_config(self, conn) -> dict:
+        config = conn.config.get("server", {}).get("speculative_asr") or {}
+        if not config.get("enabled", False) or conn.client_listen_mode == "manual":
+            return {}
+        # 云端ASR按次计费，默认只对本地ASR提前识别
+        if config.get("local_only", True) and self.interface_type != InterfaceType.LOCAL:
+            return {}
+        return config
+
+    def _speculate(self, conn, audio_have_voice):
+        """静默开始时提前识别已说完的部分，用户继续说话则丢弃，断句确认后直接采用结果"""
+        speculation = conn.asr_speculation
+        if audio_have_voice:
+            if speculation is not None:
+                conn.asr_speculation = None
+                self._discard_speculation(conn, speculation)
+            return
+        if speculation is not None or len(conn.asr_audio) <= 15:
+            return
+        config = self._speculation_config(conn)
+        if not config:
+            return
+        # 静默持续一小段时间后再开始，避免字与字之间的短暂停顿反复触发
+        silence_ms = time.time() * 1000 - conn.last_activity_time
+        if silence_ms < float(config.get("min_silence_ms", 120)):
+            return
+        pcm_data = bytes(get_ingest(conn).segment(len(conn.asr_audio)))
+        speculation = _Speculation()
+        speculation.future = self._submit_asr(conn, [pcm_data], "pcm", speculation)
+        conn.asr_speculation = speculation
+
+    def _discard_speculation(self, conn, speculation: "_Speculation"):
+        provider = conn.config["selected_module"].get("ASR", "")
+        ASR_SPECULATION.inc(provider=provider, result="discarded")
+        # 还在排队的直接取消，已开始的识别结束后计入浪费的计算时间
+        if not speculation.future.cancel():
+            speculation.future.add_done_callback(
+                lambda _: ASR_SPECULATION_WASTED.inc(speculation.elapsed, provider=provider)
+            )
+
+    def _submit_asr(self, conn, asr_input, asr_format, speculation=None):
+        """在共享ASR线程池中执行识别，复用工作线程的事件循环，返回 concurrent Future"""
+
+        def run_asr():
+            start_time = time.monotonic()
+            try:
+                result = run_coroutine_in_thread(
+                    self.speech_to_text(asr_input, conn.session_id, asr_format)
+                )
+                end_time = time.monotonic()
+                logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
+                ASR_LATENCY.observe(
+                    end_time - start_time,
+                    provider=conn.config["selected_module"].get("ASR", ""),
+                )
+                return result
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"ASR失败: {e}")
+                return ("", None)
+            finally:
+                if speculation is not None:
+                    speculation.elapsed = time.monotonic() - start_time
+
+        return conn.executor.submit_to("asr", run_asr)
+
+    def on_partial_result(self, conn, text: str):
+        """流式识别收到中间结果时调用，供断句器判断句子是否已经稳定"""
+        endpointer = get_endpointer(conn)
+        if endpointer is not None:
+            endpointer.on_partial(get_state(conn), text, time.time() * 1000)
+
+    def finish_endpoint(self, conn):
+        """一句话结束，记录断句时间，下一句开始时据此判断本次是否断得过早"""
+        endpointer = get_endpointer(conn)
+        if endpointer is not None:
+            endpointer.finish(get_state(conn), time.time() * 1000)
 
     # 处理语音停止
-    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
-        """并行处理ASR和声纹识别"""
+    async def handle_voice_stop(
+        self,
+        conn,
+        asr_audio_task: List[bytes],
+        pcm_data: Optional[bytes] = None,
+        speculation: Optional[_Speculation] = None,
+    ):
+        """并行处理ASR和声纹识别
+
+        Args:
+            asr_audio_task: 本句话的原始音频包，用于上报
+            pcm_data: 已解码的PCM，为空时由原始音频包解码
+            speculation: 静默开始时提前发起的识别，静默期间没有新的语音，其结果可直接采用
+        """
         try:
             total_start_time = time.monotonic()
-            
+
             # 准备音频数据
-            if conn.audio_format == "pcm":
-                pcm_data = asr_audio_task
+            if pcm_data is not None:
+                combined_pcm_data = pcm_data
+                asr_input, asr_format = [pcm_data], "pcm"
             else:
-                pcm_data = self.decode_opus(asr_audio_task)
-            
-            combined_pcm_data = b"".join(pcm_data)
+                if conn.audio_format == "pcm":
+                    decoded = asr_audio_task
+                else:
+                    decoded = self.decode_opus(asr_audio_task)
+                combined_pcm_data = b"".join(decoded)
+                asr_input, asr_format = asr_audio_task, conn.audio_format
             
             # 预先准备WAV数据
             wav_data = None
             if conn.voiceprint_provider and combined_pcm_data:
                 wav_data = self._pcm_to_wav(combined_pcm_data)
             
-            # 定义ASR任务
-            def run_asr():
-                start_time = time.monotonic()
+            # 定义声纹识别任务，本身是异步HTTP请求，直接在事件循环中执行
+            async def run_voiceprint():
                 try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        result = loop.run_until_complete(
-                            self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
-                        )
-                        end_time = time.monotonic()
-                        logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
-                        return result
-                    finally:
-                        loop.close()
-                except Exception as e:
-                    end_time = time.monotonic()
-                    logger.bind(tag=TAG).error(f"ASR失败: {e}")
-                    return ("", None)
-            
-            # 定义声纹识别任务
-            def run_voiceprint():
-                if not wav_data:
-                    return None
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        # 使用连接的声纹识别提供者
-                        result = loop.run_until_complete(
-                            conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
-                        )
-                        return result
-                    finally:
-                        loop.close()
+                    return await conn.voiceprint_provider.identify_speaker(
+                        wav_data, conn.session_id
+                    )
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
                     return None
-            
-            # 使用线程池执行器并行运行
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as thread_executor:
-                asr_future = thread_executor.submit(run_asr)
-                
-                if conn.voiceprint_provider and wav_data:
-                    voiceprint_future = thread_executor.submit(run_voiceprint)
-                    
-                    # 等待两个线程都完成
-                    asr_result = asr_future.result(timeout=15)
-                    voiceprint_result = voiceprint_future.result(timeout=15)
-                    
-                    results = {"asr": asr_result, "voiceprint": voiceprint_result}
-                else:
-                    asr_result = asr_future.result(timeout=15)
-                    results = {"asr": asr_result, "voiceprint": None}
-            
-            
+
+            # 并行运行，等待期间不阻塞事件循环；已提前识别的直接等待其结果
+            if speculation is not None:
+                ASR_SPECULATION.inc(
+                    provider=conn.config["selected_module"].get("ASR", ""), result="hit"
+                )
+                asr_future = asyncio.wrap_future(speculation.future)
+            else:
+                asr_future = asyncio.wrap_future(self._submit_asr(conn, asr_input, asr_format))
+            if conn.voiceprint_provider and wav_data:
+                asr_result, voiceprint_result = await asyncio.wait_for(
+                    asyncio.gather(asr_future, run_voiceprint()), timeout=15
+                )
+                results = {"asr": asr_result, "voiceprint": voiceprint_result}
+            else:
+                asr_result = await asyncio.wait_for(asr_future, timeout=15)
+                results = {"asr": asr_result, "voiceprint": None}
+
             # 处理结果
             raw_text, _ = results.get("asr", ("", None))
             speaker_name = results.get("voiceprint", None)
+            turn_tracer.mark(conn, "asr_done", asr_text_len=len(raw_text or ""))
             
             # 记录识别结果
             if raw_text:
@@ -217,20 +343,58 @@ class ASRProviderBase(ABC):
     def stop_ws_connection(self):
         pass
 
-    def save_audio_to_file(self, pcm_data: List[bytes], session_id: str) -> str:
-        """PCM数据保存为WAV文件"""
-        module_name = __name__.split(".")[-1]
+    def _audio_file_path(self, session_id: str) -> str:
+        module_name = type(self).__module__.split(".")[-1]
         file_name = f"asr_{module_name}_{session_id}_{uuid.uuid4()}.wav"
-        file_path = os.path.join(self.output_dir, file_name)
+        return os.path.join(self.output_dir, file_name)
 
+    @staticmethod
+    def _write_wav(file_path: str, pcm_data: List[bytes]):
         with wave.open(file_path, "wb") as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)  # 2 bytes = 16-bit
             wf.setframerate(16000)
-            wf.writeframes(b"".join(pcm_data))
+            for pcm in pcm_data:
+                wf.writeframes(pcm)
 
+    def save_audio_to_file(self, pcm_data: List[bytes], session_id: str) -> str:
+        """PCM数据保存为WAV文件"""
+        file_path = self._audio_file_path(session_id)
+        self._write_wav(file_path, pcm_data)
         return file_path
 
+    def archive_audio(self, pcm_data: List[bytes], session_id: str) -> Optional[str]:
+        """配置了保留音频（delete_audio 为 false）时，在上报线程池中异步写入WAV，不占用识别耗时
+
+        Returns:
+            将要写入的文件路径，不保留音频时返回 None
+        """
+        if getattr(self, "delete_audio_file", True):
+            return None
+        file_path = self._audio_file_path(session_id)
+
+        def write():
+            try:
+                size = sum(len(pcm) for pcm in pcm_data)
+                # 预留2倍空间，磁盘不足时放弃保存，不影响识别
+                if shutil.disk_usage(self.output_dir).free < size * 2:
+                    logger.bind(tag=TAG).warning(f"磁盘空间不足，跳过保存音频: {file_path}")
+                    return
+                self._write_wav(file_path, pcm_data)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"保存音频失败: {file_path} | 错误: {e}")
+
+        scheduler.submit("report", session_id, write)
+        return file_path
+
+    @staticmethod
+    def pcm_to_samples(pcm_data: List[bytes]) -> np.ndarray:
+        """把16bit PCM转换为模型输入的 float32 采样（-1~1），整句只在内存中转换一次"""
+        pcm = pcm_data[0] if len(pcm_data) == 1 else b"".join(pcm_data)
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32)
+        samples *= 1.0 / 32768
+        return samples
+
     @abstractmethod
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
@@ -3,16 +3,20 @@ import gzip
 import uuid
 import asyncio
 import websockets
-import opuslib_next
 from core.providers.asr.base import ASRProviderBase
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.warm_connection import WarmConnectionManager
+from core.utils.uplink_codec import OGG_OPUS, create_uplink
 
 TAG = __name__
 logger = setup_logging()
 
 
 class ASRProvider(ASRProviderBase):
+    # 大模型流式识别支持 format=ogg、codec=opus
+    uplink_codecs = (OGG_OPUS,)
+
     def __init__(self, config, delete_audio_file):
         super().__init__()
         self.interface_type = InterfaceType.STREAM
@@ -20,7 +24,8 @@ class ASRProvider(ASRProviderBase):
         self.text = ""
         self.max_retries = 3
         self.retry_delay = 2
-        self.decoder = opuslib_next.Decoder(16000, 1)
+        self.conn = None
+        self.uplink = None
         self.asr_ws = None
         self.forward_task = None
         self.is_processing = False  # 添加处理状态标志
@@ -49,9 +54,71 @@ class ASRProvider(ASRProviderBase):
         self.channel = config.get("channel", 1)
         self.auth_method = config.get("auth_method", "token")
         self.secret = config.get("secret", "access_secret")
+        # 上行音频编码：auto 表示设备上行Opus时直接封装成Ogg转发，pcm 表示解码后发送
+        self.uplink_preference = config.get("uplink_codec", "auto")
+        # 上游会话预热
+        self.warm = WarmConnectionManager(
+            self._open_session,
+            lambda ws: ws.close(),
+            config,
+            session_key=self._uplink_codec,
+        )
 
     async def open_audio_channels(self, conn):
         await super().open_audio_channels(conn)
+        self.conn = conn
+        self.warm.start(conn)
+
+    def _uplink_codec(self) -> str:
+        return self.negotiate_uplink(self.conn, self.uplink_preference)
+
+    def prewarm(self, conn):
+        self.warm.touch()
+
+    async def _open_session(self):
+        """建立WebSocket连接并完成初始化请求，返回可直接发送音频的连接"""
+        headers = self.token_auth() if self.auth_method == "token" else None
+        logger.bind(tag=TAG).info(f"正在连接ASR服务，headers: {headers}")
+
+        asr_ws = await websockets.connect(
+            self.ws_url,
+            additional_headers=headers,
+            max_size=1000000000,
+            ping_interval=None,
+            ping_timeout=None,
+            close_timeout=10,
+        )
+
+        # 发送初始化请求
+        request_params = self.construct_request(str(uuid.uuid4()), self._uplink_codec())
+        try:
+            payload_bytes = str.encode(json.dumps(request_params))
+            payload_bytes = gzip.compress(payload_bytes)
+            full_client_request = self.generate_header()
+            full_client_request.extend((len(payload_bytes)).to_bytes(4, "big"))
+            full_client_request.extend(payload_bytes)
+
+            logger.bind(tag=TAG).info(f"发送初始化请求: {request_params}")
+            await asr_ws.send(full_client_request)
+
+            # 等待初始化响应
+            init_res = await asr_ws.recv()
+            result = self.parse_response(init_res)
+            logger.bind(tag=TAG).info(f"收到初始化响应: {result}")
+
+            # 检查初始化响应
+            if "code" in result and result["code"] != 1000:
+                error_msg = f"ASR服务初始化失败: {result.get('payload_msg', {}).get('error', '未知错误')}"
+                logger.bind(tag=TAG).error(error_msg)
+                raise Exception(error_msg)
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"发送初始化请求失败: {str(e)}")
+            if hasattr(e, "__cause__") and e.__cause__:
+                logger.bind(tag=TAG).error(f"错误原因: {str(e.__cause__)}")
+            await asr_ws.close()
+            raise e
+        return asr_ws
 
     async def receive_audio(self, conn, audio, audio_have_voice):
         conn.asr_audio.append(audio)
@@ -71,67 +138,24 @@ class ASRProvider(ASRProviderBase):
         if audio_have_voice and self.asr_ws is None and not self.is_processing:
             try:
                 self.is_processing = True
-                # 建立新的WebSocket连接
-                headers = self.token_auth() if self.auth_method == "token" else None
-                logger.bind(tag=TAG).info(f"正在连接ASR服务，headers: {headers}")
-
-                self.asr_ws = await websockets.connect(
-                    self.ws_url,
-                    additional_headers=headers,
-                    max_size=1000000000,
-                    ping_interval=None,
-                    ping_timeout=None,
-                    close_timeout=10,
-                )
-
-                # 发送初始化请求
-                request_params = self.construct_request(str(uuid.uuid4()))
-                try:
-                    payload_bytes = str.encode(json.dumps(request_params))
-                    payload_bytes = gzip.compress(payload_bytes)
-                    full_client_request = self.generate_header()
-                    full_client_request.extend((len(payload_bytes)).to_bytes(4, "big"))
-                    full_client_request.extend(payload_bytes)
-
-                    logger.bind(tag=TAG).info(f"发送初始化请求: {request_params}")
-                    await self.asr_ws.send(full_client_request)
-
-                    # 等待初始化响应
-                    init_res = await self.asr_ws.recv()
-                    result = self.parse_response(init_res)
-                    logger.bind(tag=TAG).info(f"收到初始化响应: {result}")
-
-                    # 检查初始化响应
-                    if "code" in result and result["code"] != 1000:
-                        error_msg = f"ASR服务初始化失败: {result.get('payload_msg', {}).get('error', '未知错误')}"
-                        logger.bind(tag=TAG).error(error_msg)
-                        raise Exception(error_msg)
-
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"发送初始化请求失败: {str(e)}")
-                    if hasattr(e, "__cause__") and e.__cause__:
-                        logger.bind(tag=TAG).error(f"错误原因: {str(e.__cause__)}")
-                    raise e
+                # 优先使用预热好的会话，已完成连接和初始化请求
+                self.asr_ws = await self.warm.acquire()
+                # 会话的上行编码在初始化请求中已确定，每个会话使用新的编码器
+                self.uplink = create_uplink(self._uplink_codec(), conn.audio_format)
 
                 # 启动接收ASR结果的异步任务
                 self.forward_task = asyncio.create_task(self._forward_asr_results(conn))
 
-                # 发送缓存的音频数据
+                # 发送缓存的音频数据（包含当前音频）
                 if conn.asr_audio and len(conn.asr_audio) > 0:
                     for cached_audio in conn.asr_audio[-10:]:
                         try:
-                            pcm_frame = self.decoder.decode(cached_audio, 960)
-                            payload = gzip.compress(pcm_frame)
-                            audio_request = bytearray(
-                                self.generate_audio_default_header()
-                            )
-                            audio_request.extend(len(payload).to_bytes(4, "big"))
-                            audio_request.extend(payload)
-                            await self.asr_ws.send(audio_request)
+                            await self._send_audio(cached_audio)
                         except Exception as e:
                             logger.bind(tag=TAG).info(
                                 f"发送缓存音频数据时发生错误: {e}"
                             )
+                return
 
             except Exception as e:
                 logger.bind(tag=TAG).error(f"建立ASR连接失败: {str(e)}")
@@ -146,15 +170,20 @@ class ASRProvider(ASRProviderBase):
         # 发送当前音频数据
         if self.asr_ws and self.is_processing:
             try:
-                pcm_frame = self.decoder.decode(audio, 960)
-                payload = gzip.compress(pcm_frame)
-                audio_request = bytearray(self.generate_audio_default_header())
-                audio_request.extend(len(payload).to_bytes(4, "big"))
-                audio_request.extend(payload)
-                await self.asr_ws.send(audio_request)
+                await self._send_audio(audio)
             except Exception as e:
                 logger.bind(tag=TAG).info(f"发送音频数据时发生错误: {e}")
 
+    async def _send_audio(self, audio):
+        data = self.uplink.encode(audio)
+        if not data:
+            return
+        payload = gzip.compress(data)
+        audio_request = bytearray(self.generate_audio_default_header())
+        audio_request.extend(len(payload).to_bytes(4, "big"))
+        audio_request.extend(payload)
+        await self.asr_ws.send(audio_request)
+
     async def _forward_asr_results(self, conn):
         try:
             while self.asr_ws and not conn.stop_event.is_set():
@@ -222,6 +251,7 @@ class ASRProvider(ASRProviderBase):
                 await self.asr_ws.close()
                 self.asr_ws = None
             self.is_processing = False
+            self.warm.release()
             if conn:
                 if hasattr(conn, 'asr_audio_for_voiceprint'):
                     conn.asr_audio_for_voiceprint = []
@@ -236,7 +266,7 @@ class ASRProvider(ASRProviderBase):
             self.asr_ws = None
         self.is_processing = False
 
-    def construct_request(self, reqid):
+    def construct_request(self, reqid, uplink_codec="pcm"):
         req = {
             "app": {
                 "appid": self.appid,
@@ -255,8 +285,8 @@ class ASRProvider(ASRProviderBase):
                 "end_window_size": 200,
             },
             "audio": {
-                "format": self.format,
-                "codec": self.codec,
+                "format": "ogg" if uplink_codec == OGG_OPUS else self.format,
+                "codec": "opus" if uplink_codec == OGG_OPUS else self.codec,
                 "rate": self.rate,
                 "language": self.language,
                 "bits": self.bits,
@@ -359,6 +389,7 @@ class ASRProvider(ASRProviderBase):
 
     async def close(self):
         """资源清理方法"""
+        await self.warm.close()
         if self.asr_ws:
             await self.asr_ws.close()
             self.asr_ws = None
@@ -8,8 +8,8 @@ from typing import Optional, Tuple, List
 from core.providers.asr.base import ASRProviderBase
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
-import shutil
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.asr_batcher import ASRBatchScheduler
 
 TAG = __name__
 logger = setup_logging()
@@ -61,6 +61,23 @@ class ASRProvider(ASRProviderBase):
                 # device="cuda:0",  # 启用GPU加速
             )
 
+        # 多个连接共享一个模型，识别请求排队后合并为一次批量推理
+        self.batcher = ASRBatchScheduler.from_config(
+            self._decode_batch, config, name="fun_local"
+        )
+
+    def _decode_batch(self, batch: list) -> List[str]:
+        results = self.model.generate(
+            input=batch,
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size=len(batch),
+            batch_size_s=60,
+            disable_pbar=True,
+        )
+        return [rich_transcription_postprocess(result["text"]) for result in results]
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -76,30 +93,13 @@ class ASRProvider(ASRProviderBase):
                 else:
                     pcm_data = self.decode_opus(opus_data)
 
-                combined_pcm_data = b"".join(pcm_data)
-
-                # 检查磁盘空间
-                if not self.delete_audio_file:
-                    free_space = shutil.disk_usage(self.output_dir).free
-                    if free_space < len(combined_pcm_data) * 2:  # 预留2倍空间
-                        raise OSError("磁盘空间不足")
-
-                # 判断是否保存为WAV文件
-                if self.delete_audio_file:
-                    pass
-                else:
-                    file_path = self.save_audio_to_file(pcm_data, session_id)
+                # 需要保留音频时在后台写文件，识别直接使用内存中的采样
+                if file_path is None:
+                    file_path = self.archive_audio(pcm_data, session_id)
 
                 # 语音识别
                 start_time = time.time()
-                result = self.model.generate(
-                    input=combined_pcm_data,
-                    cache={},
-                    language="auto",
-                    use_itn=True,
-                    batch_size_s=60,
-                )
-                text = rich_transcription_postprocess(result[0]["text"])
+                text = self.batcher.decode(self.pcm_to_samples(pcm_data))
                 logger.bind(tag=TAG).debug(
                     f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
                 )
@@ -121,14 +121,3 @@ class ASRProvider(ASRProviderBase):
             except Exception as e:
                 logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
                 return "", file_path
-
-            finally:
-                # 文件清理逻辑
-                if self.delete_audio_file and file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(
-                            f"文件删除失败: {file_path} | 错误: {e}"
-                        )
@@ -0,0 +1,177 @@
+"""
+Sherpa-ONNX 本地流式语音识别
+音频在接入阶段解码后，边说边送入 OnlineRecognizer 的识别流并增量解码，VAD判定语音结束时只需
+处理最后几十毫秒的音频即可得到最终结果，识别不再占用语音结束后的等待时间。
+识别模型在进程内只加载一次，由所有连接共享，每个连接只持有自己的识别流。
+"""
+
+import os
+import asyncio
+import threading
+from typing import Optional, Tuple, List
+
+import numpy as np
+import sherpa_onnx
+
+from config.logger import setup_logging
+from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.dto.dto import InterfaceType
+from core.handle.sendAudioHandle import send_stt_partial_message
+from core.utils.audio_ingest import get_ingest, SAMPLE_RATE
+from core.utils.turn_trace import turn_tracer
+
+TAG = __name__
+logger = setup_logging()
+
+# 结束时补的静音时长（秒），把模型内部缓存的最后几帧推出来
+TAIL_PADDING_SECONDS = 0.66
+
+_recognizers = {}
+_recognizers_lock = threading.Lock()
+
+
+def _model_file(model_dir: str, name: str) -> str:
+    path = os.path.join(model_dir, name)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"模型文件不存在: {path}")
+    return path
+
+
+def _load_recognizer(config: dict):
+    """按模型配置加载 OnlineRecognizer，相同配置的连接共用一个实例"""
+    model_dir = config.get("model_dir")
+    model_type = config.get("model_type", "transducer")
+    num_threads = int(config.get("num_threads", 2))
+    key = (
+        model_dir,
+        model_type,
+        num_threads,
+        config.get("encoder"),
+        config.get("decoder"),
+        config.get("joiner"),
+    )
+    with _recognizers_lock:
+        recognizer = _recognizers.get(key)
+        if recognizer is not None:
+            return recognizer
+
+        tokens = _model_file(model_dir, config.get("tokens", "tokens.txt"))
+        if model_type == "paraformer":
+            recognizer = sherpa_onnx.OnlineRecognizer.from_paraformer(
+                tokens=tokens,
+                encoder=_model_file(model_dir, config.get("encoder", "encoder.int8.onnx")),
+                decoder=_model_file(model_dir, config.get("decoder", "decoder.int8.onnx")),
+                num_threads=num_threads,
+                sample_rate=SAMPLE_RATE,
+                feature_dim=80,
+                decoding_method="greedy_search",
+            )
+        else:  # transducer (zipformer)
+            recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
+                tokens=tokens,
+                encoder=_model_file(model_dir, config.get("encoder", "encoder-epoch-99-avg-1.onnx")),
+                decoder=_model_file(model_dir, config.get("decoder", "decoder-epoch-99-avg-1.onnx")),
+                joiner=_model_file(model_dir, config.get("joiner", "joiner-epoch-99-avg-1.onnx")),
+                num_threads=num_threads,
+                sample_rate=SAMPLE_RATE,
+                feature_dim=80,
+                decoding_method="greedy_search",
+            )
+        _recognizers[key] = recognizer
+        logger.bind(tag=TAG).info(f"流式识别模型加载完成: {model_dir}")
+        return recognizer
+
+
+class ASRProvider(ASRProviderBase):
+    def __init__(self, config: dict, delete_audio_file: bool):
+        super().__init__()
+        self.interface_type = InterfaceType.STREAM
+        self.recognizer = _load_recognizer(config)
+        # 是否把中间结果以 stt 消息（state=partial）发送给设备
+        self.send_partial = bool(config.get("send_partial", False))
+        self.delete_audio_file = delete_audio_file
+        self.text = ""
+        # 当前句的识别流、已送入识别流的接入缓冲位置、最近一次的中间结果
+        self.stream = None
+        self.fed_pos = 0
+        self.partial = ""
+
+    async def receive_audio(self, conn, audio, audio_have_voice):
+        if conn.client_listen_mode == "auto" or conn.client_listen_mode == "realtime":
+            have_voice = audio_have_voice
+        else:
+            have_voice = conn.client_have_voice
+
+        conn.asr_audio.append(audio)
+        if not have_voice and not conn.client_have_voice:
+            conn.asr_audio = conn.asr_audio[-10:]
+            self.stream = None
+            return
+
+        ingest = get_ingest(conn)
+        if self.stream is None:
+            # 语音开始：连同之前缓存的几个音频包一起送入，避免丢掉开头
+            self.stream = self.recognizer.create_stream()
+            self.fed_pos = ingest.packet_position(len(conn.asr_audio))
+            self.partial = ""
+        partial = await self._run_in_pool(conn, self._feed, ingest)
+        if partial:
+            # 中间结果有变化：供断句器判断稳定性，并按需推送给设备
+            self.on_partial_result(conn, partial)
+            if self.send_partial:
+                await send_stt_partial_message(conn, partial)
+
+        if conn.client_voice_stop:
+            asr_audio_task = conn.asr_audio.copy()
+            conn.asr_audio.clear()
+            pcm_data = bytes(ingest.segment(len(asr_audio_task)))
+            self.finish_endpoint(conn)
+            conn.reset_vad_states()
+
+            if len(asr_audio_task) > 15:
+                turn_tracer.start_turn(conn)
+                self.text = await self._run_in_pool(conn, self._finalize)
+                await self.handle_voice_stop(conn, asr_audio_task, pcm_data)
+            self.stream = None
+
+    @staticmethod
+    async def _run_in_pool(conn, func, *args):
+        """解码在共享ASR线程池中执行，不阻塞事件循环"""
+        return await asyncio.wrap_future(conn.executor.submit_to("asr", func, *args))
+
+    def _decode(self, stream):
+        while self.recognizer.is_ready(stream):
+            self.recognizer.decode_stream(stream)
+
+    def _feed(self, ingest) -> Optional[str]:
+        """把接入缓冲中新到的PCM送入识别流并解码，中间结果有变化时返回新结果"""
+        stream = self.stream
+        samples = ingest.samples_since(self.fed_pos)
+        self.fed_pos = ingest.total
+        if not len(samples):
+            return None
+        stream.accept_waveform(SAMPLE_RATE, samples.astype(np.float32) / 32768.0)
+        self._decode(stream)
+        partial = self.recognizer.get_result(stream).strip()
+        if partial == self.partial:
+            return None
+        self.partial = partial
+        return partial
+
+    def _finalize(self) -> str:
+        """语音结束：补静音并结束输入，取出最终结果"""
+        stream = self.stream
+        stream.accept_waveform(
+            SAMPLE_RATE, np.zeros(int(TAIL_PADDING_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        )
+        stream.input_finished()
+        self._decode(stream)
+        return self.recognizer.get_result(stream).strip()
+
+    async def speech_to_text(
+        self, opus_data: List[bytes], session_id: str, audio_format="opus"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """识别已在接收音频时完成，这里直接返回最终结果"""
+        result = self.text
+        self.text = ""
+        return result, None
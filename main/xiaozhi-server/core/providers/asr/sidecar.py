@@ -0,0 +1,62 @@
+import time
+from typing import Optional, Tuple, List
+from config.logger import setup_logging
+from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.dto.dto import InterfaceType
+from core.utils.sidecar_client import get_sidecar_client
+
+TAG = __name__
+logger = setup_logging()
+
+
+class ASRProvider(ASRProviderBase):
+    """通过本地推理进程（core/inference_sidecar.py）识别，PCM经共享内存传递
+
+    推理进程加载 server.inference_sidecar.asr 指定的本地ASR，并对各服务进程的请求合并批量解码
+    """
+
+    def __init__(self, config: dict, delete_audio_file: bool):
+        super().__init__()
+        # 客户端本身不持有模型，所有连接共用一个实例
+        self.interface_type = InterfaceType.LOCAL
+        self.output_dir = config.get("output_dir", "tmp/")
+        self.delete_audio_file = delete_audio_file
+        self.client = get_sidecar_client(config)
+        logger.bind(tag=TAG).info(f"ASR使用推理进程: {self.client.socket_path}")
+
+    async def speech_to_text(
+        self, opus_data: List[bytes], session_id: str, audio_format="opus"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            if audio_format == "pcm":
+                pcm_data = opus_data
+            else:
+                pcm_data = self.decode_opus(opus_data)
+            file_path = self.archive_audio(pcm_data, session_id)
+
+            start_time = time.time()
+            arena = self.client.arena
+            size = sum(len(pcm) for pcm in pcm_data)
+            # 在ASR工作线程中分配，共享内存被其他请求占满时等待释放
+            offset = arena.alloc(size, timeout=self.client.timeout)
+            pos = offset
+            for pcm in pcm_data:
+                arena.shm.buf[pos : pos + len(pcm)] = pcm
+                pos += len(pcm)
+            # 在ASR工作线程中同步等待，推理进程返回前共享内存中的数据保持有效
+            future = self.client.request(
+                {"op": "asr", "offset": offset, "size": size, "session_id": session_id},
+                offset,
+            )
+            try:
+                response = self.client.result(future)
+            finally:
+                self.client.release(future)
+            text = response.get("text", "")
+            logger.bind(tag=TAG).debug(
+                f"推理进程识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
+            )
+            return text, file_path
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"推理进程识别失败: {e}")
+            return "", None
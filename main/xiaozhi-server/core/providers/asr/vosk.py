@@ -1,10 +1,12 @@
 import os
 import json
 import time
+import threading
 from typing import Optional, Tuple, List
 from .base import ASRProviderBase
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.asr_batcher import ASRBatchScheduler
 import vosk
 
 TAG = __name__
@@ -22,6 +24,12 @@ class ASRProvider(ASRProviderBase):
         self.model = None
         self.recognizer = None
         self._load_model()
+        # KaldiRecognizer 带有识别状态，不能被多个线程同时使用：
+        # 识别请求统一排队，由调度器的推理线程各自持有一个识别器依次解码
+        self._local = threading.local()
+        self.batcher = ASRBatchScheduler.from_config(
+            self._decode_batch, config, name="vosk"
+        )
         
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
@@ -43,6 +51,34 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"加载VOSK模型失败: {e}")
             raise
 
+    def _decode_batch(self, batch: List[bytes]) -> List[str]:
+        recognizer = getattr(self._local, "recognizer", None)
+        if recognizer is None:
+            recognizer = vosk.KaldiRecognizer(self.model, 16000)
+            self._local.recognizer = recognizer
+        return [self._recognize(recognizer, pcm) for pcm in batch]
+
+    @staticmethod
+    def _recognize(recognizer, pcm: bytes) -> str:
+        # 进行识别（VOSK推荐每次送入2000字节的数据）
+        chunk_size = 2000
+        text_result = ""
+
+        for i in range(0, len(pcm), chunk_size):
+            chunk = pcm[i:i+chunk_size]
+            if recognizer.AcceptWaveform(chunk):
+                result = json.loads(recognizer.Result())
+                text = result.get('text', '')
+                if text:
+                    text_result += text + " "
+
+        # 获取最终结果
+        final_result = json.loads(recognizer.FinalResult())
+        final_text = final_result.get('text', '')
+        if final_text:
+            text_result += final_text
+        return text_result
+
     async def speech_to_text(
         self, audio_data: List[bytes], session_id: str, audio_format: str = "opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -70,31 +106,12 @@ class ASRProvider(ASRProviderBase):
                 logger.bind(tag=TAG).warning("合并后的PCM数据为空")
                 return "", None
 
-            # 判断是否保存为WAV文件
-            if not self.delete_audio_file:
-                file_path = self.save_audio_to_file(pcm_data, session_id)
+            # 需要保留音频时在后台写文件，不占用识别耗时
+            file_path = self.archive_audio(pcm_data, session_id)
 
             start_time = time.time()
-            
-            
-            # 进行识别（VOSK推荐每次送入2000字节的数据）
-            chunk_size = 2000
-            text_result = ""
-            
-            for i in range(0, len(combined_pcm_data), chunk_size):
-                chunk = combined_pcm_data[i:i+chunk_size]
-                if self.recognizer.AcceptWaveform(chunk):
-                    result = json.loads(self.recognizer.Result())
-                    text = result.get('text', '')
-                    if text:
-                        text_result += text + " "
-            
-            # 获取最终结果
-            final_result = json.loads(self.recognizer.FinalResult())
-            final_text = final_result.get('text', '')
-            if final_text:
-                text_result += final_text
-            
+            text_result = self.batcher.decode(combined_pcm_data)
+
             logger.bind(tag=TAG).debug(
                 f"VOSK语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text_result.strip()}"
             )
@@ -104,11 +121,3 @@ class ASRProvider(ASRProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"VOSK语音识别失败: {e}")
             return "", None
-        finally:
-            # 文件清理逻辑
-            if self.delete_audio_file and file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"文件删除失败: {file_path} | 错误: {e}")
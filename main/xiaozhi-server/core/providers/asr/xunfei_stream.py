@@ -4,7 +4,6 @@ import base64
 import hashlib
 import asyncio
 import websockets
-import opuslib_next
 from time import mktime
 from datetime import datetime
 from urllib.parse import urlencode
@@ -13,6 +12,8 @@ from config.logger import setup_logging
 from wsgiref.handlers import format_date_time
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.warm_connection import WarmConnectionManager
+from core.utils.uplink_codec import OPUS_LENGTH_PREFIXED, create_uplink
 
 TAG = __name__
 logger = setup_logging()
@@ -23,12 +24,15 @@ STATUS_CONTINUE_FRAME = 1  # 中间帧标识
 STATUS_LAST_FRAME = 2  # 最后一帧的标识
 
 class ASRProvider(ASRProviderBase):
+    # 支持 encoding=opus-wb（16k Opus，每帧前加2字节长度）
+    uplink_codecs = (OPUS_LENGTH_PREFIXED,)
+
     def __init__(self, config, delete_audio_file):
         super().__init__()
         self.interface_type = InterfaceType.STREAM
         self.config = config
         self.text = ""
-        self.decoder = opuslib_next.Decoder(16000, 1)
+        self.uplink = None
         self.asr_ws = None
         self.forward_task = None
         self.is_processing = False
@@ -59,6 +63,13 @@ class ASRProvider(ASRProviderBase):
 
         self.output_dir = config.get("output_dir", "tmp/")
         self.delete_audio_file = delete_audio_file
+        # 上行音频编码：默认pcm，设为auto时设备上行Opus按opus-wb格式直接转发
+        self.uplink_preference = config.get("uplink_codec", "pcm")
+
+        # 上游会话预热
+        self.warm = WarmConnectionManager(
+            self._open_session, lambda ws: ws.close(), config
+        )
     
     def create_url(self) -> str:
         """生成认证URL"""
@@ -94,6 +105,25 @@ class ASRProvider(ASRProviderBase):
 
     async def open_audio_channels(self, conn):
         await super().open_audio_channels(conn)
+        self.warm.start(conn)
+
+    def prewarm(self, conn):
+        self.warm.touch()
+
+    async def _open_session(self):
+        """使用新签名的URL建立WebSocket连接"""
+        ws_url = self.create_url()
+        logger.bind(tag=TAG).info(f"正在连接ASR服务: {ws_url[:50]}...")
+
+        asr_ws = await websockets.connect(
+            ws_url,
+            max_size=1000000000,
+            ping_interval=None,
+            ping_timeout=None,
+            close_timeout=10,
+        )
+        logger.bind(tag=TAG).info("ASR WebSocket连接已建立")
+        return asr_ws
 
     async def receive_audio(self, conn, audio, audio_have_voice):
         # 先调用父类方法处理基础逻辑
@@ -116,8 +146,9 @@ class ASRProvider(ASRProviderBase):
         # 发送当前音频数据
         if self.asr_ws and self.is_processing and self.server_ready:
             try:
-                pcm_frame = self.decoder.decode(audio, 960)
-                await self._send_audio_frame(pcm_frame, STATUS_CONTINUE_FRAME)
+                data = self.uplink.encode(audio)
+                if data:
+                    await self._send_audio_frame(data, STATUS_CONTINUE_FRAME)
             except Exception as e:
                 logger.bind(tag=TAG).warning(f"发送音频数据时发生错误: {e}")
                 await self._cleanup(conn)
@@ -126,19 +157,13 @@ class ASRProvider(ASRProviderBase):
         """开始识别会话"""
         try:
             self.is_processing = True
-            # 建立WebSocket连接
-            ws_url = self.create_url()
-            logger.bind(tag=TAG).info(f"正在连接ASR服务: {ws_url[:50]}...")
-
-            self.asr_ws = await websockets.connect(
-                ws_url,
-                max_size=1000000000,
-                ping_interval=None,
-                ping_timeout=None,
-                close_timeout=10,
+            # 优先使用预热好的WebSocket连接
+            self.asr_ws = await self.warm.acquire()
+            # 讯飞的编码在每帧中声明，每句话开始时按当前设备格式协商
+            self.uplink = create_uplink(
+                self.negotiate_uplink(conn, self.uplink_preference), conn.audio_format
             )
 
-            logger.bind(tag=TAG).info("ASR WebSocket连接已建立")
             self.server_ready = False
             self.last_frame_sent = False
             self.best_text = ""
@@ -147,16 +172,16 @@ class ASRProvider(ASRProviderBase):
             # 发送首帧音频
             if conn.asr_audio and len(conn.asr_audio) > 0:
                 first_audio = conn.asr_audio[-1] if conn.asr_audio else b''
-                pcm_frame = self.decoder.decode(first_audio, 960) if first_audio else b''
-                await self._send_audio_frame(pcm_frame, STATUS_FIRST_FRAME)
+                await self._send_audio_frame(self.uplink.encode(first_audio), STATUS_FIRST_FRAME)
                 self.server_ready = True
                 logger.bind(tag=TAG).info("已发送首帧，开始识别")
 
                 # 发送缓存的音频数据
                 for cached_audio in conn.asr_audio[-10:]:
                     try:
-                        pcm_frame = self.decoder.decode(cached_audio, 960)
-                        await self._send_audio_frame(pcm_frame, STATUS_CONTINUE_FRAME)
+                        data = self.uplink.encode(cached_audio)
+                        if data:
+                            await self._send_audio_frame(data, STATUS_CONTINUE_FRAME)
                     except Exception as e:
                         logger.bind(tag=TAG).info(f"发送缓存音频数据时发生错误: {e}")
                         break
@@ -190,7 +215,7 @@ class ASRProvider(ASRProviderBase):
                 "audio": {
                     "audio": audio_b64,
                     "sample_rate": 16000,
-                    "encoding": "raw"
+                    "encoding": "opus-wb" if self.uplink and self.uplink.codec == OPUS_LENGTH_PREFIXED else "raw"
                 }
             }
         }
@@ -315,6 +340,7 @@ class ASRProvider(ASRProviderBase):
                 await self.asr_ws.close()
                 self.asr_ws = None
             self.is_processing = False
+            self.warm.release()
             if conn:
                 if hasattr(conn, 'asr_audio_for_voiceprint'):
                     conn.asr_audio_for_voiceprint = []
@@ -323,7 +349,7 @@ class ASRProvider(ASRProviderBase):
                 if hasattr(conn, 'has_valid_voice'):
                     conn.has_valid_voice = False
 
-    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
+    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes], pcm_data=None, speculation=None):
         """处理语音停止，发送最后一帧并处理识别结果"""
         try:
             # 先发送最后一帧表示音频结束
@@ -333,7 +359,7 @@ class ASRProvider(ASRProviderBase):
                     last_frame = b''
                     if asr_audio_task:
                         last_audio = asr_audio_task[-1]
-                        last_frame = self.decoder.decode(last_audio, 960)
+                        last_frame = self.uplink.encode(last_audio)
                     await self._send_audio_frame(last_frame, STATUS_LAST_FRAME)
                     logger.bind(tag=TAG).info("已发送最后一帧")
 
@@ -346,7 +372,7 @@ class ASRProvider(ASRProviderBase):
                     logger.bind(tag=TAG).error(f"发送最后一帧失败: {e}")
 
             # 调用父类的handle_voice_stop方法处理识别结果
-            await super().handle_voice_stop(conn, asr_audio_task)
+            await super().handle_voice_stop(conn, asr_audio_task, pcm_data, speculation)
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
             import traceback
@@ -400,6 +426,7 @@ class ASRProvider(ASRProviderBase):
                 logger.bind(tag=TAG).error(f"关闭WebSocket连接失败: {e}")
             finally:
                 self.asr_ws = None
+        self.warm.release()
 
         # 清理连接的音频缓存
         if conn:
@@ -420,6 +447,7 @@ class ASRProvider(ASRProviderBase):
 
     async def close(self):
         """资源清理方法"""
+        await self.warm.close()
         if self.asr_ws:
             await self.asr_ws.close()
             self.asr_ws = None
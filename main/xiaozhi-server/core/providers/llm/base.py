@@ -1,12 +1,61 @@
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.metrics import LLM_PROMPT_TOKENS, LLM_CACHED_PROMPT_TOKENS
 
 TAG = __name__
 logger = setup_logging()
 
+
+async def iterate_in_thread(generator):
+    """在线程中逐个取出同步生成器的结果，供异步调用方使用
+
+    取消后不再读取，等正在进行的读取返回后关闭生成器；上游请求只能在下一个分片到达时结束
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(None, next, generator, done)
+            item = await pending
+            if item is done:
+                break
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _: generator.close())
+        else:
+            generator.close()
+
+
+def record_prompt_usage(model, prompt_tokens, cached_tokens=None):
+    """统计输入token数及命中上游提示词缓存的token数，两者之比即缓存命中率"""
+    if not prompt_tokens:
+        return
+    LLM_PROMPT_TOKENS.inc(prompt_tokens, model=model)
+    if cached_tokens:
+        LLM_CACHED_PROMPT_TOKENS.inc(cached_tokens, model=model)
+
+
+def is_first_user_turn(dialogue) -> bool:
+    """本次请求是否为连接中第一轮用户提问（最后一条是唯一的用户消息）"""
+    return (
+        bool(dialogue)
+        and dialogue[-1]["role"] == "user"
+        and sum(1 for m in dialogue if m["role"] == "user") == 1
+    )
+
+
 class LLMProviderBase(ABC):
+    # 是否原生实现了异步流式接口（取消时可以立即中断上游请求）
+    native_async = False
+    # 上游自行保存对话历史、只发送最新的用户消息（如Dify、Coze），不需要截断和摘要对话窗口
+    server_side_history = False
+
     @abstractmethod
-    def response(self, session_id, dialogue):
+    def response(self, session_id, dialogue, **kwargs):
         """LLM response generator"""
         pass
 
@@ -25,8 +74,8 @@ class LLMProviderBase(ABC):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
-    
-    def response_with_functions(self, session_id, dialogue, functions=None):
+
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         """
         Default implementation for function calling (streaming)
         This should be overridden by providers that support function calls
@@ -34,6 +83,28 @@ class LLMProviderBase(ABC):
         Returns: generator that yields either text tokens or a special function call token
         """
         # For providers that don't support functions, just return regular response
-        for token in self.response(session_id, dialogue):
+        for token in self.response(session_id, dialogue, **kwargs):
             yield token, None
 
+    async def response_async(self, session_id, dialogue, **kwargs):
+        """异步流式接口，默认在线程中迭代同步接口，原生实现的子类需同时设置 native_async"""
+        async for token in iterate_in_thread(self.response(session_id, dialogue, **kwargs)):
+            yield token
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        """异步流式接口（带工具调用），默认在线程中迭代同步接口"""
+        async for item in iterate_in_thread(
+            self.response_with_functions(session_id, dialogue, functions=functions, **kwargs)
+        ):
+            yield item
+
+    def loop_client(self, factory):
+        """按事件循环缓存异步客户端，httpx的异步连接池不能跨事件循环使用"""
+        loop = asyncio.get_running_loop()
+        clients = self.__dict__.get("_loop_clients")
+        if clients is None:
+            clients = self.__dict__["_loop_clients"] = weakref.WeakKeyDictionary()
+        client = clients.get(loop)
+        if client is None:
+            client = clients[loop] = factory()
+        return client
@@ -1,7 +1,8 @@
 import json
+import httpx
 from config.logger import setup_logging
 import requests
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, is_first_user_turn
 from core.providers.llm.system_prompt import get_system_prompt_for_function
 from core.utils.util import check_model_key
 
@@ -10,6 +11,9 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    native_async = True
+    server_side_history = True
+
     def __init__(self, config):
         self.api_key = config["api_key"]
         self.mode = config.get("mode", "chat-messages")
@@ -19,94 +23,128 @@ class LLMProvider(LLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    def response(self, session_id, dialogue, **kwargs):
-        try:
-            # 取最后一条用户消息
-            last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
-            conversation_id = self.session_conversation_map.get(session_id)
+    def _build_request(self, session_id, dialogue):
+        # 取最后一条用户消息
+        last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+        conversation_id = self.session_conversation_map.get(session_id)
 
-            # 发起流式请求
-            if self.mode == "chat-messages":
-                request_json = {
-                    "query": last_msg["content"],
-                    "response_mode": "streaming",
-                    "user": session_id,
-                    "inputs": {},
-                    "conversation_id": conversation_id,
-                }
-            elif self.mode == "workflows/run":
-                request_json = {
-                    "inputs": {"query": last_msg["content"]},
-                    "response_mode": "streaming",
-                    "user": session_id,
-                }
-            elif self.mode == "completion-messages":
-                request_json = {
-                    "inputs": {"query": last_msg["content"]},
-                    "response_mode": "streaming",
-                    "user": session_id,
-                }
+        # 发起流式请求
+        if self.mode == "chat-messages":
+            request_json = {
+                "query": last_msg["content"],
+                "response_mode": "streaming",
+                "user": session_id,
+                "inputs": {},
+                "conversation_id": conversation_id,
+            }
+        elif self.mode == "workflows/run":
+            request_json = {
+                "inputs": {"query": last_msg["content"]},
+                "response_mode": "streaming",
+                "user": session_id,
+            }
+        elif self.mode == "completion-messages":
+            request_json = {
+                "inputs": {"query": last_msg["content"]},
+                "response_mode": "streaming",
+                "user": session_id,
+            }
+        return request_json
 
+    def _parse_line(self, session_id, line):
+        """解析一行SSE数据，返回需要输出的文本"""
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        if not line.startswith(b"data: "):
+            return None
+        event = json.loads(line[6:])
+        if self.mode == "chat-messages":
+            # 如果没有找到conversation_id，则获取此次conversation_id
+            if not self.session_conversation_map.get(session_id):
+                conversation_id = event.get("conversation_id")
+                if conversation_id:
+                    self.session_conversation_map[session_id] = (
+                        conversation_id  # 更新映射
+                    )
+            # 过滤 message_replace 事件，此事件会全量推一次
+            if event.get("event") != "message_replace" and event.get("answer"):
+                return event["answer"]
+        elif self.mode == "workflows/run":
+            if event.get("event") == "workflow_finished":
+                if event["data"]["status"] == "succeeded":
+                    return event["data"]["outputs"]["answer"]
+                return "【服务响应异常】"
+        elif self.mode == "completion-messages":
+            # 过滤 message_replace 事件，此事件会全量推一次
+            if event.get("event") != "message_replace" and event.get("answer"):
+                return event["answer"]
+        return None
+
+    def response(self, session_id, dialogue, **kwargs):
+        try:
             with requests.post(
                 f"{self.base_url}/{self.mode}",
                 headers={"Authorization": f"Bearer {self.api_key}"},
-                json=request_json,
+                json=self._build_request(session_id, dialogue),
                 stream=True,
             ) as r:
-                if self.mode == "chat-messages":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
-                            event = json.loads(line[6:])
-                            # 如果没有找到conversation_id，则获取此次conversation_id
-                            if not conversation_id:
-                                conversation_id = event.get("conversation_id")
-                                self.session_conversation_map[session_id] = (
-                                    conversation_id  # 更新映射
-                                )
-                            # 过滤 message_replace 事件，此事件会全量推一次
-                            if event.get("event") != "message_replace" and event.get(
-                                "answer"
-                            ):
-                                yield event["answer"]
-                elif self.mode == "workflows/run":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
-                            event = json.loads(line[6:])
-                            if event.get("event") == "workflow_finished":
-                                if event["data"]["status"] == "succeeded":
-                                    yield event["data"]["outputs"]["answer"]
-                                else:
-                                    yield "【服务响应异常】"
-                elif self.mode == "completion-messages":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
-                            event = json.loads(line[6:])
-                            # 过滤 message_replace 事件，此事件会全量推一次
-                            if event.get("event") != "message_replace" and event.get(
-                                "answer"
-                            ):
-                                yield event["answer"]
+                for line in r.iter_lines():
+                    text = self._parse_line(session_id, line)
+                    if text:
+                        yield text
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
             yield "【服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        if len(dialogue) == 2 and functions is not None and len(functions) > 0:
+    async def response_async(self, session_id, dialogue, **kwargs):
+        try:
+            client = self.loop_client(lambda: httpx.AsyncClient(timeout=None))
+            # 取消时退出 async with，上游HTTP流随之关闭
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/{self.mode}",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=self._build_request(session_id, dialogue),
+            ) as r:
+                async for line in r.aiter_lines():
+                    text = self._parse_line(session_id, line)
+                    if text:
+                        yield text
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            yield "【服务响应异常】"
+
+    @staticmethod
+    def _prepare_function_dialogue(dialogue, functions):
+        if is_first_user_turn(dialogue) and functions is not None and len(functions) > 0:
             # 第一次调用llm， 取最后一条用户消息，附加tool提示词
             last_msg = dialogue[-1]["content"]
             function_str = json.dumps(functions, ensure_ascii=False)
             modify_msg = get_system_prompt_for_function(function_str) + last_msg
-            dialogue[-1]["content"] = modify_msg
+            # 替换为新的消息，不修改对话窗口中缓存的消息
+            dialogue[-1] = {**dialogue[-1], "content": modify_msg}
 
         # 如果最后一个是 role="tool"，附加到user上
         if len(dialogue) > 1 and dialogue[-1]["role"] == "tool":
             assistant_msg = "\ntool call result: " + dialogue[-1]["content"] + "\n\n"
             while len(dialogue) > 1:
                 if dialogue[-1]["role"] == "user":
-                    dialogue[-1]["content"] = assistant_msg + dialogue[-1]["content"]
+                    dialogue[-1] = {
+                        **dialogue[-1],
+                        "content": assistant_msg + dialogue[-1]["content"],
+                    }
                     break
                 dialogue.pop()
+        return dialogue
 
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        dialogue = self._prepare_function_dialogue(dialogue, functions)
         for token in self.response(session_id, dialogue):
             yield token, None
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        dialogue = self._prepare_function_dialogue(dialogue, functions)
+        async for token in self.response_async(session_id, dialogue):
+            yield token, None
@@ -9,6 +9,8 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    server_side_history = True
+
     def __init__(self, config):
         self.api_key = config["api_key"]
         self.base_url = config.get("base_url")
@@ -67,7 +69,7 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
             yield "【服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         logger.bind(tag=TAG).error(
             f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
         )
@@ -6,7 +6,7 @@ import requests
 from google import generativeai as genai
 from google.generativeai import types, GenerationConfig
 
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, record_prompt_usage
 from core.utils.util import check_model_key
 from config.logger import setup_logging
 from google.generativeai.types import GenerateContentResponse
@@ -67,6 +67,8 @@ def setup_proxy_env(http_proxy: str | None, https_proxy: str | None):
 
 
 class LLMProvider(LLMProviderBase):
+    native_async = True
+
     def __init__(self, cfg: Dict[str, Any]):
         self.model_name = cfg.get("model_name", "gemini-2.0-flash")
         self.api_key = cfg["api_key"]
@@ -122,10 +124,19 @@ class LLMProvider(LLMProviderBase):
     def response(self, session_id, dialogue, **kwargs):
         yield from self._generate(dialogue, None)
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         yield from self._generate(dialogue, self._build_tools(functions))
 
-    def _generate(self, dialogue, tools):
+    async def response_async(self, session_id, dialogue, **kwargs):
+        async for item in self._generate_async(dialogue, None):
+            yield item
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        async for item in self._generate_async(dialogue, self._build_tools(functions)):
+            yield item
+
+    @staticmethod
+    def _build_contents(dialogue):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
         # 拼接对话
@@ -164,7 +175,33 @@ class LLMProvider(LLMProviderBase):
                     "parts": [{"text": str(m.get("content", ""))}],
                 }
             )
+        return contents
 
+    @staticmethod
+    def _function_call(part):
+        fc = part.function_call
+        return [
+            SimpleNamespace(
+                id=uuid.uuid4().hex,
+                type="function",
+                function=SimpleNamespace(
+                    name=fc.name,
+                    arguments=json.dumps(dict(fc.args), ensure_ascii=False),
+                ),
+            )
+        ]
+
+    def _record_usage(self, usage):
+        # usage_metadata 在流式分片中累计，取最后一个；cached_content_token_count 为命中隐式/显式缓存的token数
+        if usage is not None:
+            record_prompt_usage(
+                self.model_name,
+                getattr(usage, "prompt_token_count", 0),
+                getattr(usage, "cached_content_token_count", 0),
+            )
+
+    def _generate(self, dialogue, tools):
+        contents = self._build_contents(dialogue)
         stream: GenerateContentResponse = self.model.generate_content(
             contents=contents,
             generation_config=self.gen_cfg,
@@ -173,34 +210,51 @@ class LLMProvider(LLMProviderBase):
             timeout=self.timeout,
         )
 
+        usage = None
         try:
             for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None) or usage
                 cand = chunk.candidates[0]
                 for part in cand.content.parts:
                     # a) 函数调用-通常是最后一段话才是函数调用
                     if getattr(part, "function_call", None):
-                        fc = part.function_call
-                        yield None, [
-                            SimpleNamespace(
-                                id=uuid.uuid4().hex,
-                                type="function",
-                                function=SimpleNamespace(
-                                    name=fc.name,
-                                    arguments=json.dumps(
-                                        dict(fc.args), ensure_ascii=False
-                                    ),
-                                ),
-                            )
-                        ]
+                        yield None, self._function_call(part)
                         return
                     # b) 普通文本
                     if getattr(part, "text", None):
                         yield part.text if tools is None else (part.text, None)
 
         finally:
+            self._record_usage(usage)
             if tools is not None:
                 yield None, None  # function‑mode 结束，返回哑包
 
+    async def _generate_async(self, dialogue, tools):
+        # 异步流式请求，打断时取消正在等待的分片，上游流随之关闭
+        stream = await self.model.generate_content_async(
+            contents=self._build_contents(dialogue),
+            generation_config=self.gen_cfg,
+            tools=tools,
+            stream=True,
+            request_options={"timeout": self.timeout},
+        )
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                cand = chunk.candidates[0]
+                for part in cand.content.parts:
+                    if getattr(part, "function_call", None):
+                        yield None, self._function_call(part)
+                        yield None, None
+                        return
+                    if getattr(part, "text", None):
+                        yield part.text if tools is None else (part.text, None)
+        finally:
+            self._record_usage(usage)
+        if tools is not None:
+            yield None, None  # function‑mode 结束，返回哑包
+
     # 关闭stream，预留后续打断对话功能的功能方法，官方文档推荐打断对话要关闭上一个流，可以有效减少配额计费和资源占用
     @staticmethod
     def _safe_finish_stream(stream: GenerateContentResponse):
@@ -8,6 +8,8 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    server_side_history = True
+
     def __init__(self, config):
         self.agent_id = config.get("agent_id")  # 对应 agent_id
         self.api_key = config.get("api_key")
@@ -65,7 +67,7 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"生成响应时出错: {e}")
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         logger.bind(tag=TAG).error(
             f"homeassistant不支持（function call），建议使用其他意图识别"
         )
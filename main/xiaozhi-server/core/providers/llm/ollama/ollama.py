@@ -1,5 +1,5 @@
 from config.logger import setup_logging
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import json
 from core.providers.llm.base import LLMProviderBase
 
@@ -7,7 +7,44 @@ TAG = __name__
 logger = setup_logging()
 
 
+class ThinkFilter:
+    """过滤<think></think>标签内的内容，处理标签跨多个chunk的情况"""
+
+    def __init__(self):
+        self.is_active = True
+        self.buffer = ""
+
+    def feed(self, content):
+        # 将内容添加到缓冲区
+        self.buffer += content
+
+        # 处理缓冲区中的标签
+        while "<think>" in self.buffer and "</think>" in self.buffer:
+            # 找到完整的<think></think>标签并移除
+            pre = self.buffer.split("<think>", 1)[0]
+            post = self.buffer.split("</think>", 1)[1]
+            self.buffer = pre + post
+
+        # 处理只有开始标签的情况
+        if "<think>" in self.buffer:
+            self.is_active = False
+            self.buffer = self.buffer.split("<think>", 1)[0]
+
+        # 处理只有结束标签的情况
+        if "</think>" in self.buffer:
+            self.is_active = True
+            self.buffer = self.buffer.split("</think>", 1)[1]
+
+        # 如果当前处于活动状态且缓冲区有内容，则输出
+        if self.is_active and self.buffer:
+            output, self.buffer = self.buffer, ""  # 清空缓冲区
+            return output
+        return ""
+
+
 class LLMProvider(LLMProviderBase):
+    native_async = True
+
     def __init__(self, config):
         self.model_name = config.get("model_name")
         self.base_url = config.get("base_url", "http://localhost:11434")
@@ -24,67 +61,55 @@ class LLMProvider(LLMProviderBase):
         # 检查是否是qwen3模型
         self.is_qwen3 = self.model_name and self.model_name.lower().startswith("qwen3")
 
+    def _async_client(self):
+        return self.loop_client(
+            lambda: AsyncOpenAI(base_url=self.base_url, api_key="ollama")
+        )
+
+    def _prepare_dialogue(self, dialogue):
+        # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
+        if not self.is_qwen3:
+            return dialogue
+        # 复制对话列表，避免修改原始对话
+        dialogue_copy = dialogue.copy()
+
+        # 找到最后一条用户消息
+        for i in range(len(dialogue_copy) - 1, -1, -1):
+            if dialogue_copy[i]["role"] == "user":
+                # 在用户消息前添加/no_think指令
+                # 替换为新的消息，不修改对话窗口中缓存的消息
+                dialogue_copy[i] = {
+                    **dialogue_copy[i],
+                    "content": "/no_think " + dialogue_copy[i]["content"],
+                }
+                logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
+                break
+
+        # 使用修改后的对话
+        return dialogue_copy
+
+    @staticmethod
+    def _delta(chunk):
+        return chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+
     def response(self, session_id, dialogue, **kwargs):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
-
-                # 使用修改后的对话
-                dialogue = dialogue_copy
-
             responses = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
             )
-            is_active = True
-            # 用于处理跨chunk的标签
-            buffer = ""
+            think_filter = ThinkFilter()
 
             for chunk in responses:
                 try:
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
+                    delta = self._delta(chunk)
                     content = delta.content if hasattr(delta, "content") else ""
 
                     if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
-
-                        # 如果当前处于活动状态且缓冲区有内容，则输出
-                        if is_active and buffer:
-                            yield buffer
-                            buffer = ""  # 清空缓冲区
+                        output = think_filter.feed(content)
+                        if output:
+                            yield output
 
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
@@ -93,43 +118,19 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             yield "【Ollama服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
-
-                # 使用修改后的对话
-                dialogue = dialogue_copy
-
             stream = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=dialogue,
+                messages=self._prepare_dialogue(dialogue),
                 stream=True,
                 tools=functions,
             )
-
-            is_active = True
-            buffer = ""
+            think_filter = ThinkFilter()
 
             for chunk in stream:
                 try:
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
+                    delta = self._delta(chunk)
                     content = delta.content if hasattr(delta, "content") else None
                     tool_calls = (
                         delta.tool_calls if hasattr(delta, "tool_calls") else None
@@ -142,30 +143,9 @@ class LLMProvider(LLMProviderBase):
 
                     # 处理文本内容
                     if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
-
-                        # 如果当前处于活动状态且缓冲区有内容，则输出
-                        if is_active and buffer:
-                            yield buffer, None
-                            buffer = ""  # 清空缓冲区
+                        output = think_filter.feed(content)
+                        if output:
+                            yield output, None
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"Error processing function chunk: {e}")
                     continue
@@ -173,3 +153,54 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
             yield f"【Ollama服务响应异常: {str(e)}】", None
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        try:
+            responses = await self._async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+            )
+            think_filter = ThinkFilter()
+
+            async with responses:
+                async for chunk in responses:
+                    delta = self._delta(chunk)
+                    content = delta.content if hasattr(delta, "content") else ""
+                    if content:
+                        output = think_filter.feed(content)
+                        if output:
+                            yield output
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
+            yield "【Ollama服务响应异常】"
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        try:
+            stream = await self._async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+                tools=functions,
+            )
+            think_filter = ThinkFilter()
+
+            async with stream:
+                async for chunk in stream:
+                    delta = self._delta(chunk)
+                    content = delta.content if hasattr(delta, "content") else None
+                    tool_calls = (
+                        delta.tool_calls if hasattr(delta, "tool_calls") else None
+                    )
+                    if tool_calls:
+                        yield None, tool_calls
+                        continue
+                    if content:
+                        output = think_filter.feed(content)
+                        if output:
+                            yield output, None
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
+            yield f"【Ollama服务响应异常: {str(e)}】", None
@@ -3,13 +3,15 @@ import openai
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, record_prompt_usage
 
 TAG = __name__
 logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    native_async = True
+
     def __init__(self, config):
         self.model_name = config.get("model_name")
         self.api_key = config.get("api_key")
@@ -20,6 +22,12 @@ class LLMProvider(LLMProviderBase):
         # 增加timeout的配置项，单位为秒
         timeout = config.get("timeout", 300)
         self.timeout = int(timeout) if timeout else 300
+        # 流式响应末尾返回用量（含命中提示词缓存的token数），需服务支持 stream_options，默认关闭
+        self.stream_usage = str(config.get("stream_usage", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
 
         param_defaults = {
             "max_tokens": (500, int),
@@ -48,32 +56,82 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
 
+    def _async_client(self):
+        return self.loop_client(
+            lambda: openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+            )
+        )
+
+    def _stream_params(self):
+        if self.stream_usage:
+            return {"stream_options": {"include_usage": True}}
+        return {}
+
+    def _create_params(self, dialogue, kwargs):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            max_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", self.top_p),
+            frequency_penalty=kwargs.get("frequency_penalty", self.frequency_penalty),
+            **self._stream_params(),
+        )
+
+    def _function_params(self, dialogue, functions, kwargs):
+        extra_params = self._stream_params()
+        if "max_tokens" in kwargs:
+            extra_params["max_tokens"] = kwargs["max_tokens"]
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            tools=functions,
+            **extra_params,
+        )
+
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            # 检查是否存在有效的choice且content不为空
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return delta.content if hasattr(delta, "content") else ""
+        except IndexError:
+            return ""
+
+    def _log_usage(self, chunk):
+        # 存在 CompletionUsage 消息时，生成 Token 消耗 log
+        usage_info = getattr(chunk, "usage", None)
+        if isinstance(usage_info, CompletionUsage):
+            # 命中提示词缓存的token数：OpenAI/通义千问/vLLM 在 prompt_tokens_details 中，DeepSeek 为 prompt_cache_hit_tokens
+            details = getattr(usage_info, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) or getattr(
+                usage_info, "prompt_cache_hit_tokens", None
+            )
+            record_prompt_usage(
+                self.model_name, usage_info.prompt_tokens, cached_tokens
+            )
+            logger.bind(tag=TAG).info(
+                f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}"
+                f"（命中缓存 {cached_tokens or 0}），"
+                f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+            )
+
     def response(self, session_id, dialogue, **kwargs):
         try:
             responses = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                temperature=kwargs.get("temperature", self.temperature),
-                top_p=kwargs.get("top_p", self.top_p),
-                frequency_penalty=kwargs.get(
-                    "frequency_penalty", self.frequency_penalty
-                ),
+                **self._create_params(dialogue, kwargs)
             )
 
             is_active = True
             for chunk in responses:
-                try:
-                    # 检查是否存在有效的choice且content不为空
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else ""
-                except IndexError:
-                    content = ""
+                self._log_usage(chunk)
+                content = self._chunk_content(chunk)
                 if content:
                     # 处理标签跨多个chunk的情况
                     if "<think>" in content:
@@ -88,10 +146,10 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         try:
             stream = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True, tools=functions
+                **self._function_params(dialogue, functions, kwargs)
             )
 
             for chunk in stream:
@@ -100,14 +158,50 @@ class LLMProvider(LLMProviderBase):
                     yield chunk.choices[0].delta.content, chunk.choices[
                         0
                     ].delta.tool_calls
-                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                else:
+                    self._log_usage(chunk)
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        try:
+            responses = await self._async_client().chat.completions.create(
+                **self._create_params(dialogue, kwargs)
+            )
+            is_active = True
+            # 取消时在这里抛出 CancelledError，async with 退出时关闭上游HTTP流
+            async with responses:
+                async for chunk in responses:
+                    self._log_usage(chunk)
+                    content = self._chunk_content(chunk)
+                    if content:
+                        if "<think>" in content:
+                            is_active = False
+                            content = content.split("<think>")[0]
+                        if "</think>" in content:
+                            is_active = True
+                            content = content.split("</think>")[-1]
+                        if is_active:
+                            yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        try:
+            stream = await self._async_client().chat.completions.create(
+                **self._function_params(dialogue, functions, kwargs)
+            )
+            async with stream:
+                async for chunk in stream:
+                    if getattr(chunk, "choices", None):
+                        yield chunk.choices[0].delta.content, chunk.choices[
+                            0
+                        ].delta.tool_calls
+                    else:
+                        self._log_usage(chunk)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
@@ -63,7 +63,7 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"Error in Xinference response generation: {e}")
             yield "【Xinference服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         try:
             logger.bind(tag=TAG).debug(
                 f"Sending function call request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}"
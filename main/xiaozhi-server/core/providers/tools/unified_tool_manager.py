@@ -51,10 +51,11 @@ class ToolManager:
         if self._cached_function_descriptions is not None:
             return self._cached_function_descriptions
 
+        # 按名称排序：设备MCP等工具异步加入、刷新后顺序不变，请求前缀保持稳定以命中上游提示词缓存
         descriptions = []
         tools = self.get_all_tools()
-        for tool_definition in tools.values():
-            descriptions.append(tool_definition.description)
+        for name in sorted(tools):
+            descriptions.append(tools[name].description)
 
         self._cached_function_descriptions = descriptions
         return descriptions
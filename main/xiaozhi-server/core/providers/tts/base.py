@@ -13,6 +13,10 @@ from typing import Callable, Any
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
+from core.utils.loop_queue import LoopQueue
+from core.utils.generation import StampedQueue, is_stale
+from core.utils.metrics import TTS_FIRST_AUDIO
+from core.utils.turn_trace import turn_tracer
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
@@ -36,9 +40,13 @@ class TTSProviderBase(ABC):
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
         self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        # 当前正在合成的消息所属的对话轮次，音频入队时附加该轮次，打断后出队直接丢弃
+        self.generation = None
+        self.tts_audio_queue = StampedQueue(self._current_generation)
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
+        # 正在记录发送音频的轮次 [generation, 音频队列数据, 完成回调]，供回复缓存使用
+        self._capture = None
 
         self.tts_text_buff = []
         self.punctuations = (
@@ -69,6 +77,82 @@ class TTSProviderBase(ABC):
         self.processed_chars = 0
         self.is_first_sentence = True
 
+    def _current_generation(self):
+        return self.generation
+
+    def _accept_message(self, message) -> bool:
+        """文本线程取出消息后调用：已被打断的轮次直接丢弃，否则记录为当前合成的轮次"""
+        if is_stale(message.generation):
+            return False
+        self.generation = message.generation
+        return True
+
+    def _cancelled(self) -> bool:
+        return is_stale(self.generation)
+
+    def run_for_generation(self, coro):
+        """在TTS线程中运行合成协程，所属轮次被打断时立即取消，上游HTTP流随之关闭"""
+        generation = self.generation
+
+        async def runner():
+            loop = asyncio.get_running_loop()
+            task = asyncio.current_task()
+
+            def cancel():
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # 合成已结束，事件循环已关闭
+                    pass
+
+            remove = generation.on_cancel(cancel) if generation else None
+            try:
+                return await coro
+            finally:
+                if remove:
+                    remove()
+
+        try:
+            return asyncio.run(runner())
+        except asyncio.CancelledError:
+            logger.bind(tag=TAG).info("对话已打断，取消TTS合成")
+            return None
+
+    def start_capture(self, generation):
+        """开始记录该轮实际发送的音频队列数据"""
+        self._capture = [generation, [], None]
+
+    def finish_capture(self, generation, on_complete):
+        """该轮最后一个音频发送后，以记录的数据回调 on_complete"""
+        capture = self._capture
+        if capture is not None and capture[0] is generation:
+            capture[2] = on_complete
+
+    def discard_capture(self, generation=None):
+        capture = self._capture
+        if capture is not None and (generation is None or capture[0] is generation):
+            self._capture = None
+
+    def _capture_audio(self, generation, sentence_type, audio_datas, text):
+        capture = self._capture
+        if capture is None or capture[0] is not generation:
+            return
+        capture[1].append((sentence_type, audio_datas, text))
+        if sentence_type == SentenceType.LAST:
+            self._capture = None
+            if capture[2] is not None:
+                try:
+                    capture[2](capture[1])
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"保存本轮音频失败: {e}")
+
+    def replay_audio(self, generation, items):
+        """回放缓存的整轮音频队列数据，不经过文本处理和语音合成"""
+        self.generation = generation
+        self.tts_audio_first_sentence = True
+        for item in items:
+            self.tts_audio_queue.put(item)
+
     def generate_filename(self, extension=".wav"):
         return os.path.join(
             self.output_file,
@@ -77,6 +161,7 @@ class TTSProviderBase(ABC):
 
     def handle_opus(self, opus_data: bytes):
         logger.bind(tag=TAG).debug(f"推送数据到队列里面帧数～～ {len(opus_data)}")
+        turn_tracer.mark(self.conn, "tts_first_audio")
         self.tts_audio_queue.put((SentenceType.MIDDLE, opus_data, None))
 
     def handle_audio_file(self, file_audio: bytes, text):
@@ -84,12 +169,15 @@ class TTSProviderBase(ABC):
 
     def to_tts_stream(self, text, opus_handler: Callable[[bytes], None] = None) -> None:
         text = MarkdownCleaner.clean_markdown(text)
+        turn_tracer.mark(self.conn, "tts_request")
         max_repeat_time = 5
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
+                if self._cancelled():
+                    return None
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = self.run_for_generation(self.text_to_speak(text, None))
                     if audio_bytes:
                         self.tts_audio_queue.put((SentenceType.FIRST, None, text))
                         audio_bytes_to_data_stream(
@@ -119,8 +207,12 @@ class TTSProviderBase(ABC):
             tmp_file = self.generate_filename()
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
+                    if self._cancelled():
+                        if os.path.exists(tmp_file):
+                            os.remove(tmp_file)
+                        return None
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        self.run_for_generation(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -237,6 +329,7 @@ class TTSProviderBase(ABC):
             else:
                 sentence_id = str(uuid.uuid4().hex)
                 conn.sentence_id = sentence_id
+        generation = getattr(conn, "generation", None)
         # 对于单句的文本，进行分段处理
         segments = re.split(r"([。！？!?；;\n])", content_detail)
         for seg in segments:
@@ -247,17 +340,27 @@ class TTSProviderBase(ABC):
                     content_type=content_type,
                     content_detail=seg,
                     content_file=content_file,
+                    generation=generation,
                 )
             )
 
     async def open_audio_channels(self, conn):
         self.conn = conn
         # tts 消化线程
+        # 各TTS提供者的文本处理均为阻塞式实现，两种运行模式下都保留该线程
         self.tts_priority_thread = threading.Thread(
             target=self.tts_text_priority_thread, daemon=True
         )
         self.tts_priority_thread.start()
 
+        if getattr(conn, "runtime_mode", "thread") == "asyncio":
+            # 音频播放直接在事件循环上消费，TTS线程通过LoopQueue投递音频
+            self.tts_audio_queue = LoopQueue(conn.loop, stamp=self._current_generation)
+            self.audio_play_priority_task = conn.start_pipeline_task(
+                self._audio_play_priority_task()
+            )
+            return
+
         # 音频播放 消化线程
         self.audio_play_priority_thread = threading.Thread(
             target=self._audio_play_priority_thread, daemon=True
@@ -270,6 +373,8 @@ class TTSProviderBase(ABC):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
+                if not self._accept_message(message):
+                    continue
                 if message.sentence_type == SentenceType.FIRST:
                     self.conn.client_abort = False
                 if self.conn.client_abort:
@@ -310,51 +415,106 @@ class TTSProviderBase(ABC):
 
     def _audio_play_priority_thread(self):
         # 需要上报的文本和音频列表
-        enqueue_text = None
-        enqueue_audio = None
+        self._report_text, self._report_audio = None, None
         while not self.conn.stop_event.is_set():
             text = None
             try:
                 try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
-                        timeout=0.1
+                    generation, (sentence_type, audio_datas, text) = (
+                        self.tts_audio_queue.get(timeout=0.1)
                     )
                 except queue.Empty:
                     if self.conn.stop_event.is_set():
                         break
                     continue
 
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).debug("收到打断信号，跳过当前音频数据")
-                    enqueue_text, enqueue_audio = None, []
+                if not self._prepare_audio_message(
+                    generation, sentence_type, audio_datas, text
+                ):
                     continue
 
-                # 收到下一个文本开始或会话结束时进行上报
-                if sentence_type is not SentenceType.MIDDLE:
-                    # 上报TTS数据
-                    if enqueue_text is not None and enqueue_audio is not None:
-                        enqueue_tts_report(self.conn, enqueue_text, enqueue_audio)
-                    enqueue_audio = []
-                    enqueue_text = text
-
-                # 收集上报音频数据
-                if isinstance(audio_datas, bytes) and enqueue_audio is not None:
-                    enqueue_audio.append(audio_datas)
-
                 # 发送音频
                 future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
+                    sendAudioMessage(
+                        self.conn, sentence_type, audio_datas, text, generation
+                    ),
                     self.conn.loop,
                 )
                 future.result()
 
-                # 记录输出和报告
-                if self.conn.max_output_size > 0 and text:
-                    add_device_output(self.conn.headers.get("device-id"), len(text))
+                self._record_device_output(text)
 
             except Exception as e:
                 logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
 
+    async def _audio_play_priority_task(self):
+        """音频播放任务（asyncio模式），与 _audio_play_priority_thread 逻辑一致"""
+        self._report_text, self._report_audio = None, None
+        while not self.conn.stop_event.is_set():
+            generation, (sentence_type, audio_datas, text) = (
+                await self.tts_audio_queue.get()
+            )
+            try:
+                if not self._prepare_audio_message(
+                    generation, sentence_type, audio_datas, text
+                ):
+                    continue
+                await sendAudioMessage(
+                    self.conn, sentence_type, audio_datas, text, generation
+                )
+                self._record_device_output(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"audio_play_priority_task: {text} {e}")
+
+    def _prepare_audio_message(
+        self, generation, sentence_type, audio_datas, text
+    ) -> bool:
+        """处理打断和上报，返回是否需要发送该音频"""
+        if is_stale(generation):
+            # 被打断轮次的残留数据，直接丢弃
+            self._report_text, self._report_audio = None, []
+            self.discard_capture(generation)
+            return False
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).debug("收到打断信号，跳过当前音频数据")
+            self._report_text, self._report_audio = None, []
+            self.discard_capture(generation)
+            return False
+
+        # 收到下一个文本开始或会话结束时进行上报
+        if sentence_type is not SentenceType.MIDDLE:
+            # 上报TTS数据
+            if self._report_text is not None and self._report_audio is not None:
+                enqueue_tts_report(self.conn, self._report_text, self._report_audio)
+            self._report_audio = []
+            self._report_text = text
+
+        # 收集上报音频数据
+        if isinstance(audio_datas, bytes) and self._report_audio is not None:
+            self._report_audio.append(audio_datas)
+
+        # 未经过 handle_opus 的提供者，在出队播放时补记首个音频时间
+        if audio_datas:
+            turn_tracer.mark(self.conn, "tts_first_audio")
+
+        # 本轮首个音频包，统计首段文本到首个音频的耗时
+        first_text_time = getattr(self.conn, "tts_first_text_time", None)
+        if first_text_time is not None and audio_datas:
+            self.conn.tts_first_text_time = None
+            TTS_FIRST_AUDIO.observe(
+                time.monotonic() - first_text_time,
+                provider=self.conn.config["selected_module"].get("TTS", ""),
+            )
+        self._capture_audio(generation, sentence_type, audio_datas, text)
+        return True
+
+    def _record_device_output(self, text):
+        # 记录输出和报告
+        if self.conn.max_output_size > 0 and text:
+            add_device_output(self.conn.headers.get("device-id"), len(text))
+
     async def start_session(self, session_id):
         pass
 
@@ -397,10 +557,12 @@ class TTSProviderBase(ABC):
             if self.is_first_sentence:
                 self.is_first_sentence = False
 
+            turn_tracer.mark(self.conn, "first_segment")
             return segment_text
         elif self.tts_stop_request and current_text:
             segment_text = current_text
             self.is_first_sentence = True  # 重置标志
+            turn_tracer.mark(self.conn, "first_segment")
             return segment_text
         else:
             return None
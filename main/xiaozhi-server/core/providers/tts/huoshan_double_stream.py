@@ -213,6 +213,8 @@ class TTSProvider(TTSProviderBase):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
+                # 已被打断的轮次按打断处理（需要结束上游会话）
+                accepted = self._accept_message(message)
                 logger.bind(tag=TAG).debug(
                     f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
                 )
@@ -220,7 +222,7 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.FIRST:
                     self.conn.client_abort = False
 
-                if self.conn.client_abort:
+                if self.conn.client_abort or not accepted:
                     try:
                         logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
                         asyncio.run_coroutine_threadsafe(
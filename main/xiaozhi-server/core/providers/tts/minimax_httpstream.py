@@ -9,6 +9,7 @@ import traceback
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
 from core.utils.util import parse_string_to_list
+from core.utils.turn_trace import turn_tracer
 from core.providers.tts.base import TTSProviderBase
 from core.utils import opus_encoder_utils, textUtils
 from core.providers.tts.dto.dto import SentenceType, ContentType
@@ -81,6 +82,8 @@ class TTSProvider(TTSProviderBase):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
+                if not self._accept_message(message):
+                    continue
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
@@ -140,9 +143,10 @@ class TTSProvider(TTSProviderBase):
             metric_msg = f"[Metric] session_id={getattr(self.conn, 'sentence_id', 'unknown')}, first_audio_delay={first_audio_delay:.2f}ms"
             logger.bind(tag=TAG).info(metric_msg)
             
-            # 发送指标到前端
+            # 发送指标到前端（启用轮次追踪的带内输出时，由追踪记录统一发送）
+            if turn_tracer.has_sink("inband"):
+                return
             try:
-                import asyncio
                 metric_data = {
                     "type": "metric",
                     "session_id": getattr(self.conn, 'sentence_id', 'unknown'),
@@ -161,7 +165,7 @@ class TTSProvider(TTSProviderBase):
             max_repeat_time = 5
             text = MarkdownCleaner.clean_markdown(text)
             try:
-                asyncio.run(self.text_to_speak(text, is_last))
+                self.run_for_generation(self.text_to_speak(text, is_last))
             except Exception as e:
                 logger.bind(tag=TAG).warning(
                     f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -184,6 +188,7 @@ class TTSProvider(TTSProviderBase):
     async def text_to_speak(self, text, is_last):
         """流式处理TTS音频，每句只推送一次音频列表"""
         
+        turn_tracer.mark(self.conn, "tts_request")
         # 记录第一次发送文本的时间
         if self.first_text_time is None:
             self.first_text_time = time.time() * 1000  # 转换为毫秒
@@ -259,6 +264,7 @@ class TTSProvider(TTSProviderBase):
                                     pcm_data = bytes.fromhex(audio_hex)
                                     self.pcm_buffer.extend(pcm_data)
                                     
+                                    turn_tracer.mark(self.conn, "tts_first_audio")
                                     # 记录第一次收到音频的时间
                                     if self.first_audio_time is None:
                                         self.first_audio_time = time.time() * 1000  # 转换为毫秒
@@ -295,17 +301,18 @@ class TTSProvider(TTSProviderBase):
                             metric_msg = f"[Metric] session_id={getattr(self.conn, 'sentence_id', 'unknown')}, first_audio_delay={first_audio_delay:.2f}ms"
                             logger.bind(tag=TAG).info(metric_msg)
                             
-                            # 发送指标到前端
-                            try:
-                                metric_data = {
-                                    "type": "metric",
-                                    "session_id": getattr(self.conn, 'sentence_id', 'unknown'),
-                                    "first_audio_delay": first_audio_delay,
-                                    "message": metric_msg
-                                }
-                                await self.conn.websocket.send(json.dumps(metric_data))
-                            except Exception as e:
-                                logger.bind(tag=TAG).debug(f"发送指标到前端失败: {str(e)}")
+                            # 发送指标到前端（启用轮次追踪的带内输出时，由追踪记录统一发送）
+                            if not turn_tracer.has_sink("inband"):
+                                try:
+                                    metric_data = {
+                                        "type": "metric",
+                                        "session_id": getattr(self.conn, 'sentence_id', 'unknown'),
+                                        "first_audio_delay": first_audio_delay,
+                                        "message": metric_msg
+                                    }
+                                    await self.conn.websocket.send(json.dumps(metric_data))
+                                except Exception as e:
+                                    logger.bind(tag=TAG).debug(f"发送指标到前端失败: {str(e)}")
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"TTS请求异常: {e}")
@@ -1,5 +1,4 @@
 from abc import ABC, abstractmethod
-from typing import Optional
 
 
 class VADProviderBase(ABC):
@@ -7,3 +6,7 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """在事件循环中检测语音活动，支持批量推理的供应器可重写为异步等待推理结果"""
+        return self.is_vad(conn, data)
@@ -0,0 +1,78 @@
+import asyncio
+import numpy as np
+from config.logger import setup_logging
+from core.providers.vad.silero import VADProvider as SileroVADProvider
+from core.utils.vad_engine import CHUNK_SAMPLES, CONTEXT_SAMPLES, STATE_SIZE
+from core.utils.sidecar_client import get_sidecar_client
+
+TAG = __name__
+logger = setup_logging()
+
+# 共享内存中一次VAD请求的布局（float32）：state[2*128] | context[64] | chunks[N*512] | probs[N]
+_STATE_LEN = 2 * STATE_SIZE
+_HEAD_LEN = _STATE_LEN + CONTEXT_SAMPLES
+
+
+class SidecarVADEngine:
+    """把分片交给推理进程推理，连接的循环状态随请求写入共享内存，推理后写回"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _send(self, stream, chunks):
+        count = len(chunks)
+        arena = self.client.arena
+        size = _HEAD_LEN + count * (CHUNK_SAMPLES + 1)
+        # 共享内存不足时直接失败，不阻塞音频处理
+        offset = arena.alloc(size * 4)
+        view = np.ndarray((size,), dtype=np.float32, buffer=arena.shm.buf, offset=offset)
+        view[:_STATE_LEN] = stream.state.reshape(-1)
+        view[_STATE_LEN:_HEAD_LEN] = stream.context
+        view[_HEAD_LEN : _HEAD_LEN + count * CHUNK_SAMPLES] = np.asarray(chunks).reshape(-1)
+        future = self.client.request(
+            {"op": "vad", "offset": offset, "count": count}, offset
+        )
+        return view, future
+
+    @staticmethod
+    def _receive(stream, view, count) -> list:
+        stream.state = view[:_STATE_LEN].reshape(2, STATE_SIZE).copy()
+        stream.context = view[_STATE_LEN:_HEAD_LEN].copy()
+        return view[_HEAD_LEN + count * CHUNK_SAMPLES :].tolist()
+
+    def infer(self, stream, chunks) -> list:
+        if len(chunks) == 0:
+            return []
+        view, future = self._send(stream, chunks)
+        try:
+            self.client.result(future)
+            return self._receive(stream, view, len(chunks))
+        finally:
+            self.client.release(future)
+
+    async def infer_async(self, stream, chunks) -> list:
+        if len(chunks) == 0:
+            return []
+        view, future = self._send(stream, chunks)
+        try:
+            await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.client.timeout
+            )
+            return self._receive(stream, view, len(chunks))
+        finally:
+            # 超时放弃时区域保留到迟到响应返回，推理进程写回的状态不会覆盖其他请求
+            self.client.release(future)
+
+
+class VADProvider(SileroVADProvider):
+    """通过本地推理进程（core/inference_sidecar.py）推理的 Silero VAD
+
+    能量预筛、双阈值判定和自适应断句仍在本进程完成，只有模型推理交给推理进程
+    """
+
+    engine_name = "sidecar"
+
+    def _create_engine(self, config):
+        client = get_sidecar_client(config)
+        logger.bind(tag=TAG).info(f"VAD使用推理进程: {client.socket_path}")
+        return SidecarVADEngine(client)
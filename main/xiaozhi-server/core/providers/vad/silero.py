@@ -1,25 +1,22 @@
 import time
 import numpy as np
-import torch
-import opuslib_next
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
+from core.utils.vad_engine import BatchedVADEngine, VADStream, CHUNK_SAMPLES
+from core.utils.audio_ingest import get_ingest
+from core.utils.energy_gate import EnergyGate
+from core.utils.endpointing import AdaptiveEndpointer, get_state
 
 TAG = __name__
 logger = setup_logging()
 
 
 class VADProvider(VADProviderBase):
+    # 推理引擎名，用于指标标签
+    engine_name = "silero"
+
     def __init__(self, config):
         logger.bind(tag=TAG).info("SileroVAD", config)
-        self.model, _ = torch.hub.load(
-            repo_or_dir=config["model_dir"],
-            source="local",
-            model="silero_vad",
-            force_reload=False,
-        )
-
-        self.decoder = opuslib_next.Decoder(16000, 1)
 
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
@@ -36,53 +33,115 @@ class VADProvider(VADProviderBase):
         # 至少要多少帧才算有语音
         self.frame_window_threshold = 3
 
+        # 按语速、句长和流式识别结果为每句话计算静默窗口，silence_threshold_ms 作为上限
+        self.endpointer = AdaptiveEndpointer(
+            config.get("endpointing"), self.silence_threshold_ms, name=self.engine_name
+        )
+
+        # 明显静音的分片不送入模型
+        self.gate = EnergyGate(config, name=self.engine_name)
+
+        # 每个连接独立的循环状态，多个连接的分片合并批量推理
+        self.engine = self._create_engine(config)
+
+    def _create_engine(self, config):
+        """创建推理引擎，需提供 infer(stream, chunks) 和 infer_async(stream, chunks)"""
+        return BatchedVADEngine(
+            self._create_backend(config),
+            batching=bool(config.get("batch_inference", True)),
+            batch_wait_ms=config.get("batch_wait_ms", 5),
+            max_batch_size=config.get("max_batch_size", 64),
+            name=self.engine_name,
+        )
+
+    def _create_backend(self, config):
+        """加载模型并创建推理后端，torch 只在使用该后端时才导入"""
+        import torch
+        from core.utils.vad_engine import TorchSileroBackend
+
+        self.model, _ = torch.hub.load(
+            repo_or_dir=config["model_dir"],
+            source="local",
+            model="silero_vad",
+            force_reload=False,
+        )
+        return TorchSileroBackend(self.model)
+
+    def _get_stream(self, conn) -> VADStream:
+        stream = getattr(conn, "vad_stream", None)
+        if stream is None:
+            stream = VADStream(gate=self.gate.new_state())
+            conn.vad_stream = stream
+        return stream
+
+    def _prepare_chunks(self, conn, opus_packet):
+        """从接入缓冲中取出尚未处理的512采样点分片（音频包已在接入阶段解码）"""
+        stream = self._get_stream(conn)
+        frames = get_ingest(conn).vad_frames(CHUNK_SAMPLES)
+        if not frames:
+            return stream, []
+        # 转换为模型需要的格式，一次完成所有分片的转换
+        chunks = np.stack(frames).astype(np.float32) / 32768.0
+        return stream, chunks
+
+    def _gate(self, conn, stream, chunks):
+        """能量预筛，返回送入模型的分片和各分片在推理结果中的下标"""
+        if len(chunks) == 0:
+            return [], []
+        return self.gate.plan(stream.gate, chunks, in_speech=conn.client_have_voice)
+
+    @staticmethod
+    def _merge_probs(indexes, probs) -> list:
+        """被预筛跳过的分片语音概率记为0"""
+        return [probs[i] if i is not None else 0.0 for i in indexes]
+
+    def _apply_probs(self, conn, probs) -> bool:
+        """根据各分片的语音概率更新连接的语音状态"""
+        client_have_voice = False
+        endpoint = get_state(conn)
+        for speech_prob in probs:
+            # 双阈值判断
+            if speech_prob >= self.vad_threshold:
+                is_voice = True
+            elif speech_prob <= self.vad_threshold_low:
+                is_voice = False
+            else:
+                is_voice = conn.last_is_voice
+
+            # 声音没低于最低值则延续前一个状态，判断为有声音
+            conn.last_is_voice = is_voice
+
+            # 更新滑动窗口
+            conn.client_voice_window.append(is_voice)
+            client_have_voice = (conn.client_voice_window.count(True) >= self.frame_window_threshold)
+
+            # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了本句的静默窗口，则认为已经说完一句话
+            now = time.time() * 1000
+            if conn.client_have_voice and not client_have_voice and not conn.client_voice_stop:
+                stop_duration = now - conn.last_activity_time
+                if self.endpointer.should_stop(endpoint, stop_duration, now):
+                    conn.client_voice_stop = True
+            if client_have_voice:
+                conn.client_have_voice = True
+                conn.last_activity_time = now
+            self.endpointer.observe(endpoint, is_voice, conn.client_have_voice, now)
+
+        return client_have_voice
+
     def is_vad(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
-
-            # 处理缓冲区中的完整帧（每次处理512采样点）
-            client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_tensor = torch.from_numpy(audio_float32)
-
-                # 检测语音活动
-                with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (conn.client_voice_window.count(True) >= self.frame_window_threshold)
-
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
-
-            return client_have_voice
-        except opuslib_next.OpusError as e:
-            logger.bind(tag=TAG).info(f"解码错误: {e}")
+            stream, chunks = self._prepare_chunks(conn, opus_packet)
+            to_infer, indexes = self._gate(conn, stream, chunks)
+            probs = self.engine.infer(stream, to_infer)
+            return self._apply_probs(conn, self._merge_probs(indexes, probs))
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    async def is_vad_async(self, conn, opus_packet):
+        try:
+            stream, chunks = self._prepare_chunks(conn, opus_packet)
+            to_infer, indexes = self._gate(conn, stream, chunks)
+            probs = await self.engine.infer_async(stream, to_infer)
+            return self._apply_probs(conn, self._merge_probs(indexes, probs))
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
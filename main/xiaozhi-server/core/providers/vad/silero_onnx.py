@@ -0,0 +1,31 @@
+import os
+from config.logger import setup_logging
+from core.providers.vad.silero import VADProvider as SileroVADProvider
+from core.utils.vad_engine import OnnxSileroBackend
+
+TAG = __name__
+logger = setup_logging()
+
+
+class VADProvider(SileroVADProvider):
+    """使用 ONNX Runtime 推理的 Silero VAD，运行时不需要 torch
+
+    判定逻辑与 silero 完全一致，只替换推理后端
+    """
+
+    engine_name = "silero_onnx"
+
+    def _create_backend(self, config):
+        model_path = config.get("model_path") or os.path.join(
+            config.get("model_dir", "models/snakers4_silero-vad"),
+            "src",
+            "silero_vad",
+            "data",
+            "silero_vad.onnx",
+        )
+        intra_op_threads = config.get("intra_op_threads", 1) or 1
+        inter_op_threads = config.get("inter_op_threads", 1) or 1
+        logger.bind(tag=TAG).info(
+            f"加载ONNX VAD模型: {model_path}，intra_op_threads={intra_op_threads}"
+        )
+        return OnnxSileroBackend(model_path, intra_op_threads, inter_op_threads)
@@ -0,0 +1,181 @@
+"""
+准入控制与过载降级模块
+根据事件循环延迟、共享工作池排队深度、进行中的对话轮数判断服务负载：
+- 超过拒绝阈值：新连接在握手阶段被拒绝（503）或重定向到备用地址（307）
+- 超过降级阈值：进入降级模式，限制LLM输出长度、切换到更便宜的LLM/TTS、跳过意图识别预处理
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from config.logger import setup_logging
+from core.utils.scheduler import scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+LOAD_NORMAL = "normal"
+LOAD_DEGRADED = "degraded"
+LOAD_OVERLOADED = "overloaded"
+
+# 负载下降到阈值的该比例以下才退出对应状态，避免在阈值附近反复切换
+RECOVER_RATIO = 0.8
+
+
+class AdmissionController:
+    def __init__(self):
+        self.enabled = False
+        self.check_interval = 0.5
+        self.degrade_thresholds = {}
+        self.reject_thresholds = {}
+        self.max_connections = 0
+        self.redirect_url = ""
+        self.retry_after = 5
+        self.degraded_config = {}
+
+        self.loop_lag_ms = 0.0
+        self.active_turns = 0
+        self.state = LOAD_NORMAL
+        self._lock = threading.Lock()
+        self._degraded_llm = None
+        self._stats = {"rejected": 0, "redirected": 0, "degraded_turns": 0}
+
+    def configure(self, config: dict):
+        admission_config = config.get("server", {}).get("admission") or {}
+        self.enabled = bool(admission_config.get("enabled", False))
+        self.check_interval = float(admission_config.get("check_interval", 0.5))
+        self.degrade_thresholds = admission_config.get("degrade") or {}
+        reject = dict(admission_config.get("reject") or {})
+        self.max_connections = int(reject.pop("max_connections", 0) or 0)
+        self.reject_thresholds = reject
+        self.redirect_url = admission_config.get("redirect_url") or ""
+        self.retry_after = int(admission_config.get("retry_after", 5))
+        self.degraded_config = admission_config.get("degraded") or {}
+        self._degraded_llm = None
+
+    async def monitor_loop_lag(self):
+        """定时测量事件循环延迟并刷新负载状态（在服务事件循环上运行）
+
+        未启用准入控制时仍测量延迟，供 /metrics 导出
+        """
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.check_interval)
+            lag = (time.monotonic() - start - self.check_interval) * 1000
+            # 指数平滑，避免单次抖动触发状态切换
+            self.loop_lag_ms = self.loop_lag_ms * 0.7 + max(lag, 0.0) * 0.3
+            if self.enabled:
+                self._update_state()
+
+    def _load(self) -> dict:
+        queue_depth = sum(
+            pool["queue_depth"] for pool in scheduler.get_stats().values()
+        )
+        return {
+            "loop_lag_ms": self.loop_lag_ms,
+            "queue_depth": queue_depth,
+            "active_turns": self.active_turns,
+        }
+
+    @staticmethod
+    def _exceeds(load: dict, thresholds: dict, ratio: float = 1.0) -> bool:
+        for name, limit in thresholds.items():
+            if limit and name in load and load[name] >= limit * ratio:
+                return True
+        return False
+
+    def _update_state(self):
+        load = self._load()
+        # 已处于某状态时，降到阈值的 RECOVER_RATIO 以下才退出
+        reject_ratio = RECOVER_RATIO if self.state == LOAD_OVERLOADED else 1.0
+        degrade_ratio = RECOVER_RATIO if self.state != LOAD_NORMAL else 1.0
+        if self._exceeds(load, self.reject_thresholds, reject_ratio):
+            state = LOAD_OVERLOADED
+        elif self._exceeds(load, self.degrade_thresholds, degrade_ratio):
+            state = LOAD_DEGRADED
+        else:
+            state = LOAD_NORMAL
+        if state != self.state:
+            logger.bind(tag=TAG).warning(f"服务负载状态: {self.state} -> {state}, {load}")
+            self.state = state
+
+    def admit(self, active_connections: int):
+        """判断是否接受新连接
+
+        Returns:
+            (是否接受, 重定向地址)；拒绝且未配置重定向地址时重定向地址为空
+        """
+        if not self.enabled:
+            return True, None
+        overloaded = self.state == LOAD_OVERLOADED or (
+            self.max_connections > 0 and active_connections >= self.max_connections
+        )
+        if not overloaded:
+            return True, None
+        if self.redirect_url:
+            self._stats["redirected"] += 1
+        else:
+            self._stats["rejected"] += 1
+        return False, self.redirect_url or None
+
+    @property
+    def degraded(self) -> bool:
+        return self.enabled and self.state != LOAD_NORMAL
+
+    @contextmanager
+    def track_turn(self):
+        """统计进行中的对话轮数"""
+        with self._lock:
+            self.active_turns += 1
+            if self.degraded:
+                self._stats["degraded_turns"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active_turns -= 1
+
+    def llm_kwargs(self) -> dict:
+        """降级模式下附加给LLM调用的参数"""
+        max_tokens = self.degraded_config.get("max_tokens")
+        if self.degraded and max_tokens:
+            return {"max_tokens": int(max_tokens)}
+        return {}
+
+    def skip_intent(self) -> bool:
+        """降级模式下是否跳过意图识别预处理"""
+        return self.degraded and bool(self.degraded_config.get("disable_intent", False))
+
+    def get_degraded_llm(self, config: dict):
+        """降级模式下使用的LLM实例，未配置或未降级时返回None"""
+        llm_name = self.degraded_config.get("llm")
+        if not self.degraded or not llm_name or llm_name not in config.get("LLM", {}):
+            return None
+        if self._degraded_llm is None:
+            with self._lock:
+                if self._degraded_llm is None:
+                    from core.utils import llm as llm_utils
+
+                    llm_config = config["LLM"][llm_name]
+                    self._degraded_llm = llm_utils.create_instance(
+                        llm_config.get("type", llm_name), llm_config
+                    )
+                    logger.bind(tag=TAG).info(f"创建降级模式LLM: {llm_name}")
+        return self._degraded_llm
+
+    def degraded_tts_config(self, config: dict):
+        """降级模式下新连接使用的TTS配置，返回替换了TTS选择的配置副本或None"""
+        tts_name = self.degraded_config.get("tts")
+        if not self.degraded or not tts_name or tts_name not in config.get("TTS", {}):
+            return None
+        degraded_config = dict(config)
+        degraded_config["selected_module"] = dict(config["selected_module"])
+        degraded_config["selected_module"]["TTS"] = tts_name
+        return degraded_config
+
+    def get_stats(self) -> dict:
+        return {"state": self.state, **self._load(), **self._stats}
+
+
+admission = AdmissionController()
@@ -0,0 +1,156 @@
+"""
+本地ASR批量推理调度
+本地ASR模型只加载一个实例、由所有连接共享，原先各连接的识别请求在不同线程中同时调用模型，互相争抢CPU。
+调度器把识别请求排队，后台推理线程取出一批在短时间窗口内到达的请求合并成一次批量解码，
+推理线程数即同时进行的解码数，按机器核数配置：
+- 高峰时多句话同时结束，合并解码比逐句解码吞吐更高
+- 单句话最多多等 batch_wait_ms
+- 批量解码失败时逐条重试，单条异常音频不影响同批的其他请求
+- 每条请求都会得到结果或异常，等待方最多等待 decode_timeout 秒，不会永久占用识别线程
+供应器只需提供 decode_batch(输入列表) -> 结果列表。
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from config.logger import setup_logging
+from core.utils.metrics import ASR_BATCH_SIZE, ASR_QUEUE_WAIT
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _Job:
+    __slots__ = ("data", "future", "enqueued")
+
+    def __init__(self, data):
+        self.data = data
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class ASRBatchScheduler:
+    def __init__(
+        self,
+        decode_batch,
+        name: str = "asr",
+        batch_wait_ms: float = 20,
+        max_batch_size: int = 8,
+        max_concurrency: int = 1,
+        decode_timeout: float = 15,
+    ):
+        self.decode_batch = decode_batch
+        self.name = name
+        self.batch_wait = max(float(batch_wait_ms), 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.decode_timeout = float(decode_timeout)
+        self._pid = None
+        self._jobs = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, decode_batch, config: dict, name: str = "asr"):
+        return cls(
+            decode_batch,
+            name=name,
+            batch_wait_ms=config.get("batch_wait_ms", 20),
+            max_batch_size=config.get("max_batch_size", 8),
+            max_concurrency=config.get("max_concurrency", 1),
+            decode_timeout=config.get("decode_timeout", 15),
+        )
+
+    def _ensure_workers(self):
+        """推理线程在首次使用时启动；多进程模式下 fork 后线程不会继承，需要在子进程中重建"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._jobs = queue.Queue()
+            for i in range(self.max_concurrency):
+                threading.Thread(
+                    target=self._run, name=f"{self.name}-batch-{i}", daemon=True
+                ).start()
+            self._pid = pid
+
+    def submit(self, data) -> Future:
+        """提交一条识别请求，返回识别结果的 Future"""
+        self._ensure_workers()
+        job = _Job(data)
+        self._jobs.put(job)
+        return job.future
+
+    def decode(self, data):
+        """提交并等待结果，在识别线程中调用，超时后放弃该请求"""
+        future = self.submit(data)
+        try:
+            return future.result(timeout=self.decode_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _collect(self):
+        """取出一批请求：等到首个请求后，再最多等待 batch_wait 凑批"""
+        jobs = [self._jobs.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(jobs) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    jobs.append(self._jobs.get(timeout=timeout))
+                else:
+                    jobs.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _run(self):
+        while True:
+            # 等待方已超时放弃的请求不再解码
+            jobs = [job for job in self._collect() if not job.future.cancelled()]
+            if not jobs:
+                continue
+            now = time.monotonic()
+            for job in jobs:
+                ASR_QUEUE_WAIT.observe(now - job.enqueued, provider=self.name)
+            ASR_BATCH_SIZE.observe(len(jobs), provider=self.name)
+            try:
+                self._decode(jobs)
+            except Exception as e:
+                if len(jobs) == 1:
+                    self._settle(jobs[0], error=e)
+                    continue
+                logger.bind(tag=TAG).warning(f"ASR批量解码失败，逐条重试: {e}")
+                for job in jobs:
+                    try:
+                        self._decode([job])
+                    except Exception as single_error:
+                        self._settle(job, error=single_error)
+            finally:
+                for job in jobs:
+                    self._settle(job, error=RuntimeError("ASR解码未返回结果"))
+
+    def _decode(self, jobs):
+        results = self.decode_batch([job.data for job in jobs])
+        if len(results) != len(jobs):
+            raise ValueError(f"批量解码返回 {len(results)} 条结果，应为 {len(jobs)} 条")
+        for job, result in zip(jobs, results):
+            self._settle(job, result=result)
+
+    @staticmethod
+    def _settle(job, result=None, error=None):
+        """设置请求结果，已有结果或已被等待方取消的请求跳过"""
+        if job.future.done():
+            return
+        try:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+        except InvalidStateError:
+            pass
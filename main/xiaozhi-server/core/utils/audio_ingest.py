@@ -0,0 +1,138 @@
+"""
+上行音频接入
+每个上行音频包只解码一次（每个连接独立的opus解码器，pcm格式直接透传），
+解码后的PCM写入预分配的环形缓冲区，VAD分帧、ASR和声纹识别都从这里读取：
+- VAD：按512采样点读取帧，返回缓冲区上的 numpy 视图，不复制、不重新切片
+- ASR/声纹：语音结束时按音频包数取出本句的PCM，只在交给识别线程时复制一次
+环形缓冲区在连接首次收到音频时才分配，空闲连接不占用。
+"""
+
+import numpy as np
+import opuslib_next
+from collections import deque
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+# 单个opus包解码的最大采样点数（60ms）
+PACKET_SAMPLES = 960
+# VAD分帧的采样点数，缓冲区容量取它的整数倍，保证对齐的帧不会跨越缓冲区末尾
+FRAME_SAMPLES = 512
+# 默认缓冲区时长（秒），需要覆盖单句话的最大长度
+DEFAULT_RING_SECONDS = 20
+
+
+class AudioIngest:
+    __slots__ = ("decoder", "ring", "capacity", "total", "vad_pos", "packet_starts")
+
+    def __init__(self, audio_format: str = "opus", ring_seconds: float = DEFAULT_RING_SECONDS):
+        frames = max(int(ring_seconds * SAMPLE_RATE) // FRAME_SAMPLES, 1)
+        self.capacity = frames * FRAME_SAMPLES
+        self.ring = np.zeros(self.capacity, dtype=np.int16)
+        self.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1) if audio_format == "opus" else None
+        # 已写入的总采样点数（单调递增），位置 p 对应缓冲区下标 p % capacity
+        self.total = 0
+        # VAD已读取到的位置
+        self.vad_pos = 0
+        # 每个音频包的起始位置，用于按包数取出一句话；只保留数据仍在缓冲区中的包
+        # （maxlen 按最短20ms一包估算，防止大量空包无限增长）
+        self.packet_starts = deque(maxlen=self.capacity // 320 + 1)
+
+    def push(self, packet: bytes) -> int:
+        """解码并写入一个音频包，返回写入的采样点数；空包和解码失败的包也会记录位置"""
+        self.packet_starts.append(self.total)
+        if not packet:
+            return 0
+        if self.decoder is not None:
+            try:
+                pcm = self.decoder.decode(packet, PACKET_SAMPLES)
+            except opuslib_next.OpusError as e:
+                logger.bind(tag=TAG).info(f"解码错误: {e}")
+                return 0
+        else:
+            pcm = packet[: len(packet) // 2 * 2]
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        self._write(samples)
+        # 开头已被覆盖的包不能再完整取出，丢弃其位置
+        oldest = self.total - self.capacity
+        while self.packet_starts and self.packet_starts[0] < oldest:
+            self.packet_starts.popleft()
+        return len(samples)
+
+    def _write(self, samples):
+        count = len(samples)
+        if count > self.capacity:
+            samples = samples[-self.capacity :]
+            self.total += count - self.capacity
+            count = self.capacity
+        pos = self.total % self.capacity
+        first = min(count, self.capacity - pos)
+        self.ring[pos : pos + first] = samples[:first]
+        if first < count:
+            self.ring[: count - first] = samples[first:]
+        self.total += count
+        # VAD来不及读取的数据已被覆盖，直接跳过
+        if self.total - self.vad_pos > self.capacity:
+            self.vad_pos = self.total - self.capacity
+
+    def _slice(self, start: int, end: int):
+        """取出 [start, end) 的采样点，未跨越缓冲区末尾时返回视图"""
+        start = max(start, self.total - self.capacity)
+        begin = start % self.capacity
+        count = end - start
+        if begin + count <= self.capacity:
+            return self.ring[begin : begin + count]
+        return np.concatenate((self.ring[begin:], self.ring[: begin + count - self.capacity]))
+
+    def vad_frames(self, frame_samples: int = FRAME_SAMPLES) -> list:
+        """取出VAD尚未处理的完整帧（int16 视图），调用方需在下次写入前用完"""
+        frames = []
+        while self.total - self.vad_pos >= frame_samples:
+            frames.append(self._slice(self.vad_pos, self.vad_pos + frame_samples))
+            self.vad_pos += frame_samples
+        return frames
+
+    def reset_vad(self):
+        """丢弃VAD尚未处理的不完整帧"""
+        self.vad_pos = self.total
+
+    def packet_position(self, packet_count: int) -> int:
+        """最近 packet_count 个音频包的起始位置"""
+        if packet_count <= 0 or not self.packet_starts:
+            return self.total
+        index = max(len(self.packet_starts) - packet_count, 0)
+        start = self.packet_starts[index]
+        if len(self.packet_starts) < packet_count or start < self.total - self.capacity:
+            logger.bind(tag=TAG).warning(
+                f"语音长度超过接入缓冲区容量（{self.capacity / SAMPLE_RATE:.0f}秒），已截断开头部分，"
+                f"可调大 server.audio_ingest.ring_seconds"
+            )
+        return start
+
+    def samples_since(self, start: int):
+        """取出从位置 start 到最新的采样点（int16），供流式识别增量读取"""
+        if start >= self.total:
+            return self.ring[:0]
+        return self._slice(start, self.total)
+
+    def segment(self, packet_count: int) -> memoryview:
+        """取出最近 packet_count 个音频包对应的PCM"""
+        if packet_count <= 0 or not self.packet_starts:
+            return memoryview(b"")
+        pcm = self._slice(self.packet_position(packet_count), self.total)
+        return memoryview(pcm).cast("B")
+
+
+def get_ingest(conn) -> AudioIngest:
+    """获取连接的音频接入缓冲，首次收到音频时创建"""
+    ingest = getattr(conn, "audio_ingest", None)
+    if ingest is None:
+        ingest_config = conn.config.get("server", {}).get("audio_ingest") or {}
+        ingest = AudioIngest(
+            conn.audio_format,
+            float(ingest_config.get("ring_seconds", DEFAULT_RING_SECONDS)),
+        )
+        conn.audio_ingest = ingest
+    return ingest
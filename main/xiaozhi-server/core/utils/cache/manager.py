@@ -211,6 +211,14 @@ class GlobalCacheManager:
                 self._stats["cleanups"] += 1
                 self.logger.debug(f"清理缓存 {cache_name}: 删除 {deleted} 个过期条目")
 
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        stats = dict(self._stats)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        stats["entries"] = sum(len(cache) for cache in list(self._caches.values()))
+        return stats
+
 
 # 创建全局缓存管理器实例
 cache_manager = GlobalCacheManager()
@@ -0,0 +1,87 @@
+"""
+写时复制的配置视图
+每个连接原先都 deepcopy 一份完整的服务配置，连接数上万时内存主要耗在这里。
+ConfigView 只浅拷贝顶层键，子字典/列表在第一次被访问时才包装成新的视图（仍是浅拷贝），
+因此未被修改的配置始终与全局配置共享，设备差异化配置只覆盖在当前连接的视图上。
+"""
+
+import copy
+
+
+class ConfigView(dict):
+    """配置视图，对外表现与 dict 一致
+
+    通过 [] / get / setdefault / items / values 取到的子字典和列表都属于当前视图，
+    修改它们不会影响底层的共享配置；直接写入的新值原样保存。
+    """
+
+    __slots__ = ("_owned",)
+
+    def __init__(self, base=None):
+        super().__init__(base or {})
+        # 已归属当前视图（已包装或被写入）的键
+        self._owned = set()
+
+    def _own(self, key, value):
+        if key in self._owned:
+            return value
+        if isinstance(value, dict):
+            value = ConfigView(value)
+        elif isinstance(value, list):
+            value = list(value)
+        else:
+            return value
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        self._owned.discard(key)
+        return dict.pop(self, key, *default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def copy(self):
+        return ConfigView(self)
+
+    def to_dict(self) -> dict:
+        """展开为普通的深拷贝字典"""
+        return {
+            key: value.to_dict() if isinstance(value, ConfigView) else copy.deepcopy(value)
+            for key, value in dict.items(self)
+        }
+
+    def __deepcopy__(self, memo):
+        return ConfigView(copy.deepcopy(dict(self), memo))
+
+    def __reduce__(self):
+        return ConfigView, (dict(self),)
@@ -1,7 +1,60 @@
 import uuid
 import re
+import json
+import threading
 from typing import List, Dict
 from datetime import datetime
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 系统提示词中随时间和请求变化的片段（当前时间、日期、位置天气、记忆），标签需单独成行
+VOLATILE_BLOCK_PATTERN = re.compile(
+    r"\s*^<(context|memory)>[ \t]*$.*?^</\1>[ \t]*$", re.DOTALL | re.MULTILINE
+)
+
+# 滚动摘要的提示词
+SUMMARY_PROMPT = (
+    "你是对话摘要助手。请把已有摘要和新增的对话合并成一段新的摘要，"
+    "保留用户的身份、偏好、提到的人和事、未完成的请求以及双方的约定，省略寒暄和重复内容。"
+    "使用第三人称，直接输出摘要正文，不超过300字。"
+)
+
+
+def estimate_tokens(text) -> int:
+    """本地估算token数：中日韩字符约1个token，其余字符约4个1个token"""
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if ch >= "⺀")
+    return wide + (len(text) - wide + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    # 每条消息另加角色等格式开销
+    tokens = 4 + estimate_tokens(message.get("content"))
+    if message.get("tool_calls"):
+        tokens += estimate_tokens(json.dumps(message["tool_calls"], ensure_ascii=False))
+    return tokens
+
+
+def summarize_dialogue(llm, previous_summary: str, messages: List[dict]) -> str:
+    """把移出对话窗口的早期对话合并进滚动摘要，失败时抛出异常"""
+    lines = [
+        f"{'用户' if m['role'] == 'user' else '助手'}：{m['content']}"
+        for m in messages
+        if m["role"] in ("user", "assistant") and m.get("content")
+    ]
+    if not lines:
+        return previous_summary
+    user_prompt = "新增对话：\n" + "\n".join(lines)
+    if previous_summary:
+        user_prompt = f"已有摘要：\n{previous_summary}\n\n{user_prompt}"
+    result = (llm.response_no_stream(SUMMARY_PROMPT, user_prompt) or "").strip()
+    # 各LLM出错时返回【...】形式的提示文本
+    if not result or (result.startswith("【") and result.endswith("】")):
+        raise RuntimeError(f"生成对话摘要失败: {result}")
+    return result
 
 
 class Message:
@@ -21,13 +74,134 @@ class Message:
 
 
 class Dialogue:
-    def __init__(self):
-        self.dialogue: List[Message] = []
+    def __init__(
+        self, stable_prefix: bool = True, max_tokens: int = 0, min_turns: int = 4
+    ):
+        # 完整的消息记录（连接关闭时交给记忆模块总结）
+        self._messages: List[Message] = []
+        # 开启后系统提示词保持逐字节不变，易变片段放到最新一条用户消息的开头发送，
+        # 请求前缀（系统提示词+工具定义+历史对话）可以命中上游的提示词缓存
+        self.stable_prefix = stable_prefix
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+        # 发给LLM的对话窗口：非系统消息在加入时序列化一次，之后只追加；
+        # 超出token预算时最早的轮次折叠进滚动摘要，从窗口头部移除
+        self.max_tokens = max_tokens
+        self.min_turns = min_turns
+        self._lock = threading.RLock()
+        self._window: List[dict] = []
+        self._window_ids: List[str] = []
+        self._window_token_counts: List[int] = []
+        self._window_tokens = 0
+        # 早期对话的滚动摘要
+        self.summary = ""
+        self._summarizer = None
+        self._submit = None
+        self._summarizing = False
+        # 消息列表被整体替换后递增，丢弃基于旧窗口的摘要结果
+        self._version = 0
+
+    @property
+    def dialogue(self) -> List[Message]:
+        return self._messages
+
+    @dialogue.setter
+    def dialogue(self, messages: List[Message]):
+        """整体替换消息列表（如清理工具消息），按新列表重建对话窗口，已折叠进摘要的消息不再加入"""
+        with self._lock:
+            kept = set(self._window_ids)
+            self._messages = list(messages)
+            self._version += 1
+            self._summarizing = False
+            self._window, self._window_ids, self._window_token_counts = [], [], []
+            for m in self._messages:
+                if m.role != "system" and m.uniq_id in kept:
+                    self._append_window(m)
+            self._window_tokens = sum(self._window_token_counts)
+
+    def set_summarizer(self, summarizer, submit):
+        """设置滚动摘要：summarizer(已有摘要, 移出的消息) 返回新摘要，由 submit 提交到后台执行"""
+        self._summarizer = summarizer
+        self._submit = submit
+
     def put(self, message: Message):
-        self.dialogue.append(message)
+        with self._lock:
+            self._messages.append(message)
+            if message.role == "system":
+                return
+            self._window_tokens += self._append_window(message)
+            self._fold_if_needed()
+
+    def _append_window(self, message: Message) -> int:
+        item = self.getMessages(message, self._window)
+        tokens = message_tokens(item)
+        self._window_ids.append(message.uniq_id)
+        self._window_token_counts.append(tokens)
+        return tokens
+
+    def _fold_if_needed(self):
+        """对话窗口超出预算时，把最早的若干轮（至少保留 min_turns 轮）折叠进摘要"""
+        if (
+            not self.max_tokens
+            or self._summarizing
+            or self._window_tokens <= self.max_tokens
+        ):
+            return
+        # 按用户消息划分轮次，只在轮次边界截断，工具调用与结果不会被拆开
+        starts = [i for i, m in enumerate(self._window) if m["role"] == "user"]
+        cut, remaining = 0, self._window_tokens
+        for start in starts[: max(len(starts) - self.min_turns + 1, 0)]:
+            remaining -= sum(self._window_token_counts[cut:start])
+            cut = start
+            if remaining <= self.max_tokens:
+                break
+        if cut == 0:
+            return
+
+        if self._summarizer is None:
+            # 未配置摘要时直接移出窗口
+            self._drop(cut)
+            return
+
+        evicted = self._window[:cut]
+        previous, version = self.summary, self._version
+        self._summarizing = True
+
+        def fold():
+            summary = None
+            try:
+                summary = self._summarizer(previous, evicted)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"对话摘要失败，早期对话暂留在窗口中: {e}")
+            self._finish_fold(version, cut, summary)
+
+        try:
+            self._submit(fold)
+        except Exception as e:
+            self._summarizing = False
+            logger.bind(tag=TAG).warning(f"提交对话摘要任务失败: {e}")
+
+    def _finish_fold(self, version, cut, summary):
+        with self._lock:
+            if version != self._version:
+                return
+            self._summarizing = False
+            if summary is None:
+                return
+            self.summary = summary
+            self._drop(cut)
+            logger.bind(tag=TAG).debug(
+                f"早期对话已折叠进摘要，窗口剩余约 {self._window_tokens} tokens"
+            )
+            # 摘要期间窗口可能继续增长
+            self._fold_if_needed()
+
+    def _drop(self, count):
+        self._window_tokens -= sum(self._window_token_counts[:count])
+        del self._window[:count]
+        del self._window_ids[:count]
+        del self._window_token_counts[:count]
 
     def getMessages(self, m, dialogue):
         if m.tool_calls is not None:
@@ -44,6 +218,7 @@ class Dialogue:
             )
         else:
             dialogue.append({"role": m.role, "content": m.content})
+        return dialogue[-1]
 
     def get_llm_dialogue(self) -> List[Dict[str, str]]:
         # 直接调用get_llm_dialogue_with_memory，传入None作为memory_str
@@ -69,14 +244,33 @@ class Dialogue:
         system_message = next(
             (msg for msg in self.dialogue if msg.role == "system"), None
         )
+        with self._lock:
+            # 窗口中的消息已序列化，这里只做浅拷贝
+            history = list(self._window)
+            summary = self.summary
 
+        volatile_prompt = ""
         if system_message:
             # 基础系统提示
             enhanced_system_prompt = system_message.content
-            # 替换时间占位符
+            if self.stable_prefix:
+                # 把 <context>、<memory> 片段移出系统提示词
+                blocks = []
+
+                def take(match):
+                    blocks.append(match.group(0).strip())
+                    return ""
+
+                enhanced_system_prompt = VOLATILE_BLOCK_PATTERN.sub(
+                    take, enhanced_system_prompt
+                )
+                volatile_prompt = "\n\n".join(blocks)
+            # 替换时间占位符（自定义提示词在上述片段之外使用时间占位符的，系统提示词将无法保持稳定）
+            current_time = datetime.now().strftime("%H:%M")
             enhanced_system_prompt = enhanced_system_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
+                "{{current_time}}", current_time
             )
+            volatile_prompt = volatile_prompt.replace("{{current_time}}", current_time)
 
             # 添加说话人个性化描述
             try:
@@ -100,19 +294,55 @@ class Dialogue:
                 # 配置读取失败时忽略错误，不影响其他功能
                 pass
 
+            # 早期对话的摘要只在折叠时变化，放在系统提示词末尾
+            if summary:
+                enhanced_system_prompt += (
+                    f"\n\n<conversation_summary>\n{summary}\n</conversation_summary>"
+                )
+
             # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
             if memory_str is not None:
-                enhanced_system_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    enhanced_system_prompt,
-                    flags=re.DOTALL,
+                enhanced_system_prompt, volatile_prompt = (
+                    re.sub(
+                        r"<memory>.*?</memory>",
+                        lambda _: f"<memory>\n{memory_str}\n</memory>",
+                        prompt,
+                        flags=re.DOTALL,
+                    )
+                    for prompt in (enhanced_system_prompt, volatile_prompt)
                 )
             dialogue.append({"role": "system", "content": enhanced_system_prompt})
+        elif summary:
+            dialogue.append(
+                {
+                    "role": "system",
+                    "content": f"<conversation_summary>\n{summary}\n</conversation_summary>",
+                }
+            )
 
         # 添加用户和助手的对话
-        for m in self.dialogue:
-            if m.role != "system":  # 跳过原始的系统消息
-                self.getMessages(m, dialogue)
+        dialogue.extend(history)
+
+        if volatile_prompt:
+            # 加在最后一条用户消息的开头（替换为新的消息，不修改窗口中缓存的消息），
+            # 此前的内容在多轮请求间保持不变；不另插系统消息，要求角色交替的模板也能使用
+            index = next(
+                (
+                    i
+                    for i in range(len(dialogue) - 1, 0, -1)
+                    if dialogue[i]["role"] == "user"
+                ),
+                None,
+            )
+            if index is not None:
+                dialogue[index] = {
+                    **dialogue[index],
+                    "content": f"{volatile_prompt}\n\n{dialogue[index]['content']}",
+                }
+            elif dialogue and dialogue[0]["role"] == "system":
+                dialogue[0] = {
+                    **dialogue[0],
+                    "content": f"{dialogue[0]['content']}\n\n{volatile_prompt}",
+                }
 
         return dialogue
@@ -0,0 +1,168 @@
+"""
+自适应断句（语音结束检测）
+固定的静默等待（min_silence_duration_ms）会加在每一轮对话之前，断句器为每句话单独计算静默窗口：
+- 语速：统计本句内的语音段数和句内停顿，说话快的用户窗口更短；窗口始终不短于本句已出现的最长停顿的若干倍
+- 句长：很短的话（"好的"、"暂停"）通常已经说完，使用较短的窗口
+- 流式识别：中间结果一段时间内不再变化且以句末标点结尾时进一步缩短窗口，仍在变化时不缩短
+- 过早截断反馈：断句后用户在固定窗口内又接着说话，视为过早截断，该连接之后的窗口逐步加长
+窗口限制在 [min_silence_ms, min_silence_duration_ms] 之间，配置的固定值作为上限，断句不会比原来更慢。
+时间均以毫秒传入，线上由VAD按音频到达时间驱动，离线评估按分片时间驱动。
+"""
+
+from core.utils.metrics import ENDPOINT_SILENCE, ENDPOINT_PREMATURE
+
+# VAD每个分片的时长（毫秒）
+FRAME_MS = 32
+# 句末标点，中间结果以这些字符结尾时认为句子已完整
+SENTENCE_END = "。！？.!?"
+
+
+class EndpointState:
+    """单个连接的断句状态"""
+
+    __slots__ = (
+        "utterance_start", "last_voice", "in_voice", "segments", "voiced_ms",
+        "max_pause", "partial_text", "partial_changed", "window", "bias",
+        "last_end", "last_window",
+    )
+
+    def __init__(self):
+        self.bias = 0.0
+        self.last_end = None
+        self.last_window = None
+        self.reset()
+
+    def reset(self):
+        """清空当前句的统计，保留跨句的截断反馈"""
+        self.utterance_start = None
+        self.last_voice = None
+        self.in_voice = False
+        self.segments = 0
+        self.voiced_ms = 0
+        self.max_pause = 0
+        self.partial_text = ""
+        self.partial_changed = 0.0
+        # 本句断句时使用的静默窗口
+        self.window = None
+
+
+class AdaptiveEndpointer:
+    def __init__(self, config: dict, max_silence_ms: int, name: str = "vad"):
+        config = config or {}
+        self.enabled = bool(config.get("enabled", False))
+        self.name = name
+        self.max_ms = int(max_silence_ms)
+
+        def limit(key, default):
+            return min(float(config.get(key, default)), self.max_ms)
+
+        self.min_ms = limit("min_silence_ms", 300)
+        # 一般句子的基础窗口
+        self.base_ms = limit("base_silence_ms", 600)
+        # 语音时长低于 short_utterance_ms 的短句使用 short_silence_ms
+        self.short_utterance_ms = float(config.get("short_utterance_ms", 800))
+        self.short_ms = limit("short_silence_ms", 400)
+        # 语速按每秒语音段数估计，至少观察 rate_min_ms 后才调整
+        self.rate_min_ms = float(config.get("rate_min_ms", 1500))
+        self.fast_rate = float(config.get("fast_rate", 2.0))
+        self.slow_rate = float(config.get("slow_rate", 0.8))
+        self.fast_factor = float(config.get("fast_factor", 0.8))
+        self.slow_factor = float(config.get("slow_factor", 1.25))
+        # 窗口不短于本句最长停顿的倍数
+        self.pause_factor = float(config.get("pause_factor", 1.3))
+        # 中间结果保持不变多久算稳定，稳定且以句末标点结尾时窗口乘以 stable_factor
+        self.stable_ms = float(config.get("partial_stable_ms", 300))
+        self.stable_factor = float(config.get("stable_factor", 0.6))
+        # 每次过早截断后该连接的窗口增加的时长，正常断句后逐步回落
+        self.penalty_ms = float(config.get("premature_penalty_ms", 150))
+        self.decay_ms = float(config.get("penalty_decay_ms", 30))
+
+    def observe(self, state: EndpointState, is_voice: bool, have_voice: bool, now_ms: float):
+        """每个VAD分片调用一次，is_voice 为分片判定，have_voice 为连接是否已进入一句话"""
+        if state.utterance_start is None:
+            if not have_voice:
+                return
+            self._start(state, now_ms)
+        if is_voice:
+            if not state.in_voice:
+                state.segments += 1
+                if state.last_voice is not None:
+                    pause = now_ms - state.last_voice
+                    if pause < self.max_ms:
+                        state.max_pause = max(state.max_pause, pause)
+            state.voiced_ms += FRAME_MS
+            state.last_voice = now_ms
+        state.in_voice = is_voice
+
+    def _start(self, state: EndpointState, now_ms: float):
+        if state.last_end is not None and state.last_window is not None:
+            # 两句之间的实际间隔小于固定窗口，说明上一句按固定窗口不会被截断
+            gap = state.last_window + (now_ms - state.last_end)
+            if gap < self.max_ms and state.last_window < self.max_ms:
+                state.bias = min(state.bias + self.penalty_ms, self.max_ms)
+                ENDPOINT_PREMATURE.inc(provider=self.name)
+            else:
+                state.bias = max(state.bias - self.decay_ms, 0.0)
+        state.last_end = None
+        state.utterance_start = now_ms
+
+    def on_partial(self, state: EndpointState, text: str, now_ms: float):
+        """流式识别的中间结果"""
+        text = (text or "").strip()
+        if text != state.partial_text:
+            state.partial_text = text
+            state.partial_changed = now_ms
+
+    def window(self, state: EndpointState, now_ms: float) -> float:
+        """当前句应使用的静默窗口（毫秒）"""
+        if not self.enabled or state.utterance_start is None:
+            return self.max_ms
+        window = self.base_ms
+        elapsed = (state.last_voice or now_ms) - state.utterance_start
+        if state.voiced_ms < self.short_utterance_ms:
+            window = self.short_ms
+        elif elapsed >= self.rate_min_ms:
+            rate = state.segments * 1000 / elapsed
+            if rate >= self.fast_rate:
+                window *= self.fast_factor
+            elif rate <= self.slow_rate:
+                window *= self.slow_factor
+        window = max(window, state.max_pause * self.pause_factor)
+        if state.partial_text:
+            if now_ms - state.partial_changed >= self.stable_ms:
+                if state.partial_text[-1] in SENTENCE_END:
+                    window *= self.stable_factor
+            else:
+                # 识别结果仍在变化，用户多半还没说完
+                window = max(window, self.base_ms)
+        window += state.bias
+        return min(max(window, self.min_ms), self.max_ms)
+
+    def should_stop(self, state: EndpointState, silence_ms: float, now_ms: float) -> bool:
+        """静默时长是否已达到本句的窗口，达到时记录所用窗口"""
+        window = self.window(state, now_ms)
+        if silence_ms < window:
+            return False
+        state.window = window
+        ENDPOINT_SILENCE.observe(window / 1000, provider=self.name)
+        return True
+
+    def finish(self, state: EndpointState, now_ms: float):
+        """一句话交给识别后调用，记录断句时间用于判断下一句是否过早截断"""
+        if state.window is not None:
+            state.last_end = now_ms
+            state.last_window = state.window
+        state.reset()
+
+
+def get_state(conn) -> EndpointState:
+    state = getattr(conn, "endpoint_state", None)
+    if state is None:
+        state = EndpointState()
+        conn.endpoint_state = state
+    return state
+
+
+def get_endpointer(conn):
+    """当前连接VAD的断句器，VAD不支持自适应断句时返回 None"""
+    return getattr(getattr(conn, "vad", None), "endpointer", None)
@@ -0,0 +1,108 @@
+"""
+VAD能量预筛
+大部分连接的设备处于空闲状态，上行的几乎都是静音。在神经网络VAD之前用能量(RMS)和过零率
+做一次向量化的预判，明显是静音的分片直接判为无声，不再送入模型推理：
+- 每个连接维护自适应的噪声底：能量高于噪声底时缓慢上升、低于时快速下降，并限制在上限以内
+- 能量高于噪声底一定分贝，或过零率较高且能量高于噪声底一半余量（清辅音起始）时送入模型
+- 送入模型后保持一段时间（hangover）持续推理，说话中的短暂停顿不会被截断
+- 从跳过切换到推理时，先用上一个被跳过的分片预热模型状态，避免语音起始被削掉
+"""
+
+import numpy as np
+from core.utils.metrics import VAD_FRAMES
+
+FRAME_MS = 32
+
+
+def _db_to_amplitude(db: float) -> float:
+    return float(10 ** (db / 20))
+
+
+class GateState:
+    """单个连接的预筛状态"""
+
+    __slots__ = ("noise_floor", "hangover", "last_skipped")
+
+    def __init__(self, noise_floor: float):
+        self.noise_floor = noise_floor
+        self.hangover = 0
+        self.last_skipped = None
+
+
+class EnergyGate:
+    def __init__(self, config: dict, name: str = "vad"):
+        gate_config = config.get("energy_gate") or {}
+        self.enabled = bool(gate_config.get("enabled", True))
+        self.name = name
+        # 能量高于噪声底多少分贝视为可能有语音
+        self.margin = _db_to_amplitude(float(gate_config.get("margin_db", 6)))
+        # 噪声底的下限和上限（dBFS），高于上限的声音一定送入模型
+        self.min_floor = _db_to_amplitude(float(gate_config.get("min_floor_db", -55)))
+        self.max_floor = _db_to_amplitude(float(gate_config.get("max_floor_db", -35)))
+        # 过零率高于该值且能量超过噪声底一半余量时也送入模型（清辅音能量低、过零率高）
+        self.zcr_threshold = float(gate_config.get("zcr_threshold", 0.25))
+        self.zcr_margin = self.margin ** 0.5
+        self.hangover_frames = max(int(gate_config.get("hangover_ms", 320)) // FRAME_MS, 1)
+        # 噪声底的平滑系数：上升慢、下降快
+        self.rise = float(gate_config.get("floor_rise", 0.02))
+        self.fall = float(gate_config.get("floor_fall", 0.3))
+
+    def new_state(self) -> GateState:
+        return GateState(self.min_floor)
+
+    def plan(self, state: GateState, chunks, in_speech: bool = False):
+        """决定哪些分片需要推理
+
+        Args:
+            state: 连接的预筛状态
+            chunks: float32 分片数组 [N, 512]
+            in_speech: 连接是否处于一句话中，此时全部推理以保证断句准确
+
+        Returns:
+            (送入模型的分片列表, 每个输入分片在其中的下标；跳过的为 None)
+        """
+        if not self.enabled or in_speech:
+            state.hangover = self.hangover_frames
+            VAD_FRAMES.inc(len(chunks), provider=self.name, result="inferred")
+            return list(chunks), list(range(len(chunks)))
+
+        rms = np.sqrt(np.mean(np.square(chunks), axis=1))
+        zcr = np.mean((chunks[:, 1:] * chunks[:, :-1]) < 0, axis=1)
+
+        to_infer = []
+        indexes = []
+        skipped = 0
+        for chunk, level, crossing in zip(chunks, rms, zcr):
+            floor = state.noise_floor
+            candidate = (
+                level >= floor * self.margin
+                or (crossing >= self.zcr_threshold and level >= floor * self.zcr_margin)
+                or level >= self.max_floor * self.margin
+            )
+            # 噪声底跟踪最小能量：持续的背景噪声会让它在几秒内升上来，之后不再触发推理
+            alpha = self.rise if level > floor else self.fall
+            state.noise_floor = min(
+                max(floor + alpha * (level - floor), self.min_floor), self.max_floor
+            )
+            if candidate:
+                if state.hangover == 0 and state.last_skipped is not None:
+                    # 语音起始：用上一个静音分片预热模型状态，其结果不参与判断
+                    to_infer.append(state.last_skipped)
+                state.hangover = self.hangover_frames
+            elif state.hangover > 0:
+                state.hangover -= 1
+            else:
+                # 静音分片：跳过推理
+                state.last_skipped = chunk
+                indexes.append(None)
+                skipped += 1
+                continue
+            state.last_skipped = None
+            indexes.append(len(to_infer))
+            to_infer.append(chunk)
+
+        if skipped:
+            VAD_FRAMES.inc(skipped, provider=self.name, result="skipped")
+        if len(chunks) - skipped:
+            VAD_FRAMES.inc(len(chunks) - skipped, provider=self.name, result="inferred")
+        return to_infer, indexes
@@ -0,0 +1,81 @@
+"""
+对话轮次（generation）取消令牌
+每轮对话在 chat 中创建一个令牌，随 TTSMessageDTO 和音频队列中的每一项数据传递。
+打断时只需取消令牌：
+- 登记在令牌上的上游请求（LLM流式请求、TTS合成HTTP流、工具调用）立即取消
+- 队列中已属于该轮的数据不再逐个清空，出队时发现所属轮次已取消直接丢弃，
+  下一轮的音频不会排在上一轮的残留数据之后发送
+"""
+
+import uuid
+import queue
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class Generation:
+    """一轮对话的取消令牌，id 同时作为该轮的 sentence_id"""
+
+    __slots__ = ("id", "_cancelled", "_callbacks", "_lock")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self._cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def on_cancel(self, callback):
+        """登记取消时执行的回调，返回注销函数；令牌已取消时立即执行"""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def cancel(self) -> bool:
+        """取消本轮，返回是否为首次取消"""
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"执行取消回调失败: {e}")
+        return True
+
+
+def is_stale(generation) -> bool:
+    """数据所属的轮次已被打断"""
+    return generation is not None and generation.cancelled
+
+
+class StampedQueue(queue.Queue):
+    """入队时附加生产者当前所属的轮次，出队得到 (generation, item)
+
+    生产者接口与 queue.Queue 相同，现有的 put 调用无需修改
+    """
+
+    def __init__(self, stamp):
+        super().__init__()
+        self._stamp = stamp
+
+    def _put(self, item):
+        super()._put((self._stamp(), item))
@@ -0,0 +1,48 @@
+"""
+LLM异步流式响应与对话线程之间的桥接
+对话（ConnectionHandler.chat）在工作线程中同步迭代LLM输出；原生异步的LLM在连接的事件循环上发起请求，
+分片经队列交给对话线程。打断时直接取消事件循环上的请求任务，上游HTTP流立即关闭，
+不用等下一个分片到达，也不再为没人听的token付费。
+"""
+
+import queue
+import asyncio
+from config.logger import setup_logging
+from core.utils.metrics import LLM_STREAM_CANCELLED
+
+TAG = __name__
+logger = setup_logging()
+
+_END = object()
+
+
+class LLMStream:
+    def __init__(self, agen, loop, provider: str = ""):
+        self.provider = provider
+        self._queue = queue.SimpleQueue()
+        self._future = asyncio.run_coroutine_threadsafe(self._pump(agen), loop)
+
+    async def _pump(self, agen):
+        try:
+            async for item in agen:
+                self._queue.put(item)
+        except asyncio.CancelledError:
+            logger.bind(tag=TAG).info(f"LLM请求已取消: {self.provider}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"LLM流式响应出错: {e}")
+        finally:
+            self._queue.put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            yield item
+
+    def cancel(self):
+        """取消上游请求，对话线程中的迭代随之结束"""
+        if self._future.cancel():
+            LLM_STREAM_CANCELLED.inc(provider=self.provider)
+            # 请求任务尚未开始时不会执行 finally，这里补发结束标记
+            self._queue.put(_END)
@@ -0,0 +1,64 @@
+"""
+事件循环队列模块
+为 asyncio 运行模式提供一个可跨线程投递的队列，
+生产者可以是事件循环本身，也可以是TTS等工作线程，消费者是事件循环上的协程任务
+"""
+
+import queue
+import asyncio
+
+
+class LoopQueue:
+    """绑定到指定事件循环的队列
+
+    对生产者保持与 queue.Queue 相同的接口（put / put_nowait / get_nowait / qsize），
+    这样现有的 `tts_audio_queue.put(...)`、`clear_queues()` 等调用无需修改；
+    消费者则通过 `await get()` 挂起等待，不再占用线程。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, stamp=None):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        # 可选，入队时在生产者线程中附加的标记（如所属对话轮次），出队得到 (标记, 数据)
+        self._stamp = stamp
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _call(self, func, *args):
+        if self._in_loop_thread():
+            func(*args)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def put(self, item, block=True, timeout=None):
+        """投递数据，任意线程均可调用（参数仅为兼容 queue.Queue）"""
+        if self._stamp is not None:
+            item = (self._stamp(), item)
+        self._call(self._queue.put_nowait, item)
+
+    def put_nowait(self, item):
+        self.put(item)
+
+    async def get(self):
+        """在事件循环中等待下一条数据"""
+        return await self._queue.get()
+
+    def get_nowait(self):
+        """立即取出一条数据，队列为空时抛出 queue.Empty，与 queue.Queue 保持一致"""
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise queue.Empty
+
+    def task_done(self):
+        self._call(self._queue.task_done)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
@@ -0,0 +1,313 @@
+"""
+运行指标模块
+提供 Prometheus 文本格式的计数器、仪表和直方图，由 SimpleHttpServer 的 /metrics 接口导出。
+指标在各处理环节直接打点，连接数、线程数、队列深度、缓存命中等状态类指标在导出时采集。
+多进程模式下每个样本带 worker 标签，工作进程定期发布指标快照，/metrics 合并全部工作进程的指标导出，
+每次抓取无论落到哪个工作进程，各进程的序列都保持连续。
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# 延迟类直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 推理类直方图的分桶（秒），VAD单帧推理通常在毫秒级以下
+INFERENCE_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+# 批大小直方图的分桶
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+# 断句静默窗口的分桶（秒）
+ENDPOINT_BUCKETS = (0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0, 1.5, 2.0)
+# 速率类直方图的分桶（token/秒）
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 120, 200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(item for item in extra if item)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self, extra: str = "") -> List[str]:
+        """extra 为附加到每个样本的常量标签（如 worker）"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples(extra))
+        return lines
+
+    def _samples(self, extra: str = "") -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def sync(self, total: float, **labels):
+        """同步其他模块自行累计的总数（导出时采集）"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = total
+
+    def _samples(self, extra: str = ""):
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self, extra: str = ""):
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各分桶计数..., +Inf计数], 总和
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self, extra: str = ""):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, extra, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        # 多进程模式下附加到每个样本的工作进程标签
+        self.worker_label = ""
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """注册导出前执行的采集函数，用于刷新状态类指标"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def set_worker(self, index: int):
+        """多进程模式下由工作进程调用，之后导出的样本都带 worker 标签"""
+        self.worker_label = f'worker="{index}"'
+
+    def families(self) -> Dict[str, List[str]]:
+        """采集并返回本进程的全部指标：指标名 -> 文本行（HELP、TYPE、样本）"""
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception:
+                pass
+        return {
+            metric.name: metric.render(self.worker_label)
+            for metric in list(self._metrics.values())
+        }
+
+    def render(self, others: List[Dict[str, List[str]]] = ()) -> str:
+        """导出本进程的指标，others 为其他工作进程的 families() 快照，样本按指标名合并"""
+        families = self.families()
+        for other in others:
+            for name, lines in other.items():
+                if name in families:
+                    families[name].extend(lines[2:])
+                else:
+                    families[name] = list(lines)
+        lines = []
+        for family in families.values():
+            lines.extend(family)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# 各处理环节的指标
+VAD_INFERENCE = registry.histogram(
+    "xiaozhi_vad_inference_seconds", "VAD处理单个音频包的耗时(含解码与推理)", ("provider",), INFERENCE_BUCKETS
+)
+VAD_FRAMES = registry.counter(
+    "xiaozhi_vad_frames_total", "VAD分片数，result为inferred(送入模型)或skipped(能量预筛跳过)", ("provider", "result")
+)
+VAD_BATCH_SIZE = registry.histogram(
+    "xiaozhi_vad_batch_size", "VAD单次前向合并的音频流数", ("provider",), BATCH_BUCKETS
+)
+ENDPOINT_SILENCE = registry.histogram(
+    "xiaozhi_endpoint_silence_seconds", "断句时使用的静默窗口", ("provider",), ENDPOINT_BUCKETS
+)
+ENDPOINT_PREMATURE = registry.counter(
+    "xiaozhi_endpoint_premature_total", "过早断句次数(断句后用户在固定窗口内接着说话)", ("provider",)
+)
+ASR_BATCH_SIZE = registry.histogram(
+    "xiaozhi_asr_batch_size", "本地ASR单次批量解码合并的语音条数", ("provider",), BATCH_BUCKETS
+)
+ASR_QUEUE_WAIT = registry.histogram(
+    "xiaozhi_asr_queue_wait_seconds", "本地ASR请求排队等待批量解码的时间", ("provider",), INFERENCE_BUCKETS + (0.25, 0.5, 1.0)
+)
+ASR_SPECULATION = registry.counter(
+    "xiaozhi_asr_speculative_total", "静默开始时提前发起的识别，result为hit(断句后直接采用)或discarded(用户继续说话而丢弃)", ("provider", "result")
+)
+ASR_SPECULATION_WASTED = registry.counter(
+    "xiaozhi_asr_speculative_wasted_seconds_total", "被丢弃的提前识别已消耗的ASR计算时间", ("provider",)
+)
+ASR_WARM_SESSION = registry.counter(
+    "xiaozhi_asr_warm_session_total", "流式ASR一句话开始时的上游会话来源，result为hit(已预热)、pending(等待预热完成)或miss(现场建立)", ("provider", "result")
+)
+ASR_LATENCY = registry.histogram(
+    "xiaozhi_asr_latency_seconds", "语音结束到ASR返回文本的耗时", ("provider",)
+)
+LLM_FIRST_TOKEN = registry.histogram(
+    "xiaozhi_llm_first_token_seconds", "LLM请求到首个token的耗时", ("provider",)
+)
+LLM_TOKENS_PER_SECOND = registry.histogram(
+    "xiaozhi_llm_tokens_per_second", "LLM流式输出速率(按流式分片计)", ("provider",), RATE_BUCKETS
+)
+LLM_STREAM_CANCELLED = registry.counter(
+    "xiaozhi_llm_stream_cancelled_total", "被打断后立即取消的LLM上游请求数", ("provider",)
+)
+LLM_PROMPT_TOKENS = registry.counter(
+    "xiaozhi_llm_prompt_tokens_total", "LLM请求的输入token数(按上游返回的用量统计)", ("model",)
+)
+LLM_CACHED_PROMPT_TOKENS = registry.counter(
+    "xiaozhi_llm_cached_prompt_tokens_total", "LLM请求中命中上游提示词缓存的输入token数", ("model",)
+)
+RESPONSE_CACHE = registry.counter(
+    "xiaozhi_response_cache_total", "语义回复缓存查询与写入次数", ("result",)
+)
+TTS_FIRST_AUDIO = registry.histogram(
+    "xiaozhi_tts_first_audio_seconds", "首段文本送入TTS到首个音频包的耗时", ("provider",)
+)
+AUDIO_SEND_JITTER = registry.histogram(
+    "xiaozhi_audio_send_jitter_seconds", "音频包实际发送时间晚于计划时间的偏差", (), INFERENCE_BUCKETS + (0.25, 0.5)
+)
+
+# 导出时采集的状态类指标
+EVENT_LOOP_LAG = registry.gauge("xiaozhi_event_loop_lag_seconds", "事件循环延迟(平滑值)")
+ACTIVE_CONNECTIONS = registry.gauge("xiaozhi_active_connections", "当前连接数")
+ACTIVE_TURNS = registry.gauge("xiaozhi_active_turns", "进行中的对话轮数")
+THREADS = registry.gauge("xiaozhi_threads", "进程线程数")
+POOL_QUEUE_DEPTH = registry.gauge("xiaozhi_pool_queue_depth", "共享工作池排队任务数", ("pool",))
+POOL_BUSY = registry.gauge("xiaozhi_pool_busy_workers", "共享工作池忙碌线程数", ("pool",))
+POOL_WAIT_AVG = registry.gauge("xiaozhi_pool_wait_avg_seconds", "共享工作池平均排队时间", ("pool",))
+CACHE_EVENTS = registry.counter("xiaozhi_cache_events_total", "全局缓存累计事件数", ("event",))
+CACHE_HIT_RATIO = registry.gauge("xiaozhi_cache_hit_ratio", "全局缓存命中率")
+
+
+def _collect_runtime():
+    from core.utils.scheduler import scheduler
+    from core.utils.admission import admission
+    from core.utils.cache.manager import cache_manager
+
+    EVENT_LOOP_LAG.set(admission.loop_lag_ms / 1000)
+    ACTIVE_TURNS.set(admission.active_turns)
+    THREADS.set(threading.active_count())
+    for pool, stats in scheduler.get_stats().items():
+        POOL_QUEUE_DEPTH.set(stats["queue_depth"], pool=pool)
+        POOL_BUSY.set(stats["busy"], pool=pool)
+        POOL_WAIT_AVG.set(stats["wait_avg_ms"] / 1000, pool=pool)
+    cache_stats = cache_manager.get_stats()
+    for event in ("hits", "misses", "evictions", "cleanups"):
+        CACHE_EVENTS.sync(cache_stats.get(event, 0), event=event)
+    CACHE_HIT_RATIO.set(cache_stats.get("hit_rate", 0))
+
+
+registry.add_collector(_collect_runtime)
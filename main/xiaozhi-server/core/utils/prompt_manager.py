@@ -53,6 +53,7 @@ class PromptManager:
         self.config = config
         self.logger = logger or setup_logging()
         self.base_prompt_template = None
+        self._compiled_template = None
         self.last_update_time = 0
 
         # 导入全局缓存管理器
@@ -213,9 +214,10 @@ class PromptManager:
                         or ""
                     )
 
-            # 替换模板变量
-            template = Template(self.base_prompt_template)
-            enhanced_prompt = template.render(
+            # 替换模板变量，模板只编译一次
+            if self._compiled_template is None:
+                self._compiled_template = Template(self.base_prompt_template)
+            enhanced_prompt = self._compiled_template.render(
                 base_prompt=user_prompt,
                 current_time="{{current_time}}",
                 today_date=today_date,
@@ -239,3 +241,18 @@ class PromptManager:
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"构建增强提示词失败: {e}")
             return user_prompt
+
+
+_shared_prompt_manager = None
+
+
+def get_prompt_manager(config: Dict[str, Any], logger=None) -> PromptManager:
+    """获取进程内共享的提示词管理器
+
+    提示词管理器不保存连接状态（设备提示词、位置、天气都在全局缓存中），
+    所有连接共用一个实例，避免每个连接重复加载模板
+    """
+    global _shared_prompt_manager
+    if _shared_prompt_manager is None:
+        _shared_prompt_manager = PromptManager(config, logger)
+    return _shared_prompt_manager
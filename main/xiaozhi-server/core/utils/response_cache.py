@@ -0,0 +1,276 @@
+"""
+语义回复缓存
+设备经常听到相同的问题（"你是谁"、"讲个故事"），每次都要完整请求一次LLM和TTS。
+开启后对话前先在缓存中查找语义相同的问题，命中时直接回放上次的回复文本和Opus音频，
+不再请求LLM和TTS：
+- 问题经归一化（去掉空白、标点、语气词，保留数字、运算符和小数点）后用字符n-gram哈希向量化，
+  不依赖额外的模型；含数字或运算的问题只在归一化后完全相同时命中
+- 按智能体分命名空间（角色提示词、LLM、TTS配置、音频格式、说话人一致才共用），
+  开启记忆模块时回复可能包含该设备的记忆，命名空间按设备隔离；
+  每个命名空间一个numpy矩阵，查询时一次矩阵乘法得到全部相似度
+- 相似度达到阈值才命中；条目有过期时间，命名空间条目数或全部缓存音频的总字节数超出上限时淘汰最久未命中的条目
+- 与时间、天气、个人信息、上下文相关的问题不缓存；调用了工具的回复不缓存；
+  对话已折叠出滚动摘要时回复可能依赖摘要内容，不使用缓存
+"""
+
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from config.logger import setup_logging
+from core.utils.metrics import RESPONSE_CACHE
+
+TAG = __name__
+logger = setup_logging()
+
+# 哈希向量维度
+VECTOR_DIM = 1024
+
+# 问题中出现以下内容时不使用缓存：答案随时间变化、涉及个人信息或依赖上文
+DEFAULT_EXCLUDE_PATTERNS = [
+    r"今天|明天|昨天|后天|现在|刚才|最近|最新|今年|去年|明年",
+    r"几点|时间|日期|几号|星期|周几|礼拜|农历|节日",
+    r"天气|温度|气温|下雨|新闻|热搜|股票|汇率",
+    r"我叫|我是谁|我的|记得|记住|提醒",
+    r"继续|接着|然后呢|再来|再说|上一|下一|刚刚|换一",
+]
+
+# 归一化时去掉的空白、标点和语气词；数字、运算符（+-*/×÷=%）和数字间的小数点保留
+_STRIP_PATTERN = re.compile(
+    r"\s|(?<!\d)\.|\.(?!\d)"
+    r"|[,，。！？!?；;：:、\"'“”‘’()（）\[\]【】{}《》<>~～…·—_|#@&^`\\]"
+    r"|[呀吧呢啊嘛哦啦哈嗯呗哇]"
+)
+# 含数字或运算的问题只允许完全相同的问题命中，"2+3"与"2+4"这类只差一个字符的问题相似度也很高
+_EXACT_PATTERN = re.compile(r"[0-9０-９+\-*/×÷=%]|加|减|乘|除|等于|平方|开方")
+
+
+def normalize_query(text: str) -> str:
+    return _STRIP_PATTERN.sub("", text or "").lower()
+
+
+def _audio_bytes(audio: list) -> int:
+    size = 0
+    for _, audio_datas, text in audio:
+        if isinstance(audio_datas, (bytes, bytearray)):
+            size += len(audio_datas)
+        elif audio_datas:
+            size += sum(len(data) for data in audio_datas)
+        if text:
+            size += len(text.encode("utf-8"))
+    return size
+
+
+def embed(text: str) -> np.ndarray:
+    """字符1~3-gram带符号哈希向量，L2归一化后点积即余弦相似度"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for n, weight in ((1, 1.0), (2, 1.5), (3, 1.5)):
+        for i in range(len(text) - n + 1):
+            h = zlib.crc32(text[i : i + n].encode("utf-8"))
+            vector[h % VECTOR_DIM] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class CachedResponse:
+    __slots__ = ("query", "text", "audio", "size", "created_at", "last_hit")
+
+    def __init__(self, query, text, audio):
+        now = time.monotonic()
+        self.query = query
+        self.text = text
+        # 回放的音频队列数据 [(SentenceType, audio_datas, text), ...]
+        self.audio = audio
+        # 占用的字节数（音频和文本）
+        self.size = _audio_bytes(audio) + len(text.encode("utf-8"))
+        self.created_at = now
+        self.last_hit = now
+
+
+class _Namespace:
+    def __init__(self):
+        self.vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+        self.entries: List[CachedResponse] = []
+
+    def remove(self, keep) -> int:
+        """只保留 keep 为真的条目，返回移除的字节数"""
+        removed = sum(entry.size for entry, k in zip(self.entries, keep) if not k)
+        self.vectors = self.vectors[keep]
+        self.entries = [entry for entry, k in zip(self.entries, keep) if k]
+        return removed
+
+
+class ResponseCache:
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 0.9
+        self.ttl = 86400
+        self.max_entries = 200
+        self.max_namespaces = 1000
+        self.max_bytes = 64 * 1024 * 1024
+        self.min_length = 2
+        self.max_length = 40
+        self.scope = "agent"
+        self.exclude_patterns = []
+        self._namespaces: Dict[str, _Namespace] = {}
+        # 全部命名空间缓存的字节数
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        cache_config = config.get("server", {}).get("response_cache") or {}
+        self.enabled = bool(cache_config.get("enabled", False))
+        self.threshold = float(cache_config.get("threshold", 0.9))
+        self.ttl = float(cache_config.get("ttl", 86400))
+        self.max_entries = int(cache_config.get("max_entries", 200))
+        self.max_namespaces = int(cache_config.get("max_namespaces", 1000))
+        self.max_bytes = int(float(cache_config.get("max_mb", 64)) * 1024 * 1024)
+        self.min_length = int(cache_config.get("min_length", 2))
+        self.max_length = int(cache_config.get("max_length", 40))
+        self.scope = cache_config.get("scope", "agent")
+        patterns = cache_config.get("exclude_patterns")
+        if patterns is None:
+            patterns = DEFAULT_EXCLUDE_PATTERNS
+        self.exclude_patterns = []
+        for pattern in patterns:
+            try:
+                self.exclude_patterns.append(re.compile(pattern))
+            except re.error as e:
+                logger.bind(tag=TAG).warning(f"回复缓存排除规则无效: {pattern}, {e}")
+        with self._lock:
+            self._namespaces.clear()
+            self._bytes = 0
+
+    def namespace(self, conn, speaker=None) -> str:
+        """回复只在相同角色、模型、音色、音频格式和说话人下复用"""
+        config = conn.config
+        selected = config.get("selected_module", {})
+        tts_name = selected.get("TTS", "")
+        parts = {
+            "prompt": config.get("prompt", ""),
+            "llm": selected.get("LLM", ""),
+            "tts": tts_name,
+            "voice": config.get("TTS", {}).get(tts_name, {}),
+            "audio_format": conn.audio_format,
+            "speaker": speaker,
+        }
+        memory_enabled = conn.memory is not None and selected.get("Memory") != "nomem"
+        if self.scope == "device" or memory_enabled:
+            parts["device"] = conn.headers.get("device-id")
+        content = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+    def prepare(self, conn, query: str):
+        """返回 (命名空间, 归一化后的问题)，不适合缓存的问题返回 None"""
+        if not self.enabled:
+            return None
+        if conn.dialogue.summary:
+            RESPONSE_CACHE.inc(result="bypass")
+            return None
+        text, speaker = query, None
+        # 开启声纹识别时问题为包含说话人的JSON
+        if query.startswith("{"):
+            try:
+                data = json.loads(query)
+                text, speaker = data.get("content", ""), data.get("speaker")
+            except (ValueError, AttributeError):
+                pass
+        normalized = normalize_query(text)
+        if not self.min_length <= len(normalized) <= self.max_length or any(
+            pattern.search(text) for pattern in self.exclude_patterns
+        ):
+            RESPONSE_CACHE.inc(result="bypass")
+            return None
+        return self.namespace(conn, speaker), normalized
+
+    def lookup(self, namespace: str, normalized: str) -> Optional[CachedResponse]:
+        start = time.monotonic()
+        vector = embed(normalized)
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None or not space.entries:
+                RESPONSE_CACHE.inc(result="miss")
+                return None
+            self._expire(space, start)
+            if not space.entries:
+                RESPONSE_CACHE.inc(result="miss")
+                return None
+            if _EXACT_PATTERN.search(normalized):
+                index = next(
+                    (i for i, e in enumerate(space.entries) if e.query == normalized),
+                    -1,
+                )
+                score = 1.0 if index >= 0 else 0.0
+            else:
+                scores = space.vectors @ vector
+                index = int(np.argmax(scores))
+                score = float(scores[index])
+            if score < self.threshold:
+                RESPONSE_CACHE.inc(result="miss")
+                return None
+            entry = space.entries[index]
+            entry.last_hit = start
+        RESPONSE_CACHE.inc(result="hit")
+        logger.bind(tag=TAG).info(
+            f"回复缓存命中: {normalized} -> {entry.query}, 相似度 {score:.3f}, "
+            f"耗时 {(time.monotonic() - start) * 1000:.1f}ms"
+        )
+        return entry
+
+    def store(self, namespace: str, normalized: str, text: str, audio: list):
+        if not text or not audio:
+            return
+        vector = embed(normalized)
+        entry = CachedResponse(normalized, text, audio)
+        if self.max_bytes > 0 and entry.size > self.max_bytes:
+            return
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None:
+                if len(self._namespaces) >= self.max_namespaces:
+                    # 淘汰最早创建的命名空间
+                    oldest = self._namespaces.pop(next(iter(self._namespaces)))
+                    self._bytes -= sum(e.size for e in oldest.entries)
+                space = self._namespaces[namespace] = _Namespace()
+            self._expire(space, entry.created_at)
+            if space.entries:
+                # 同一问题只保留最新的回复
+                keep = [e.query != normalized for e in space.entries]
+                if not all(keep):
+                    self._bytes -= space.remove(keep)
+            if self.max_entries > 0 and len(space.entries) >= self.max_entries:
+                self._evict_lru(space)
+            # 总字节数超出上限时，在全部命名空间中淘汰最久未命中的条目
+            while self.max_bytes > 0 and self._bytes + entry.size > self.max_bytes:
+                victim = min(
+                    (s for s in self._namespaces.values() if s.entries),
+                    key=lambda s: min(e.last_hit for e in s.entries),
+                    default=None,
+                )
+                if victim is None:
+                    break
+                self._evict_lru(victim)
+            space.vectors = np.vstack([space.vectors, vector[None, :]])
+            space.entries.append(entry)
+            self._bytes += entry.size
+        RESPONSE_CACHE.inc(result="store")
+
+    def _evict_lru(self, space: _Namespace):
+        index = min(range(len(space.entries)), key=lambda i: space.entries[i].last_hit)
+        self._bytes -= space.remove([i != index for i in range(len(space.entries))])
+
+    def _expire(self, space: _Namespace, now: float):
+        if self.ttl <= 0:
+            return
+        keep = [now - entry.created_at < self.ttl for entry in space.entries]
+        if not all(keep):
+            self._bytes -= space.remove(keep)
+
+
+response_cache = ResponseCache()
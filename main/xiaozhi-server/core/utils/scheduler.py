@@ -0,0 +1,281 @@
+"""
+服务端共享任务调度模块
+所有连接共用一组按用途命名、线程数有上限的工作池（LLM、ASR、工具调用、上报、初始化），
+线程总数不再随连接数增长；每个池内部按设备ID轮询出队，避免单个设备占满线程导致其他设备饿死。
+"""
+
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 默认池大小（下限），可通过 server.worker_pools 覆盖
+DEFAULT_POOL_SIZES = {
+    "llm": 16,  # LLM流式对话、意图后的回复生成
+    "asr": 4,  # 本地ASR推理等CPU密集任务
+    "tool": 8,  # 工具调用及其后续处理
+    "report": 4,  # 聊天记录上报
+    "init": 4,  # 连接组件初始化
+}
+# 未单独配置的池按预计连接数推算：池大小 = max(默认值, 连接数 × 比例)
+# llm 线程在整轮流式回复期间（数秒到数十秒）一直被占用，按每个连接都可能同时对话计算；
+# init 位于握手路径上，重连高峰时需要足够的并发；asr、report 与连接数无关
+POOL_SCALE = {"llm": 1.0, "tool": 0.25, "init": 0.25}
+# 每个工作进程预计同时在线的连接数
+DEFAULT_EXPECTED_CONNECTIONS = 64
+
+
+def pool_sizes(pool_config: dict) -> dict:
+    """根据 server.worker_pools 配置计算各池大小"""
+    pool_config = dict(pool_config or {})
+    expected = int(
+        pool_config.pop("expected_connections", DEFAULT_EXPECTED_CONNECTIONS)
+    )
+    sizes = {
+        name: max(size, math.ceil(expected * POOL_SCALE.get(name, 0)))
+        for name, size in DEFAULT_POOL_SIZES.items()
+    }
+    sizes.update({name: int(size) for name, size in pool_config.items()})
+    return sizes
+
+# 线程本地事件循环，工作线程复用，避免每次任务都新建/关闭事件循环
+_thread_local = threading.local()
+
+
+def get_thread_loop() -> asyncio.AbstractEventLoop:
+    """获取当前工作线程专属的事件循环"""
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _thread_local.loop = loop
+    return loop
+
+
+def run_coroutine_in_thread(coro):
+    """在当前工作线程的事件循环中执行协程并返回结果"""
+    return get_thread_loop().run_until_complete(coro)
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "enqueue_time")
+
+    def __init__(self, future, fn, args, kwargs):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueue_time = time.monotonic()
+
+
+class WorkerPool:
+    """线程数有上限的工作池，按key（设备ID）公平轮询出队"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._cond = threading.Condition()
+        # key -> deque[_WorkItem]，OrderedDict 的顺序即轮询顺序
+        self._queues = OrderedDict()
+        self._threads = []
+        self._idle = 0
+        self._busy = 0
+        self._pending = 0
+        self._shutdown = False
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    def submit(self, key, fn, *args, **kwargs) -> Future:
+        future = Future()
+        item = _WorkItem(future, fn, args, kwargs)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"工作池 {self.name} 已关闭")
+            bucket = self._queues.get(key)
+            if bucket is None:
+                bucket = self._queues[key] = deque()
+            bucket.append(item)
+            self._pending += 1
+            self._stats["submitted"] += 1
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                self._spawn_worker()
+            self._cond.notify()
+        return future
+
+    def _spawn_worker(self):
+        thread = threading.Thread(
+            target=self._worker,
+            name=f"{self.name}-worker-{len(self._threads)}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_item(self):
+        """取出下一个任务：取队首key的一个任务，若该key仍有任务则移到队尾"""
+        key, bucket = next(iter(self._queues.items()))
+        item = bucket.popleft()
+        if bucket:
+            self._queues.move_to_end(key)
+        else:
+            del self._queues[key]
+        self._pending -= 1
+        return item
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._idle += 1
+                while not self._queues and not self._shutdown:
+                    self._cond.wait()
+                self._idle -= 1
+                if not self._queues:
+                    return
+                item = self._next_item()
+                self._busy += 1
+                wait = time.monotonic() - item.enqueue_time
+                self._stats["wait_total"] += wait
+                if wait > self._stats["wait_max"]:
+                    self._stats["wait_max"] = wait
+
+            ok = self._run(item)
+
+            with self._cond:
+                self._busy -= 1
+                self._stats["completed" if ok else "failed"] += 1
+
+    @staticmethod
+    def _run(item: _WorkItem) -> bool:
+        if not item.future.set_running_or_notify_cancel():
+            return True
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        except BaseException as e:
+            item.future.set_exception(e)
+            return False
+        item.future.set_result(result)
+        return True
+
+    def cancel_pending(self, key) -> int:
+        """取消某个key尚未开始执行的任务，返回取消数量"""
+        with self._cond:
+            bucket = self._queues.pop(key, None)
+            if not bucket:
+                return 0
+            self._pending -= len(bucket)
+        for item in bucket:
+            item.future.cancel()
+        return len(bucket)
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            dequeued = self._stats["submitted"] - self._pending
+            return {
+                "max_workers": self.max_workers,
+                "threads": len(self._threads),
+                "busy": self._busy,
+                "queue_depth": self._pending,
+                "queued_devices": len(self._queues),
+                "submitted": self._stats["submitted"],
+                "completed": self._stats["completed"],
+                "failed": self._stats["failed"],
+                "wait_avg_ms": (
+                    self._stats["wait_total"] / dequeued * 1000 if dequeued else 0.0
+                ),
+                "wait_max_ms": self._stats["wait_max"] * 1000,
+            }
+
+
+class TaskScheduler:
+    """进程级调度器，管理全部命名工作池"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool_sizes = pool_sizes({})
+        self._pools = {}
+
+    def configure(self, config: dict):
+        """根据配置调整池大小，需在首次提交任务前调用"""
+        sizes = pool_sizes(config.get("server", {}).get("worker_pools"))
+        with self._lock:
+            for name, size in sizes.items():
+                if name in self._pools:
+                    if self._pools[name].max_workers == size:
+                        continue
+                    logger.bind(tag=TAG).warning(f"工作池 {name} 已创建，忽略新的大小配置")
+                    continue
+                self._pool_sizes[name] = int(size)
+
+    def get_pool(self, name: str) -> WorkerPool:
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    size = self._pool_sizes.get(name, DEFAULT_POOL_SIZES["llm"])
+                    pool = self._pools[name] = WorkerPool(name, size)
+        return pool
+
+    def submit(self, pool: str, key, fn, *args, **kwargs) -> Future:
+        return self.get_pool(pool).submit(key, fn, *args, **kwargs)
+
+    def cancel_pending(self, key) -> int:
+        return sum(pool.cancel_pending(key) for pool in list(self._pools.values()))
+
+    def get_stats(self) -> dict:
+        return {name: pool.get_stats() for name, pool in list(self._pools.items())}
+
+    def shutdown(self):
+        for pool in list(self._pools.values()):
+            pool.shutdown()
+
+
+class ConnectionExecutor:
+    """单个连接的执行器门面
+
+    保持 `executor.submit(fn, *args)` 的调用方式不变，
+    任务实际提交到共享工作池，并以设备ID作为公平调度的key。
+    """
+
+    def __init__(self, scheduler: TaskScheduler, key, default_pool: str = "llm"):
+        self._scheduler = scheduler
+        self._key = key
+        self._default_pool = default_pool
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.submit_to(self._default_pool, fn, *args, **kwargs)
+
+    def submit_to(self, pool: str, fn, *args, **kwargs) -> Future:
+        if self._shutdown:
+            raise RuntimeError("连接执行器已关闭")
+        return self._scheduler.submit(pool, self._key, fn, *args, **kwargs)
+
+    def set_key(self, key):
+        """连接握手后设备ID才确定，此时更新调度key"""
+        self._key = key
+
+    def shutdown(self, wait=False, cancel_futures=False):
+        """关闭执行器：不再接受新任务，已排队的任务（如上报）继续执行"""
+        self._shutdown = True
+        if cancel_futures:
+            self._scheduler.cancel_pending(self._key)
+
+
+scheduler = TaskScheduler()
@@ -0,0 +1,296 @@
+"""
+本地推理旁路进程（sidecar）的客户端与通信协议
+VAD和本地ASR模型可以放在独立的推理进程中，同一台机器上的多个服务进程通过Unix域套接字共用一份模型权重，
+推理占用的CPU也与音频收发的事件循环隔离。服务端见 core/inference_sidecar.py。
+- 控制消息：4字节大端长度 + JSON，请求带 id，响应按 id 返回，同一连接上可并发多个请求
+- 音频数据：客户端进程创建一块共享内存，PCM写入其中后只在消息里传递偏移和长度，不经过套接字复制；
+  VAD的循环状态随请求一起写在共享内存里，推理进程不保存连接状态，重连或重启后不需要恢复
+客户端使用阻塞套接字和独立的接收线程，返回 concurrent Future，事件循环和ASR工作线程都可以等待。
+共享内存中的区域在调用方读完响应后释放；调用方超时放弃的请求，区域保留到推理进程的迟到响应返回，
+避免推理进程写回时覆盖已分配给其他请求的数据。
+"""
+
+import os
+import time
+import json
+import atexit
+import socket
+import struct
+import threading
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_SOCKET_PATH = "tmp/xiaozhi-inference.sock"
+DEFAULT_SHM_MB = 8
+# 共享内存中每次分配的对齐字节数
+ALIGN = 64
+
+_HEADER = struct.Struct(">I")
+
+
+def encode_frame(message: dict) -> bytes:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("推理进程已断开连接")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def recv_frame(sock) -> dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+async def read_frame(reader) -> dict:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads((await reader.readexactly(size)).decode("utf-8"))
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """附加到其他进程创建的共享内存，不让本进程的资源跟踪器在退出时删除它"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数，需要手动取消跟踪
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedPCMArena:
+    """客户端进程的共享内存区，按环形顺序分配，记录未释放的区域，空间不足时等待释放而不是覆盖"""
+
+    def __init__(self, size_mb: float = DEFAULT_SHM_MB):
+        self.size = int(size_mb * 1024 * 1024)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.size)
+        self.owner_pid = os.getpid()
+        self.pos = 0
+        # 未释放的区域：偏移 -> 字节数
+        self._allocated = {}
+        self._cond = threading.Condition()
+        atexit.register(self.close)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def alloc(self, nbytes: int, timeout: float = 0) -> int:
+        """分配 nbytes 字节，返回偏移，用完后需调用 free
+
+        空间不足时最多等待 timeout 秒，仍不足则抛出 MemoryError（事件循环中调用时不等待）
+        """
+        nbytes = max((nbytes + ALIGN - 1) // ALIGN * ALIGN, ALIGN)
+        if nbytes > self.size:
+            raise ValueError(f"单次数据 {nbytes} 字节超过共享内存容量，请增大 shm_mb")
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                offset = self._find(nbytes)
+                if offset is not None:
+                    self._allocated[offset] = nbytes
+                    self.pos = offset + nbytes
+                    return offset
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MemoryError(
+                        f"共享内存不足：{len(self._allocated)} 个请求未完成，请增大 shm_mb"
+                    )
+                self._cond.wait(remaining)
+
+    def _find(self, nbytes: int):
+        """从上次分配的位置往后找足够大的空隙，到末尾后从头找"""
+        regions = sorted(self._allocated.items())
+        for start in (self.pos, 0):
+            candidate = start
+            for offset, size in regions:
+                if offset + size <= candidate:
+                    continue
+                if offset >= candidate + nbytes:
+                    break
+                candidate = offset + size
+            if candidate + nbytes <= self.size:
+                return candidate
+        return None
+
+    def free(self, offset: int):
+        with self._cond:
+            if self._allocated.pop(offset, None) is not None:
+                self._cond.notify_all()
+
+    def close(self):
+        # fork 出的子进程退出时也会执行 atexit，只有创建者可以删除共享内存
+        if os.getpid() != self.owner_pid:
+            return
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except Exception:
+            pass
+
+
+class SidecarClient:
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, shm_mb: float = DEFAULT_SHM_MB, timeout: float = 10):
+        self.socket_path = socket_path
+        self.shm_mb = shm_mb
+        self.timeout = timeout
+        self._pid = None
+        self._sock = None
+        self._arena = None
+        # 等待响应的请求：id -> (Future, 共享内存偏移)
+        self._pending = {}
+        # 调用方已放弃、等待迟到响应后释放的共享内存：id -> 偏移
+        self._abandoned = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def arena(self) -> SharedPCMArena:
+        self._ensure_process()
+        return self._arena
+
+    def _ensure_process(self):
+        """多进程模式下 fork 后套接字、接收线程和共享内存都不能沿用，需要在子进程中重建"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._sock = None
+            self._pending = {}
+            self._abandoned = {}
+            self._arena = SharedPCMArena(self.shm_mb)
+            self._pid = pid
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        threading.Thread(
+            target=self._receive, args=(sock,), name="sidecar-client", daemon=True
+        ).start()
+        logger.bind(tag=TAG).info(f"已连接推理进程: {self.socket_path}")
+
+    def _receive(self, sock):
+        try:
+            while True:
+                message = recv_frame(sock)
+                with self._lock:
+                    entry = self._pending.pop(message.get("id"), None)
+                    abandoned = self._abandoned.pop(message.get("id"), None)
+                if abandoned is not None:
+                    # 调用方超时放弃的请求，推理进程已写完，此时才能释放
+                    self._arena.free(abandoned)
+                if entry is None:
+                    continue
+                self._resolve(entry[0], message)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"推理进程连接中断: {e}")
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                pending = [future for future, _ in self._pending.values()]
+                abandoned = list(self._abandoned.values())
+                self._pending.clear()
+                self._abandoned.clear()
+            sock.close()
+            for offset in abandoned:
+                self._arena.free(offset)
+            for future in pending:
+                self._resolve(future, None)
+
+    @staticmethod
+    def _resolve(future, message):
+        """设置请求结果；调用方已取消的 Future 直接跳过，迟到的响应不影响接收线程"""
+        if future.done():
+            return
+        try:
+            if message is None:
+                future.set_exception(ConnectionError("推理进程连接中断"))
+            elif message.get("ok"):
+                future.set_result(message)
+            else:
+                future.set_exception(RuntimeError(message.get("error", "推理失败")))
+        except InvalidStateError:
+            # 检查后被其他线程取消
+            pass
+
+    def request(self, message: dict, offset: int = None) -> Future:
+        """发送请求，返回响应消息的 Future；未连接时自动连接
+
+        offset 为本请求使用的共享内存区域，调用方读完响应或放弃等待后须调用 release
+        """
+        self._ensure_process()
+        future = Future()
+        with self._lock:
+            self._next_id += 1
+            future.request_id = self._next_id
+            future.offset = offset
+            message = dict(message, id=self._next_id, shm=self._arena.name)
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._pending[message["id"]] = (future, offset)
+                self._sock.sendall(encode_frame(message))
+            except Exception as e:
+                self._pending.pop(message["id"], None)
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+                future.set_exception(ConnectionError(f"无法连接推理进程 {self.socket_path}: {e}"))
+        return future
+
+    def release(self, future: Future):
+        """请求结束（读完响应、失败或超时放弃）后释放共享内存
+
+        仍未收到响应时推理进程稍后还会写回，区域保留到迟到响应返回或连接断开
+        """
+        with self._lock:
+            if self._pending.pop(future.request_id, None) is not None:
+                if future.offset is not None:
+                    self._abandoned[future.request_id] = future.offset
+                return
+        if future.offset is not None:
+            self._arena.free(future.offset)
+
+    def result(self, future: Future) -> dict:
+        """在工作线程中同步等待响应，超时后放弃该请求"""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_sidecar_client(config: dict) -> SidecarClient:
+    """按套接字路径获取进程内共享的客户端"""
+    socket_path = config.get("socket_path") or DEFAULT_SOCKET_PATH
+    with _clients_lock:
+        client = _clients.get(socket_path)
+        if client is None:
+            client = SidecarClient(
+                socket_path,
+                float(config.get("shm_mb", DEFAULT_SHM_MB)),
+                float(config.get("timeout", 10)),
+            )
+            _clients[socket_path] = client
+        return client
@@ -0,0 +1,205 @@
+"""
+对话轮次追踪模块
+每轮对话从语音结束（VAD stop）开始创建一个追踪对象，沿处理链路记录各阶段的时间点：
+voice_stop → asr_done → start_to_chat → intent_start/intent_done → llm_request → llm_first_token
+→ first_segment → tts_request → tts_first_audio → first_packet_sent → turn_end
+结束后交给可插拔的输出端：JSONL文件、可通过HTTP查询的内存环形缓冲、带内 metric 消息。
+"""
+
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 输出到带内消息时，按顺序展示的关键阶段
+SUMMARY_SPANS = (
+    "asr_done",
+    "llm_first_token",
+    "first_segment",
+    "tts_first_audio",
+    "first_packet_sent",
+)
+
+
+class TurnTrace:
+    """单轮对话的追踪记录，各阶段只记录首次到达的时间"""
+
+    __slots__ = ("turn_id", "session_id", "device_id", "start_time", "start_wall", "spans", "meta", "finished")
+
+    def __init__(self, turn_id: str, session_id: str, device_id: str, origin: str):
+        self.turn_id = turn_id
+        self.session_id = session_id
+        self.device_id = device_id
+        self.start_time = time.monotonic()
+        self.start_wall = time.time()
+        # 起点：语音轮次为 voice_stop，文本输入的轮次为 text_input
+        self.spans = {origin: 0.0}
+        self.meta = {}
+        self.finished = False
+
+    def mark(self, name: str, **meta):
+        if name not in self.spans:
+            self.spans[name] = (time.monotonic() - self.start_time) * 1000
+        if meta:
+            self.meta.update(meta)
+
+    def to_dict(self, status: str) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "device_id": self.device_id,
+            "start_time": self.start_wall,
+            "status": status,
+            "spans": {name: round(offset, 2) for name, offset in self.spans.items()},
+            "meta": self.meta,
+        }
+
+
+class JsonlSink:
+    """追加写入JSONL文件，写文件放到共享上报线程池中执行"""
+
+    def __init__(self, config: dict):
+        self.path = config.get("jsonl_path", "tmp/turn_trace.jsonl")
+        self._lock = threading.Lock()
+
+    def _write(self, line: str):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def emit(self, record: dict, conn):
+        from core.utils.scheduler import scheduler
+
+        scheduler.submit("report", "turn_trace", self._write, json.dumps(record, ensure_ascii=False))
+
+
+class RingSink:
+    """保存最近的追踪记录，供 HTTP 接口查询"""
+
+    def __init__(self, config: dict):
+        self.records = deque(maxlen=int(config.get("ring_size", 200)))
+
+    def emit(self, record: dict, conn):
+        self.records.append(record)
+
+    def query(self, device_id: str = None, limit: int = 50, others: list = ()) -> list:
+        """others 为其他工作进程的记录快照，合并后按开始时间排序"""
+        records = list(self.records)
+        if others:
+            for snapshot in others:
+                records.extend(snapshot)
+            records.sort(key=lambda r: r["start_time"])
+        if device_id:
+            records = [r for r in records if r["device_id"] == device_id]
+        return records[-limit:]
+
+
+class InbandSink:
+    """以 metric 消息发送给客户端，格式兼容原 MiniMax 首包延迟消息"""
+
+    def __init__(self, config: dict):
+        pass
+
+    def emit(self, record: dict, conn):
+        spans = record["spans"]
+        summary = ", ".join(
+            f"{name}={spans[name]:.0f}ms" for name in SUMMARY_SPANS if name in spans
+        )
+        message = {
+            "type": "metric",
+            "session_id": conn.session_id,
+            "trace": record,
+            "message": f"[Trace] turn={record['turn_id']} {summary}",
+        }
+        if "tts_first_audio" in spans and "tts_request" in spans:
+            message["first_audio_delay"] = spans["tts_first_audio"] - spans["tts_request"]
+        asyncio.run_coroutine_threadsafe(conn.websocket.send(json.dumps(message)), conn.loop)
+
+
+SINK_TYPES = {
+    "jsonl": JsonlSink,
+    "ring": RingSink,
+    "inband": InbandSink,
+}
+
+
+def register_sink_type(name: str, sink_cls):
+    """注册自定义输出端类型，需实现 emit(record, conn)"""
+    SINK_TYPES[name] = sink_cls
+
+
+class TurnTracer:
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self.ring = None
+
+    def configure(self, config: dict):
+        trace_config = config.get("server", {}).get("turn_trace") or {}
+        self.enabled = bool(trace_config.get("enabled", False))
+        self.sinks = []
+        self.ring = None
+        if not self.enabled:
+            return
+        for name in trace_config.get("sinks", ["ring"]):
+            sink_cls = SINK_TYPES.get(name)
+            if sink_cls is None:
+                logger.bind(tag=TAG).warning(f"未知的追踪输出端: {name}")
+                continue
+            sink = sink_cls(trace_config)
+            self.sinks.append(sink)
+            if isinstance(sink, RingSink):
+                self.ring = sink
+
+    def start_turn(self, conn, origin: str = "voice_stop"):
+        """开始新一轮追踪，上一轮未结束的追踪以 superseded 状态输出"""
+        if not self.enabled:
+            return None
+        previous = getattr(conn, "turn_trace", None)
+        if previous is not None and not previous.finished:
+            self.finish_turn(conn, "superseded")
+        trace = TurnTrace(
+            turn_id=f"{conn.session_id[:8]}-{int(time.time() * 1000)}",
+            session_id=conn.session_id,
+            device_id=conn.device_id,
+            origin=origin,
+        )
+        conn.turn_trace = trace
+        return trace
+
+    def ensure_turn(self, conn):
+        """进入对话流程时调用：没有进行中的语音轮次（如文本输入）则新建一轮"""
+        trace = getattr(conn, "turn_trace", None)
+        if trace is None or trace.finished or "start_to_chat" in trace.spans:
+            return self.start_turn(conn, origin="text_input")
+        return trace
+
+    def has_sink(self, sink_type: str) -> bool:
+        sink_cls = SINK_TYPES.get(sink_type)
+        return sink_cls is not None and any(isinstance(s, sink_cls) for s in self.sinks)
+
+    def mark(self, conn, name: str, **meta):
+        trace = getattr(conn, "turn_trace", None)
+        if trace is not None and not trace.finished:
+            trace.mark(name, **meta)
+
+    def finish_turn(self, conn, status: str = "ok"):
+        trace = getattr(conn, "turn_trace", None)
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        trace.mark("turn_end")
+        record = trace.to_dict(status)
+        for sink in self.sinks:
+            try:
+                sink.emit(record, conn)
+            except Exception as e:
+                logger.bind(tag=TAG).debug(f"输出追踪记录失败: {e}")
+
+
+turn_tracer = TurnTracer()
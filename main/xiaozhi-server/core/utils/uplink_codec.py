@@ -0,0 +1,190 @@
+"""
+流式ASR上行音频编码协商
+设备上行的是Opus音频包，流式ASR以往把解码后的16位PCM发给上游，上行带宽是Opus的十倍左右。
+部分上游接口可以直接接收Opus，按接口要求的封装转发原始Opus包即可：
+- ogg_opus：Ogg封装的Opus（豆包 format=ogg/codec=opus，阿里云 format=opus）
+- opus_length_prefixed：每帧前加2字节大端长度的Opus（讯飞 encoding=opus-wb）
+设备上行为PCM、上游不支持Opus或配置为pcm时，回退为PCM。
+转发只节省上行带宽，不节省CPU：VAD、声纹识别仍需要PCM，每个音频包照常在音频接入（audio_ingest）中解码一次。
+每个上游会话使用一个新的编码器实例，Ogg流的头页在会话的第一包音频前发送。
+"""
+
+import os
+import struct
+import opuslib_next
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+PCM = "pcm"
+OGG_OPUS = "ogg_opus"
+OPUS_LENGTH_PREFIXED = "opus_length_prefixed"
+
+SAMPLE_RATE = 16000
+# opus解码的最大采样点数（60ms）
+PACKET_SAMPLES = 960
+# Ogg Opus 头中的 pre-skip（48kHz采样点），与libopus默认编码延迟一致
+PRE_SKIP = 312
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """按TOC字节计算opus包的时长（48kHz采样点），用于Ogg页的granule position"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:
+        frame = (480, 960)[config % 2]
+    else:
+        frame = (120, 240, 480, 960)[config % 4]
+    code = toc & 0x03
+    if code == 0:
+        count = 1
+    elif code < 3:
+        count = 2
+    else:
+        count = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * count
+
+
+class OggOpusWriter:
+    """把opus包逐个封装成Ogg页，每页一个包，来一包发一包，不增加延迟"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.serial = struct.unpack("<I", os.urandom(4))[0]
+        self.sequence = 0
+        self.granule = 0
+
+    def _page(self, packet: bytes, granule: int, header_type: int = 0) -> bytes:
+        lacing = bytearray()
+        size = len(packet)
+        while size >= 255:
+            lacing.append(255)
+            size -= 255
+        lacing.append(size)
+        header = struct.pack(
+            "<4sBBqIIIB",
+            b"OggS",
+            0,
+            header_type,
+            granule,
+            self.serial,
+            self.sequence,
+            0,
+            len(lacing),
+        )
+        page = bytearray(header + lacing + packet)
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        self.sequence += 1
+        return bytes(page)
+
+    def headers(self) -> bytes:
+        """OpusHead（BOS页）和OpusTags页"""
+        opus_head = struct.pack(
+            "<8sBBHIhB", b"OpusHead", 1, self.channels, PRE_SKIP, self.sample_rate, 0, 0
+        )
+        vendor = b"xiaozhi"
+        opus_tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+        return self._page(opus_head, 0, 0x02) + self._page(opus_tags, 0)
+
+    def packet(self, packet: bytes) -> bytes:
+        self.granule += opus_packet_samples(packet)
+        return self._page(packet, self.granule)
+
+
+class PCMUplink:
+    codec = PCM
+
+    def __init__(self, audio_format: str = "opus"):
+        self.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1) if audio_format == "opus" else None
+
+    def encode(self, packet: bytes) -> bytes:
+        if not packet:
+            return b""
+        if self.decoder is None:
+            return packet
+        try:
+            return self.decoder.decode(packet, PACKET_SAMPLES)
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+            return b""
+
+
+class OggOpusUplink:
+    codec = OGG_OPUS
+
+    def __init__(self):
+        self.writer = OggOpusWriter()
+        self.started = False
+
+    def encode(self, packet: bytes) -> bytes:
+        if not packet:
+            return b""
+        if not self.started:
+            self.started = True
+            return self.writer.headers() + self.writer.packet(packet)
+        return self.writer.packet(packet)
+
+
+class LengthPrefixedOpusUplink:
+    codec = OPUS_LENGTH_PREFIXED
+
+    def encode(self, packet: bytes) -> bytes:
+        if not packet:
+            return b""
+        return struct.pack(">H", len(packet)) + packet
+
+
+_UPLINKS = {
+    OGG_OPUS: OggOpusUplink,
+    OPUS_LENGTH_PREFIXED: LengthPrefixedOpusUplink,
+}
+
+
+def negotiate(audio_format: str, preference: str, supported: tuple) -> str:
+    """选择上行编码
+
+    audio_format: 设备上行的音频格式（opus/pcm）
+    preference: 配置的 uplink_codec，auto 表示上游支持时直接转发Opus，pcm 表示总是解码
+    supported: 上游接口支持的Opus封装，按优先级排列
+    """
+    if audio_format != "opus" or preference == PCM:
+        return PCM
+    if preference == "auto":
+        return supported[0] if supported else PCM
+    if preference in supported:
+        return preference
+    logger.bind(tag=TAG).warning(f"上游不支持的上行编码: {preference}，使用pcm")
+    return PCM
+
+
+def create_uplink(codec: str, audio_format: str = "opus"):
+    """为一个上游会话创建编码器"""
+    if codec == PCM:
+        return PCMUplink(audio_format)
+    return _UPLINKS[codec]()
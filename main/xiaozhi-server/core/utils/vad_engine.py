@@ -0,0 +1,228 @@
+"""
+批量VAD推理引擎
+Silero VAD 是带循环状态的模型，原先所有连接共用一个模型实例，模型内部的隐藏状态在连接之间互相串扰。
+引擎为每个音频流保存独立的循环状态（state: [2, 128]，context: 最近64个采样点），
+推理时把各连接待处理的512采样点分片拼成一个批次，一次前向得到每个流的语音概率：
+- 批量模式：后台推理线程每隔几毫秒收集一次各连接提交的分片，合并成一个批次推理
+- 非批量模式：调用方线程直接推理（批大小为1），同样使用独立状态
+推理后端只需实现 forward(chunks[B, 512], state[2, B, 128], context[B, 64]) -> (概率[B], state, context)。
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
+from concurrent.futures import Future
+from config.logger import setup_logging
+from core.utils.metrics import VAD_BATCH_SIZE
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+# 每次推理的采样点数（16k采样率下Silero只支持512）
+CHUNK_SAMPLES = 512
+# 模型需要拼接在分片前的上一分片末尾采样点数
+CONTEXT_SAMPLES = 64
+STATE_SIZE = 128
+
+
+class VADStream:
+    """单个音频流（连接）的VAD推理状态"""
+
+    __slots__ = ("state", "context", "gate")
+
+    def __init__(self, gate=None):
+        self.state = np.zeros((2, STATE_SIZE), dtype=np.float32)
+        self.context = np.zeros(CONTEXT_SAMPLES, dtype=np.float32)
+        # 能量预筛状态（见 core.utils.energy_gate），由VAD供应器使用
+        self.gate = gate
+
+    def reset(self):
+        self.state.fill(0)
+        self.context.fill(0)
+
+
+class TorchSileroBackend:
+    """PyTorch JIT 版 Silero 模型后端
+
+    JIT 模型在 forward 内部读写 _state/_context，这里每次前向前写入拼好的批量状态，
+    前向后取回，从而让一个模型实例服务多个流；调用方需保证串行调用
+    """
+
+    def __init__(self, model):
+        import torch
+
+        self.torch = torch
+        self.model = model
+
+    def forward(self, chunks, state, context):
+        torch = self.torch
+        batch_size = chunks.shape[0]
+        with torch.no_grad():
+            self.model._state = torch.from_numpy(state)
+            self.model._context = torch.from_numpy(context)
+            self.model._last_sr = SAMPLE_RATE
+            self.model._last_batch_size = batch_size
+            out = self.model(torch.from_numpy(chunks), SAMPLE_RATE)
+            new_state = self.model._state.numpy()
+            new_context = self.model._context.numpy()
+        return out.numpy().reshape(batch_size), new_state, new_context
+
+
+class OnnxSileroBackend:
+    """ONNX Runtime 版 Silero 模型后端，不依赖 torch，state 作为模型的显式输入输出"""
+
+    def __init__(self, model_path: str, intra_op_threads: int = 1, inter_op_threads: int = 1):
+        import onnxruntime
+
+        opts = onnxruntime.SessionOptions()
+        opts.intra_op_num_threads = int(intra_op_threads)
+        opts.inter_op_num_threads = int(inter_op_threads)
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"], sess_options=opts
+        )
+        self.sample_rate = np.array(SAMPLE_RATE, dtype=np.int64)
+
+    def forward(self, chunks, state, context):
+        x = np.concatenate([context, chunks], axis=1)
+        out, new_state = self.session.run(
+            None, {"input": x, "state": state, "sr": self.sample_rate}
+        )
+        return out.reshape(chunks.shape[0]), new_state, x[:, -CONTEXT_SAMPLES:]
+
+
+class _Request:
+    __slots__ = ("stream", "chunks", "index", "probs", "future")
+
+    def __init__(self, stream, chunks):
+        self.stream = stream
+        self.chunks = chunks
+        self.index = 0
+        self.probs = []
+        self.future = Future()
+
+
+class BatchedVADEngine:
+    def __init__(
+        self,
+        backend,
+        batching: bool = True,
+        batch_wait_ms: float = 5,
+        max_batch_size: int = 64,
+        name: str = "vad",
+    ):
+        self.backend = backend
+        self.batching = batching
+        self.batch_wait = max(float(batch_wait_ms), 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.name = name
+        self._pid = None
+        self._requests = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """推理线程在首次使用时启动；多进程模式下 fork 后线程和锁不会继承，需要在子进程中重建"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._lock = threading.Lock()
+        if self.batching:
+            self._requests = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-batch", daemon=True
+            )
+            self._thread.start()
+
+    def _forward(self, streams, chunks):
+        """对一组不同的流各推理一个分片，并写回各流的状态"""
+        state = np.stack([s.state for s in streams], axis=1)
+        context = np.stack([s.context for s in streams])
+        batch = np.stack(chunks)
+        with self._lock:
+            probs, new_state, new_context = self.backend.forward(batch, state, context)
+        for i, stream in enumerate(streams):
+            stream.state = np.array(new_state[:, i], dtype=np.float32)
+            stream.context = np.array(new_context[i, -CONTEXT_SAMPLES:], dtype=np.float32)
+        VAD_BATCH_SIZE.observe(len(streams), provider=self.name)
+        return probs
+
+    def infer(self, stream: VADStream, chunks: list) -> list:
+        """在当前线程直接推理一个流的若干分片，返回每个分片的语音概率"""
+        self._ensure_worker()
+        return [float(self._forward([stream], [chunk])[0]) for chunk in chunks]
+
+    def submit(self, stream: VADStream, chunks: list) -> Future:
+        """提交到批量推理线程，返回每个分片的语音概率列表的 Future"""
+        self._ensure_worker()
+        request = _Request(stream, chunks)
+        if not chunks:
+            request.future.set_result([])
+        elif not self.batching:
+            try:
+                request.future.set_result(self.infer(stream, chunks))
+            except Exception as e:
+                request.future.set_exception(e)
+        else:
+            self._requests.put(request)
+        return request.future
+
+    async def infer_async(self, stream: VADStream, chunks: list) -> list:
+        if not chunks:
+            return []
+        if not self.batching:
+            return self.infer(stream, chunks)
+        return await asyncio.wrap_future(self.submit(stream, chunks))
+
+    def _collect(self):
+        """取出一批请求：等到首个请求后，再最多等待 batch_wait 凑批"""
+        requests = [self._requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(requests) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    requests.append(self._requests.get(timeout=timeout))
+                else:
+                    requests.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            try:
+                self._process(requests)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"批量VAD推理失败: {e}")
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _process(self, requests):
+        active = requests
+        while active:
+            # 同一个流的分片必须按顺序推理，每轮每个流只取一个分片
+            seen = set()
+            batch = []
+            for request in active:
+                if id(request.stream) in seen:
+                    continue
+                seen.add(id(request.stream))
+                batch.append(request)
+                if len(batch) >= self.max_batch_size:
+                    break
+            probs = self._forward(
+                [r.stream for r in batch], [r.chunks[r.index] for r in batch]
+            )
+            for request, prob in zip(batch, probs):
+                request.probs.append(float(prob))
+                request.index += 1
+                if request.index >= len(request.chunks):
+                    request.future.set_result(request.probs)
+            active = [r for r in active if not r.future.done()]
@@ -0,0 +1,184 @@
+"""
+流式ASR上游连接预热
+doubao_stream / aliyun_stream / xunfei_stream 每句话都要新建一条WebSocket连接（TLS握手，
+豆包和阿里云还要再走一轮初始化请求），以往在检测到第一个有声音频包后才开始建立，握手期间的音频只能排队等待。
+预热管理器在设备有交互时（连接建立、设备开始拾音、上一句话识别结束后）提前把会话建好，
+说话开始时直接取用已就绪的会话（默认关闭，通过 prewarm 开启）：
+- 会话闲置超过 prewarm_max_idle 秒后主动关闭，避免被服务端空闲超时断开；
+  关闭后不按定时器重建，等设备下一次交互时再预热，每次交互最多预建一条会话
+- 设备超过 prewarm_keep_seconds 秒没有交互时停止预热，不长期占用上游连接
+- 鉴权信息（如阿里云Token）在建立会话时检查，预热期间即可提前刷新
+"""
+
+import time
+import asyncio
+from config.logger import setup_logging
+from core.utils.metrics import ASR_WARM_SESSION
+
+TAG = __name__
+logger = setup_logging()
+
+# 预热任务检查会话状态的间隔（秒）
+CHECK_INTERVAL = 1.0
+# 预热失败后的重试间隔（秒）
+RETRY_INTERVAL = 5.0
+
+
+def is_open(ws) -> bool:
+    """兼容新旧版本websockets，判断连接是否仍可用"""
+    if ws is None:
+        return False
+    state = getattr(ws, "state", None)
+    if state is not None:
+        return getattr(state, "name", "") == "OPEN"
+    return bool(getattr(ws, "open", False))
+
+
+class WarmConnectionManager:
+    """单个流式ASR实例（每个设备连接一个）的上游会话预热
+
+    open_session: 建立连接并完成鉴权/初始化握手，返回可直接发送音频的会话
+    close_session: 关闭未被使用的会话
+    session_key: 可选，返回会话参数（如上行编码）的标识，参数变化后预热的会话不再使用
+    """
+
+    def __init__(self, open_session, close_session, config: dict, session_key=None):
+        self.open_session = open_session
+        self.close_session = close_session
+        self.session_key = session_key
+        self.enabled = str(config.get("prewarm", False)).lower() in ("true", "1", "yes")
+        self.max_idle = float(config.get("prewarm_max_idle", 8))
+        self.keep_seconds = float(config.get("prewarm_keep_seconds", 60))
+        self.provider = ""
+        self._stop_event = None
+        self._session = None
+        self._key = None
+        self._opened_at = 0.0
+        self._opening = None
+        self._keeper = None
+        self._leased = False
+        self._warm_until = 0.0
+
+    def start(self, conn):
+        """连接建立时调用，开始预热"""
+        self._stop_event = conn.stop_event
+        self.provider = conn.config.get("selected_module", {}).get("ASR", "")
+        self.touch()
+
+    def touch(self):
+        """设备有交互（开始拾音、一句话结束），延长预热时间并确保预热任务在运行"""
+        if not self.enabled or self._stop_event is None:
+            return
+        self._warm_until = time.monotonic() + self.keep_seconds
+        if self._keeper is None or self._keeper.done():
+            self._keeper = asyncio.create_task(self._keep_warm())
+
+    def _active(self) -> bool:
+        return (
+            self.enabled
+            and not self._stop_event.is_set()
+            and time.monotonic() < self._warm_until
+        )
+
+    def _current_key(self):
+        return self.session_key() if self.session_key else None
+
+    def _fresh(self) -> bool:
+        return (
+            self._session is not None
+            and time.monotonic() - self._opened_at < self.max_idle
+            and self._key == self._current_key()
+            and is_open(self._session)
+        )
+
+    async def _warm_up(self):
+        try:
+            key = self._current_key()
+            session = await self.open_session()
+            if self._leased or not self._active():
+                # 建好时已经不需要（已被直接建立的会话占用，或连接已关闭）
+                await self._close_quietly(session)
+                return
+            self._session = session
+            self._key = key
+            self._opened_at = time.monotonic()
+            logger.bind(tag=TAG).debug(f"ASR上游会话已预热: {self.provider}")
+        finally:
+            self._opening = None
+
+    async def _keep_warm(self):
+        try:
+            while self._active():
+                if self._session is None and self._opening is None and not self._leased:
+                    self._opening = asyncio.create_task(self._warm_up())
+                    try:
+                        await asyncio.shield(self._opening)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.bind(tag=TAG).warning(f"ASR上游会话预热失败: {e}")
+                        await asyncio.sleep(RETRY_INTERVAL)
+                        continue
+                await asyncio.sleep(CHECK_INTERVAL)
+                if self._session is not None and not self._fresh():
+                    # 闲置太久或已被服务端断开：关闭，不再反复重建，等设备下一次交互时再预热
+                    await self._discard()
+                    return
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self._discard()
+
+    async def acquire(self):
+        """一句话开始时获取会话：优先使用已预热的会话，正在预热时等待其完成，否则直接建立"""
+        self._leased = True
+        try:
+            if self._fresh():
+                session, self._session = self._session, None
+                ASR_WARM_SESSION.inc(provider=self.provider, result="hit")
+                return session
+            await self._discard()
+            opening = self._opening
+            if opening is not None:
+                self._leased = False
+                try:
+                    await asyncio.shield(opening)
+                except Exception:
+                    pass
+                self._leased = True
+                if self._fresh():
+                    session, self._session = self._session, None
+                    ASR_WARM_SESSION.inc(provider=self.provider, result="pending")
+                    return session
+            ASR_WARM_SESSION.inc(provider=self.provider, result="miss")
+            return await self.open_session()
+        except BaseException:
+            self._leased = False
+            raise
+
+    def release(self):
+        """一句话的会话已结束，为下一句话重新预热"""
+        self._leased = False
+        self.touch()
+
+    async def _discard(self):
+        session, self._session = self._session, None
+        if session is not None:
+            await self._close_quietly(session)
+
+    async def _close_quietly(self, session):
+        try:
+            await asyncio.wait_for(self.close_session(session), timeout=2.0)
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"关闭预热会话失败: {e}")
+
+    async def close(self):
+        self.enabled = False
+        if self._keeper is not None and not self._keeper.done():
+            self._keeper.cancel()
+            try:
+                await self._keeper
+            except asyncio.CancelledError:
+                pass
+        self._keeper = None
+        await self._discard()
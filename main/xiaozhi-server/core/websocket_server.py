@@ -6,6 +6,12 @@ from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
 from core.auth import AuthManager, AuthenticationError
+from core.utils.scheduler import scheduler
+from core.utils.admission import admission
+from core.utils.metrics import ACTIVE_CONNECTIONS
+from core.utils.turn_trace import turn_tracer
+from core.utils.response_cache import response_cache
+from config.agent_config_cache import agent_config_cache
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
 
@@ -13,20 +19,33 @@ TAG = __name__
 
 
 class WebSocketServer:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, modules: dict = None):
+        """
+        Args:
+            config: 配置
+            modules: 父进程预加载的共享模块（多进程模式），其余模块在本进程初始化
+        """
         self.config = config
         self.logger = setup_logging()
         self.config_lock = asyncio.Lock()
+        # 配置进程级共享工作池
+        scheduler.configure(self.config)
+        admission.configure(self.config)
+        turn_tracer.configure(self.config)
+        response_cache.configure(self.config)
+        agent_config_cache.configure(self.config)
+        preloaded = modules or {}
         modules = initialize_modules(
             self.logger,
             self.config,
-            "VAD" in self.config["selected_module"],
-            "ASR" in self.config["selected_module"],
+            "VAD" in self.config["selected_module"] and "vad" not in preloaded,
+            "ASR" in self.config["selected_module"] and "asr" not in preloaded,
             "LLM" in self.config["selected_module"],
             False,
             "Memory" in self.config["selected_module"],
             "Intent" in self.config["selected_module"],
         )
+        modules = {**preloaded, **modules}
         self._vad = modules["vad"] if "vad" in modules else None
         self._asr = modules["asr"] if "asr" in modules else None
         self._llm = modules["llm"] if "llm" in modules else None
@@ -48,8 +67,17 @@ class WebSocketServer:
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
 
+        # 多进程模式下各工作进程通过 SO_REUSEPORT 监听同一端口
+        reuse_port = server_config.get("reuse_port", False)
+        # 事件循环延迟监测，用于准入控制
+        self.lag_monitor_task = asyncio.create_task(admission.monitor_loop_lag())
+
         async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
+            self._handle_connection,
+            host,
+            port,
+            process_request=self._http_response,
+            reuse_port=reuse_port,
         ):
             await asyncio.Future()
 
@@ -99,6 +127,7 @@ class WebSocketServer:
             self,  # 传入server实例
         )
         self.active_connections.add(handler)
+        ACTIVE_CONNECTIONS.inc()
         try:
             await handler.handle_connection(websocket)
         except Exception as e:
@@ -106,6 +135,7 @@ class WebSocketServer:
         finally:
             # 确保从活动连接集合中移除
             self.active_connections.discard(handler)
+            ACTIVE_CONNECTIONS.dec()
             # 强制关闭连接（如果还没有关闭的话）
             try:
                 # 安全地检查WebSocket状态并关闭
@@ -124,6 +154,19 @@ class WebSocketServer:
     async def _http_response(self, websocket, request_headers):
         # 检查是否为 WebSocket 升级请求
         if request_headers.headers.get("connection", "").lower() == "upgrade":
+            # 过载时在握手阶段拒绝或重定向新连接
+            accepted, redirect_url = admission.admit(len(self.active_connections))
+            if not accepted:
+                self.logger.bind(tag=TAG).warning(
+                    f"服务过载，{'重定向' if redirect_url else '拒绝'}新连接"
+                )
+                if redirect_url:
+                    response = websocket.respond(307, "Server overloaded\n")
+                    response.headers["Location"] = redirect_url
+                else:
+                    response = websocket.respond(503, "Server overloaded\n")
+                    response.headers["Retry-After"] = str(admission.retry_after)
+                return response
             # 如果是 WebSocket 请求，返回 None 允许握手继续
             return None
         else:
@@ -152,6 +195,10 @@ class WebSocketServer:
                 )
                 # 更新配置
                 self.config = new_config
+                admission.configure(self.config)
+                response_cache.configure(self.config)
+                # 全局配置更新后，设备差异化配置一并重新获取
+                agent_config_cache.purge()
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
@@ -0,0 +1,301 @@
+"""
+多进程工作模式
+父进程预加载可共享的模型（VAD、本地ASR），然后 fork 出多个工作进程，
+工作进程通过 SO_REUSEPORT 监听同一端口，各自运行 WebSocketServer 和 SimpleHttpServer，
+模型内存在 fork 后按写时复制共享；父进程只负责监管，工作进程异常退出时自动重启。
+进程内的状态（如设备配置缓存）需要全部工作进程一起变更时，收到请求的工作进程调用 broadcast，
+消息经父进程转发给其他工作进程，由 on_message 登记的处理函数在各自的事件循环上执行。
+只读的进程内状态（指标、追踪记录）由各工作进程定期写成快照文件（add_snapshot 登记），
+收到查询的工作进程读取其他工作进程的快照（read_snapshots）与自己的实时数据合并返回。
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import signal
+import select
+import socket
+from config.logger import setup_logging
+from core.utils.modules_initialize import initialize_modules
+
+TAG = __name__
+logger = setup_logging()
+
+# 工作进程异常退出后重启的最小间隔（秒），避免启动即崩溃时疯狂重启
+RESTART_BACKOFF = 1.0
+
+# 当前进程的工作进程序号，父进程或单进程模式下为 None
+_worker_index = None
+# 工作进程与父进程之间的消息通道（数据报套接字），父进程或单进程模式下为 None
+_channel = None
+# 广播消息的处理函数：op -> handler(message)
+_handlers = {}
+# 工作进程状态快照的目录和发布间隔（秒）
+SNAPSHOT_DIR = "tmp/workers"
+SNAPSHOT_INTERVAL = 5
+# 定期发布的快照：名称 -> 生成快照数据的函数
+_snapshots = {}
+
+
+def in_worker_process() -> bool:
+    return _worker_index is not None
+
+
+def worker_index():
+    return _worker_index
+
+
+def on_message(op: str, handler):
+    """登记其他工作进程广播的消息的处理函数"""
+    _handlers[op] = handler
+
+
+def broadcast(op: str, **payload) -> bool:
+    """把消息经父进程转发给其他工作进程（本进程需自行处理），返回是否已发出；单进程模式下返回 False"""
+    if _channel is None:
+        return False
+    try:
+        _channel.send(json.dumps(dict(payload, op=op), ensure_ascii=False).encode("utf-8"))
+        return True
+    except OSError as e:
+        logger.bind(tag=TAG).error(f"广播消息失败: {op}, {e}")
+        return False
+
+
+def listen(loop):
+    """在工作进程的事件循环上接收其他工作进程广播的消息"""
+    if _channel is None:
+        return
+    _channel.setblocking(False)
+
+    def on_readable():
+        while True:
+            try:
+                message = json.loads(_channel.recv(65536).decode("utf-8"))
+            except BlockingIOError:
+                return
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"读取广播消息失败: {e}")
+                return
+            handler = _handlers.get(message.get("op"))
+            if handler is None:
+                continue
+            try:
+                handler(message)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"处理广播消息失败: {message.get('op')}, {e}")
+
+    loop.add_reader(_channel.fileno(), on_readable)
+
+
+def add_snapshot(name: str, producer):
+    """登记定期发布的快照，producer 在事件循环上调用，返回可JSON序列化的数据"""
+    _snapshots[name] = producer
+
+
+def _write_snapshot(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def publish_snapshots():
+    """工作进程中运行：定期把登记的快照写入文件，单进程模式下直接返回"""
+    if _worker_index is None:
+        return
+    loop = asyncio.get_running_loop()
+    while True:
+        for name, producer in list(_snapshots.items()):
+            try:
+                path = os.path.join(SNAPSHOT_DIR, f"{name}-{_worker_index}.json")
+                await loop.run_in_executor(None, _write_snapshot, path, producer())
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"发布快照失败: {name}, {e}")
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+
+
+def read_snapshots(name: str) -> list:
+    """读取其他工作进程最近发布的快照，单进程模式下返回空列表"""
+    if _worker_index is None:
+        return []
+    own = os.path.join(SNAPSHOT_DIR, f"{name}-{_worker_index}.json")
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(SNAPSHOT_DIR, f"{name}-*.json"))):
+        if path == own:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # 文件正在替换或已损坏，跳过本次
+            continue
+    return snapshots
+
+
+def request_restart():
+    """工作进程请求父进程重启整个服务（重新加载配置和模型）"""
+    os.kill(os.getppid(), signal.SIGHUP)
+
+
+def is_supported() -> bool:
+    """当前平台是否支持多进程模式（需要 fork 和 SO_REUSEPORT）"""
+    return hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")
+
+
+def preload_modules(config: dict) -> dict:
+    """在父进程中预加载可被所有工作进程共享的模块"""
+    return initialize_modules(
+        logger,
+        config,
+        "VAD" in config["selected_module"],
+        "ASR" in config["selected_module"],
+        False,
+        False,
+        False,
+        False,
+    )
+
+
+class WorkerSupervisor:
+    """工作进程监管者"""
+
+    def __init__(self, worker_count: int, worker_main):
+        """
+        Args:
+            worker_count: 工作进程数量
+            worker_main: 工作进程入口，参数为工作进程序号，返回后进程退出
+        """
+        self.worker_count = worker_count
+        self.worker_main = worker_main
+        self.workers = {}  # pid -> 序号
+        self.channels = {}  # 序号 -> 与该工作进程通信的套接字（父进程端）
+        self.stopping = False
+        self.restarting = False
+
+    def _spawn(self, index: int):
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        pid = os.fork()
+        if pid == 0:
+            global _worker_index, _channel
+            _worker_index = index
+            # 只保留自己的通道
+            for channel in self.channels.values():
+                channel.close()
+            parent_end.close()
+            _channel = child_end
+            # 子进程：恢复默认信号处理，由工作进程自己的事件循环接管
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                self.worker_main(index)
+            except KeyboardInterrupt:
+                pass
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"工作进程 {index} 异常退出: {e}")
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(exit_code)
+        child_end.close()
+        old_channel = self.channels.get(index)
+        if old_channel is not None:
+            old_channel.close()
+        parent_end.setblocking(False)
+        self.channels[index] = parent_end
+        self.workers[pid] = index
+        logger.bind(tag=TAG).info(f"工作进程 {index} 已启动，pid={pid}")
+
+    def _relay(self, timeout: float):
+        """把工作进程发来的广播消息转发给其他工作进程"""
+        try:
+            readable, _, _ = select.select(list(self.channels.values()), [], [], timeout)
+        except (InterruptedError, ValueError):
+            return
+        for channel in readable:
+            try:
+                data = channel.recv(65536)
+            except OSError:
+                continue
+            if not data:
+                continue
+            for other in self.channels.values():
+                if other is channel:
+                    continue
+                try:
+                    other.send(data)
+                except OSError as e:
+                    logger.bind(tag=TAG).warning(f"转发广播消息失败: {e}")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _restart(self, signum, frame):
+        self.restarting = True
+        self._stop(signum, frame)
+
+    def run(self):
+        """启动全部工作进程并阻塞监管，收到退出信号后等待工作进程退出"""
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGHUP, self._restart)
+
+        # 清理上次运行留下的快照，工作进程数减少后多余的快照不再被合并
+        shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+        for index in range(self.worker_count):
+            self._spawn(index)
+
+        last_restart = {}
+        idle = True
+        while self.workers:
+            # 没有待回收的工作进程时等待广播消息，同时定期检查工作进程是否退出
+            self._relay(0.5 if idle else 0)
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            idle = pid == 0
+            if idle:
+                continue
+            index = self.workers.pop(pid, None)
+            if index is None:
+                continue
+            if self.stopping:
+                logger.bind(tag=TAG).info(f"工作进程 {index} 已退出")
+                channel = self.channels.pop(index, None)
+                if channel is not None:
+                    channel.close()
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            logger.bind(tag=TAG).warning(
+                f"工作进程 {index} (pid={pid}) 意外退出，退出码 {code}，准备重启"
+            )
+            elapsed = time.monotonic() - last_restart.get(index, 0)
+            if elapsed < RESTART_BACKOFF:
+                time.sleep(RESTART_BACKOFF - elapsed)
+            last_restart[index] = time.monotonic()
+            self._spawn(index)
+
+        if self.restarting:
+            # 所有工作进程退出后以相同参数重新执行，重新加载配置和模型
+            logger.bind(tag=TAG).info("所有工作进程已退出，重启服务...")
+            sys.stdout.flush()
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+
+        print("所有工作进程已退出，程序退出。")
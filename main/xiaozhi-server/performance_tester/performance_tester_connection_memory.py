@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+import uuid
+import psutil
+import websockets
+from tabulate import tabulate
+from config.settings import load_config
+from core.auth import AuthManager
+
+description = "连接内存占用测试（每个空闲/活跃连接的RSS）"
+
+
+def find_server_process(port: int):
+    """查找监听指定端口的服务进程，多进程模式下返回父进程"""
+    for conn in psutil.net_connections(kind="tcp"):
+        if conn.status == psutil.CONN_LISTEN and conn.laddr.port == port and conn.pid:
+            process = psutil.Process(conn.pid)
+            parent = process.parent()
+            if parent is not None and "python" in parent.name().lower():
+                # 工作进程的父进程是监管进程，统计整个进程树
+                try:
+                    if any(c.pid == conn.pid for c in parent.children()):
+                        return parent
+                except psutil.Error:
+                    pass
+            return process
+    return None
+
+
+def tree_rss(process) -> int:
+    """进程及其全部子进程的RSS之和（字节）"""
+    total = 0
+    for p in [process] + process.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class ConnectionMemoryTester:
+    def __init__(self):
+        self.config = load_config()
+        server_config = self.config["server"]
+        self.port = int(server_config.get("port", 8000))
+        self.url = f"ws://127.0.0.1:{self.port}/xiaozhi/v1/"
+        auth_config = server_config.get("auth", {})
+        self.auth = None
+        if auth_config.get("enabled", False):
+            self.auth = AuthManager(
+                secret_key=server_config["auth_key"],
+                expire_seconds=auth_config.get("expire_seconds", None),
+            )
+        self.connections = []
+
+    def _headers(self, device_id: str) -> dict:
+        client_id = str(uuid.uuid4())
+        headers = {"device-id": device_id, "client-id": client_id}
+        if self.auth is not None:
+            token = self.auth.generate_token(client_id, device_id)
+            headers["authorization"] = f"Bearer {token}"
+        return headers
+
+    async def _open(self, index: int):
+        device_id = f"02:00:00:{index >> 16 & 0xff:02x}:{index >> 8 & 0xff:02x}:{index & 0xff:02x}"
+        ws = await websockets.connect(
+            self.url, additional_headers=self._headers(device_id), max_size=None
+        )
+        await ws.send(
+            json.dumps(
+                {
+                    "type": "hello",
+                    "version": 1,
+                    "transport": "websocket",
+                    "audio_params": {
+                        "format": "opus",
+                        "sample_rate": 16000,
+                        "channels": 1,
+                        "frame_duration": 60,
+                    },
+                }
+            )
+        )
+        return ws
+
+    async def _drain(self, ws):
+        """丢弃服务端下发的消息，避免接收缓冲堆积影响测量"""
+        try:
+            async for _ in ws:
+                pass
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _chat_once(self, ws, timeout: float):
+        """发送一句文本，等待TTS结束，使连接进入完成过一轮对话的状态"""
+        await ws.send(
+            json.dumps({"type": "listen", "state": "detect", "text": "你好"})
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                message = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+            except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+                return False
+            if isinstance(message, str):
+                data = json.loads(message)
+                if data.get("type") == "tts" and data.get("state") == "stop":
+                    return True
+        return False
+
+    async def _settle(self, process, seconds: float = 5) -> int:
+        """等待连接初始化完成、内存稳定后取RSS"""
+        await asyncio.sleep(seconds)
+        return tree_rss(process)
+
+    async def run(self, idle_count: int, active_count: int, batch: int = 100):
+        process = find_server_process(self.port)
+        if process is None:
+            print(f"未找到监听端口 {self.port} 的服务进程，请先启动服务")
+            return
+        print(f"服务进程 pid={process.pid}，测试地址 {self.url}")
+
+        baseline = await self._settle(process, 1)
+
+        for start in range(0, idle_count, batch):
+            opened = await asyncio.gather(
+                *[self._open(i) for i in range(start, min(start + batch, idle_count))],
+                return_exceptions=True,
+            )
+            for ws in opened:
+                if isinstance(ws, Exception):
+                    print(f"建立连接失败: {ws}")
+                else:
+                    self.connections.append(ws)
+        idle_connected = len(self.connections)
+        idle_rss = await self._settle(process)
+
+        active = self.connections[:active_count]
+        finished = await asyncio.gather(*[self._chat_once(ws, 60) for ws in active])
+        active_done = sum(1 for ok in finished if ok)
+        drain_tasks = [asyncio.create_task(self._drain(ws)) for ws in self.connections]
+        active_rss = await self._settle(process)
+
+        for ws in self.connections:
+            await ws.close()
+        for task in drain_tasks:
+            task.cancel()
+
+        mb = 1024 * 1024
+        per_idle = (idle_rss - baseline) / idle_connected if idle_connected else 0
+        per_active = (active_rss - idle_rss) / active_done if active_done else 0
+        rows = [
+            ["基线RSS", f"{baseline / mb:.1f} MB", "-"],
+            [f"{idle_connected} 个空闲连接后", f"{idle_rss / mb:.1f} MB", f"{per_idle / 1024:.1f} KB/连接"],
+            [
+                f"{active_done} 个连接完成一轮对话后",
+                f"{active_rss / mb:.1f} MB",
+                f"+{per_active / 1024:.1f} KB/活跃连接",
+            ],
+        ]
+        print(tabulate(rows, headers=["阶段", "服务RSS", "单连接增量"], tablefmt="github"))
+        if active_done < len(active):
+            print(f"注意：{len(active) - active_done} 个连接未在超时时间内完成对话，未计入活跃连接")
+
+
+async def main():
+    try:
+        idle_count = int(input("空闲连接数（默认1000）：") or 1000)
+        active_count = int(input("活跃连接数（默认10）：") or 10)
+    except ValueError:
+        print("请输入有效的数字")
+        return
+    print("提示：连接数较多时请调大本机和服务端的文件描述符限制（ulimit -n）")
+    tester = ConnectionMemoryTester()
+    await tester.run(idle_count, min(active_count, idle_count))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+import os
+import wave
+import logging
+import statistics
+from collections import deque
+import numpy as np
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.vad_engine import VADStream, CHUNK_SAMPLES, SAMPLE_RATE
+from core.utils.endpointing import AdaptiveEndpointer, EndpointState, FRAME_MS
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "自适应断句离线评估（对比固定静默窗口，统计节省的等待时间和过早断句次数）"
+
+MODEL_DIR = "models/snakers4_silero-vad"
+DEFAULT_SESSION_DIR = os.path.join("config", "assets")
+# 断句对应的语音结束位置相差不超过该时长视为同一句
+MATCH_TOLERANCE_MS = FRAME_MS * 2
+
+
+def load_sessions(session_dir) -> dict:
+    """加载录音目录下的16k单声道wav，每个文件视为一段录制的会话"""
+    sessions = {}
+    for file_name in sorted(os.listdir(session_dir)):
+        if not file_name.endswith(".wav"):
+            continue
+        with wave.open(os.path.join(session_dir, file_name), "rb") as wf:
+            if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                print(f"跳过 {file_name}：需要16k单声道16bit音频")
+                continue
+            pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        sessions[file_name] = pcm.astype(np.float32) / 32768.0
+    return sessions
+
+
+def load_backend():
+    """优先使用 onnxruntime 后端，不可用时退回 torch"""
+    try:
+        from core.utils.vad_engine import OnnxSileroBackend
+
+        return OnnxSileroBackend(
+            os.path.join(MODEL_DIR, "src", "silero_vad", "data", "silero_vad.onnx")
+        )
+    except Exception as e:
+        print(f"onnxruntime 后端加载失败，改用 torch: {e}")
+    import torch
+    from core.utils.vad_engine import TorchSileroBackend
+
+    model, _ = torch.hub.load(
+        repo_or_dir=MODEL_DIR, source="local", model="silero_vad", force_reload=False
+    )
+    return TorchSileroBackend(model)
+
+
+def speech_probs(backend, audio) -> list:
+    stream = VADStream()
+    probs = []
+    for i in range(len(audio) // CHUNK_SAMPLES):
+        chunk = audio[i * CHUNK_SAMPLES : (i + 1) * CHUNK_SAMPLES]
+        prob, state, context = backend.forward(
+            chunk[np.newaxis, :], stream.state[:, np.newaxis, :], stream.context[np.newaxis, :]
+        )
+        stream.state = np.array(state[:, 0], dtype=np.float32)
+        stream.context = np.array(context[0], dtype=np.float32)
+        probs.append(float(prob[0]))
+    return probs
+
+
+def simulate(probs, endpointer, threshold, threshold_low) -> list:
+    """按 SileroVAD 的判定流程回放一段会话，返回每次断句的 (语音结束时间, 断句时间)，单位毫秒"""
+    state = EndpointState()
+    voice_window = deque(maxlen=5)
+    last_is_voice = False
+    have_voice = False
+    last_activity = 0.0
+    endpoints = []
+    for i, prob in enumerate(probs):
+        now = (i + 1) * FRAME_MS
+        if prob >= threshold:
+            is_voice = True
+        elif prob <= threshold_low:
+            is_voice = False
+        else:
+            is_voice = last_is_voice
+        last_is_voice = is_voice
+        voice_window.append(is_voice)
+        frame_have_voice = voice_window.count(True) >= 3
+        if have_voice and not frame_have_voice:
+            if endpointer.should_stop(state, now - last_activity, now):
+                endpoints.append((last_activity, now))
+                # 与线上一致：断句后交给识别并重置语音状态
+                endpointer.finish(state, now)
+                have_voice = False
+                continue
+        if frame_have_voice:
+            have_voice = True
+            last_activity = now
+        endpointer.observe(state, is_voice, have_voice, now)
+    return endpoints
+
+
+def compare(fixed, adaptive) -> tuple:
+    """以固定窗口的断句为参照：语音结束位置一致的计为正确断句并统计节省的时间，其余为过早断句"""
+    saved = []
+    premature = 0
+    for speech_end, stop_time in adaptive:
+        match = next(
+            (f for f in fixed if abs(f[0] - speech_end) <= MATCH_TOLERANCE_MS), None
+        )
+        if match is None:
+            premature += 1
+        else:
+            saved.append(match[1] - stop_time)
+    return saved, premature
+
+
+def main():
+    config = load_config()
+    vad_config = config.get("VAD", {}).get("SileroVAD", {})
+    threshold = float(vad_config.get("threshold", 0.5) or 0.5)
+    threshold_low = float(vad_config.get("threshold_low", 0.2) or 0.2)
+    max_silence_ms = int(vad_config.get("min_silence_duration_ms", 1000) or 1000)
+    endpoint_config = dict(vad_config.get("endpointing") or {})
+
+    session_dir = input(f"录音会话目录（默认 {DEFAULT_SESSION_DIR}）：").strip() or DEFAULT_SESSION_DIR
+    value = input(f"固定静默窗口/自适应上限（毫秒，默认 {max_silence_ms}）：").strip()
+    if value:
+        max_silence_ms = int(value)
+
+    sessions = load_sessions(session_dir)
+    if not sessions:
+        print(f"{session_dir} 目录中没有可用的录音")
+        return
+    backend = load_backend()
+
+    rows = []
+    all_saved = []
+    total_fixed = total_adaptive = total_premature = 0
+    for file_name, audio in sessions.items():
+        probs = speech_probs(backend, audio)
+        fixed = simulate(
+            probs, AdaptiveEndpointer({"enabled": False}, max_silence_ms), threshold, threshold_low
+        )
+        adaptive = simulate(
+            probs,
+            AdaptiveEndpointer({**endpoint_config, "enabled": True}, max_silence_ms),
+            threshold,
+            threshold_low,
+        )
+        saved, premature = compare(fixed, adaptive)
+        all_saved.extend(saved)
+        total_fixed += len(fixed)
+        total_adaptive += len(adaptive)
+        total_premature += premature
+        rows.append(
+            [
+                file_name,
+                len(fixed),
+                len(adaptive),
+                premature,
+                f"{statistics.mean(saved):.0f}" if saved else "-",
+                f"{statistics.median(saved):.0f}" if saved else "-",
+            ]
+        )
+    rows.append(
+        [
+            "合计",
+            total_fixed,
+            total_adaptive,
+            total_premature,
+            f"{statistics.mean(all_saved):.0f}" if all_saved else "-",
+            f"{statistics.median(all_saved):.0f}" if all_saved else "-",
+        ]
+    )
+    print(
+        tabulate(
+            rows,
+            headers=["会话", "固定窗口断句数", "自适应断句数", "过早断句", "平均节省(ms)", "节省中位数(ms)"],
+            tablefmt="github",
+        )
+    )
+    if total_adaptive:
+        print(f"\n过早断句率: {total_premature / total_adaptive:.1%}")
+    print("离线评估没有流式识别的中间结果，未包含中间结果稳定性带来的缩短")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import time
+import wave
+import logging
+import statistics
+import numpy as np
+import psutil
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.vad_engine import VADStream, CHUNK_SAMPLES, SAMPLE_RATE
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "VAD推理性能测试（torch 与 onnxruntime 的启动耗时、单分片延迟、判定一致性）"
+
+MODEL_DIR = "models/snakers4_silero-vad"
+BATCH_SIZES = (1, 8, 32)
+
+
+def load_test_chunks() -> dict:
+    """加载 config/assets 下16k单声道wav，切成512采样点的分片"""
+    wav_root = os.path.join(os.getcwd(), "config", "assets")
+    files = {}
+    for file_name in sorted(os.listdir(wav_root)):
+        if not file_name.endswith(".wav"):
+            continue
+        with wave.open(os.path.join(wav_root, file_name), "rb") as wf:
+            if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                print(f"跳过 {file_name}：需要16k单声道16bit音频")
+                continue
+            pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        audio = pcm.astype(np.float32) / 32768.0
+        count = len(audio) // CHUNK_SAMPLES
+        files[file_name] = [audio[i * CHUNK_SAMPLES : (i + 1) * CHUNK_SAMPLES] for i in range(count)]
+    return files
+
+
+def load_torch_backend():
+    import torch
+    from core.utils.vad_engine import TorchSileroBackend
+
+    model, _ = torch.hub.load(
+        repo_or_dir=MODEL_DIR, source="local", model="silero_vad", force_reload=False
+    )
+    return TorchSileroBackend(model)
+
+
+def load_onnx_backend():
+    from core.utils.vad_engine import OnnxSileroBackend
+
+    return OnnxSileroBackend(
+        os.path.join(MODEL_DIR, "src", "silero_vad", "data", "silero_vad.onnx")
+    )
+
+
+def run_stream(backend, chunks) -> list:
+    """按单个流的顺序推理，返回每个分片的语音概率"""
+    stream = VADStream()
+    probs = []
+    for chunk in chunks:
+        prob, state, context = backend.forward(
+            chunk[np.newaxis, :], stream.state[:, np.newaxis, :], stream.context[np.newaxis, :]
+        )
+        stream.state = np.array(state[:, 0], dtype=np.float32)
+        stream.context = np.array(context[0], dtype=np.float32)
+        probs.append(float(prob[0]))
+    return probs
+
+
+def decisions(probs, threshold, threshold_low) -> list:
+    """与 VAD 供应器相同的双阈值判定"""
+    result = []
+    last = False
+    for prob in probs:
+        if prob >= threshold:
+            last = True
+        elif prob <= threshold_low:
+            last = False
+        result.append(last)
+    return result
+
+
+def measure_latency(backend, chunks, batch_size, rounds=200) -> tuple:
+    """批量推理时平均到每个分片的耗时（毫秒），返回 p50 和 p95"""
+    batch = np.stack([chunks[i % len(chunks)] for i in range(batch_size)])
+    state = np.zeros((2, batch_size, 128), dtype=np.float32)
+    context = np.zeros((batch_size, 64), dtype=np.float32)
+    for _ in range(10):
+        backend.forward(batch, state, context)
+    costs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _, state, context = backend.forward(batch, state, context)
+        costs.append((time.perf_counter() - start) * 1000 / batch_size)
+    return statistics.median(costs), sorted(costs)[int(len(costs) * 0.95) - 1]
+
+
+def main():
+    config = load_config()
+    vad_config = config.get("VAD", {}).get("SileroVAD", {})
+    threshold = float(vad_config.get("threshold", 0.5) or 0.5)
+    threshold_low = float(vad_config.get("threshold_low", 0.2) or 0.2)
+
+    test_files = load_test_chunks()
+    if not test_files:
+        print("config/assets 目录中没有可用的测试音频")
+        return
+    all_chunks = [chunk for chunks in test_files.values() for chunk in chunks]
+
+    process = psutil.Process()
+    backends = {}
+    rows = []
+    # 先加载 onnx，避免 torch 已导入时低估 torch 的启动耗时
+    for name, loader in (("onnxruntime", load_onnx_backend), ("torch", load_torch_backend)):
+        rss_before = process.memory_info().rss
+        start = time.perf_counter()
+        try:
+            backend = loader()
+        except Exception as e:
+            print(f"{name} 后端加载失败，跳过: {e}")
+            continue
+        startup = (time.perf_counter() - start) * 1000
+        rss = (process.memory_info().rss - rss_before) / 1024 / 1024
+        backends[name] = backend
+        row = [name, f"{startup:.0f}", f"{rss:.0f}"]
+        for batch_size in BATCH_SIZES:
+            p50, p95 = measure_latency(backend, all_chunks, batch_size)
+            row.append(f"{p50:.3f} / {p95:.3f}")
+        rows.append(row)
+
+    headers = ["后端", "启动耗时(ms)", "RSS增量(MB)"] + [
+        f"批大小{b} 单分片p50/p95(ms)" for b in BATCH_SIZES
+    ]
+    print(tabulate(rows, headers=headers, tablefmt="github"))
+
+    if len(backends) < 2:
+        print("\n未同时加载两种后端，跳过判定一致性比较")
+        return
+
+    rows = []
+    for file_name, chunks in test_files.items():
+        torch_probs = run_stream(backends["torch"], chunks)
+        onnx_probs = run_stream(backends["onnxruntime"], chunks)
+        torch_dec = decisions(torch_probs, threshold, threshold_low)
+        onnx_dec = decisions(onnx_probs, threshold, threshold_low)
+        mismatch = sum(1 for a, b in zip(torch_dec, onnx_dec) if a != b)
+        max_diff = max((abs(a - b) for a, b in zip(torch_probs, onnx_probs)), default=0)
+        rows.append([file_name, len(chunks), mismatch, f"{max_diff:.5f}"])
+    print(
+        "\n"
+        + tabulate(
+            rows, headers=["音频", "分片数", "判定不一致", "最大概率差"], tablefmt="github"
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -221,6 +221,7 @@ async def play_local_music(conn, specific_file=None):
                     sentence_id=conn.sentence_id,
                     sentence_type=SentenceType.FIRST,
                     content_type=ContentType.ACTION,
+                    generation=conn.generation,
                 )
             )
         conn.tts.tts_text_queue.put(
@@ -229,6 +230,7 @@ async def play_local_music(conn, specific_file=None):
                 sentence_type=SentenceType.MIDDLE,
                 content_type=ContentType.TEXT,
                 content_detail=text,
+                generation=conn.generation,
             )
         )
         conn.tts.tts_text_queue.put(
@@ -237,6 +239,7 @@ async def play_local_music(conn, specific_file=None):
                 sentence_type=SentenceType.MIDDLE,
                 content_type=ContentType.FILE,
                 content_file=music_path,
+                generation=conn.generation,
             )
         )
         if conn.intent_type == "intent_llm":
@@ -245,6 +248,7 @@ async def play_local_music(conn, specific_file=None):
                     sentence_id=conn.sentence_id,
                     sentence_type=SentenceType.LAST,
                     content_type=ContentType.ACTION,
+                    generation=conn.generation,
                 )
             )
 